@@ -0,0 +1,32 @@
+"""renaming blackcomb mountain id.
+
+Revision ID: a7d4e2c9f518
+Revises: f6b2d9a4c813
+Create Date: 2026-10-19 09:12:40.318274
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d4e2c9f518'
+down_revision: str | None = 'f6b2d9a4c813'
+branch_labels: str | list[str] | None = None
+depends_on: str | list[str] | None = None
+
+
+def rename(old: str, new: str) -> None:
+    """Point trips, hot and archived, assigned to mountain id old at new."""
+    # bulk updates skip the ORM onupdate, stamp them for delta sync
+    op.execute(f"UPDATE public.trips SET mountain_id = '{new}', updated_at = now() WHERE mountain_id = '{old}'")
+    op.execute(f"UPDATE public.trips_archive SET mountain_id = '{new}' WHERE mountain_id = '{old}'")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    rename('blackcomb', 'whistler-blackcomb')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    rename('whistler-blackcomb', 'blackcomb')
@@ -0,0 +1,51 @@
+"""adding soft delete to trips.
+
+Revision ID: a9d2e6f41c73
+Revises: f3a81c5d9e20
+Create Date: 2026-10-18 17:26:40.291655
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d2e6f41c73'
+down_revision: str | None = 'f3a81c5d9e20'
+branch_labels: str | list[str] | None = None
+depends_on: str | list[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('trips', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True), schema='public')
+    op.create_index('ix_trips_deleted_at', 'trips', ['deleted_at'], unique=False, schema='public', postgresql_where=sa.text('deleted_at IS NOT NULL'))
+
+    # delta sync learns of a deleted trip when it is soft deleted, the purge that
+    # follows must not record it a second time
+    op.execute('DROP TRIGGER record_tombstone ON public.trips')
+    op.execute(
+        'CREATE TRIGGER record_tombstone BEFORE DELETE ON public.trips '
+        'FOR EACH ROW WHEN (OLD.deleted_at IS NULL) '
+        'EXECUTE FUNCTION public.record_tombstone()'
+    )
+    op.execute(
+        'CREATE TRIGGER record_soft_delete_tombstone AFTER UPDATE OF deleted_at ON public.trips '
+        'FOR EACH ROW WHEN (OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL) '
+        'EXECUTE FUNCTION public.record_tombstone()'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER record_soft_delete_tombstone ON public.trips')
+    # trips soft deleted since the upgrade go for good, their tombstones exist
+    op.execute('DELETE FROM public.trips WHERE deleted_at IS NOT NULL')
+    op.execute('DROP TRIGGER record_tombstone ON public.trips')
+    op.execute(
+        'CREATE TRIGGER record_tombstone BEFORE DELETE ON public.trips '
+        'FOR EACH ROW EXECUTE FUNCTION public.record_tombstone()'
+    )
+
+    op.drop_index('ix_trips_deleted_at', table_name='trips', schema='public', postgresql_where=sa.text('deleted_at IS NOT NULL'))
+    op.drop_column('trips', 'deleted_at', schema='public')
@@ -0,0 +1,39 @@
+"""adding partial index on unclaimed invitation phones.
+
+Revision ID: b41c7e2d9a10
+Revises: 5d168b3f4415
+Create Date: 2026-10-18 09:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41c7e2d9a10'
+down_revision: str | None = '5d168b3f4415'
+branch_labels: str | list[str] | None = None
+depends_on: str | list[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Serves the onboarding backfill lookup of invitations sent to a phone number
+    op.create_index(
+        'ix_invitations_unclaimed_registered_phone',
+        'invitations',
+        ['registered_phone'],
+        unique=False,
+        schema='public',
+        postgresql_where=sa.text('user_id IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        'ix_invitations_unclaimed_registered_phone',
+        table_name='invitations',
+        schema='public',
+    )
@@ -0,0 +1,203 @@
+"""adding user counters.
+
+Revision ID: b6c3f8a1d057
+Revises: a9d2e6f41c73
+Create Date: 2026-10-18 18:03:55.714392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6c3f8a1d057'
+down_revision: str | None = 'a9d2e6f41c73'
+branch_labels: str | list[str] | None = None
+depends_on: str | list[str] | None = None
+
+# Adds deltas to a user's counters, creating the row on first use. ends_on is the
+# end_date of an upcoming trip just counted, the row's recount date moves to it
+# when earlier.
+BUMP_USER_COUNTERS = """
+CREATE OR REPLACE FUNCTION public.bump_user_counters(
+    target uuid, upcoming integer, invitations integer, friend_requests integer, ends_on date
+) RETURNS void
+LANGUAGE sql AS $$
+    INSERT INTO public.user_counters AS c (
+        user_id, upcoming_trips, pending_invitations, pending_friend_requests, upcoming_valid_until
+    )
+    VALUES (
+        target, greatest(upcoming, 0), greatest(invitations, 0), greatest(friend_requests, 0), ends_on
+    )
+    ON CONFLICT (user_id) DO UPDATE SET
+        upcoming_trips = greatest(c.upcoming_trips + upcoming, 0),
+        pending_invitations = greatest(c.pending_invitations + invitations, 0),
+        pending_friend_requests = greatest(c.pending_friend_requests + friend_requests, 0),
+        upcoming_valid_until = least(c.upcoming_valid_until, ends_on),
+        updated_at = now()
+$$
+"""
+
+# An invitation of a live trip counts towards its user's upcoming trips while the
+# trip has not ended, and towards pending invitations while unanswered. Removes
+# the old row's share and adds the new row's.
+COUNT_INVITATION = """
+CREATE OR REPLACE FUNCTION public.count_invitation() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    today date := (now() AT TIME ZONE 'UTC')::date;
+    trip_ends date;
+BEGIN
+    IF TG_OP = 'UPDATE'
+        AND OLD.user_id IS NOT DISTINCT FROM NEW.user_id
+        AND OLD.rsvp IS NOT DISTINCT FROM NEW.rsvp
+        AND OLD.trip_id = NEW.trip_id THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP <> 'INSERT' AND OLD.user_id IS NOT NULL THEN
+        SELECT t.end_date INTO trip_ends
+        FROM public.trips t WHERE t.id = OLD.trip_id AND t.deleted_at IS NULL;
+        IF FOUND THEN
+            PERFORM public.bump_user_counters(
+                OLD.user_id,
+                -(trip_ends >= today)::integer,
+                -coalesce(OLD.rsvp = 'pending', false)::integer,
+                0,
+                NULL
+            );
+        END IF;
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.user_id IS NOT NULL THEN
+        SELECT t.end_date INTO trip_ends
+        FROM public.trips t WHERE t.id = NEW.trip_id AND t.deleted_at IS NULL;
+        IF FOUND THEN
+            PERFORM public.bump_user_counters(
+                NEW.user_id,
+                (trip_ends >= today)::integer,
+                coalesce(NEW.rsvp = 'pending', false)::integer,
+                0,
+                CASE WHEN trip_ends >= today THEN trip_ends END
+            );
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$
+"""
+
+# A pending friendship counts towards its addressee's incoming friend requests.
+COUNT_FRIENDSHIP = """
+CREATE OR REPLACE FUNCTION public.count_friendship() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' AND OLD.status = 'pending' THEN
+        PERFORM public.bump_user_counters(OLD.addressee_id, 0, 0, -1, NULL);
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.status = 'pending' THEN
+        PERFORM public.bump_user_counters(NEW.addressee_id, 0, 0, 1, NULL);
+    END IF;
+    RETURN NULL;
+END;
+$$
+"""
+
+# Soft deleting a trip or moving its end date changes the counts of everyone
+# invited. Rows are bumped in user order so concurrent trip updates cannot deadlock.
+COUNT_TRIP = """
+CREATE OR REPLACE FUNCTION public.count_trip() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    today date := (now() AT TIME ZONE 'UTC')::date;
+    was_live boolean := OLD.deleted_at IS NULL;
+    is_live boolean := NEW.deleted_at IS NULL;
+    was_upcoming boolean := OLD.deleted_at IS NULL AND OLD.end_date >= today;
+    is_upcoming boolean := NEW.deleted_at IS NULL AND NEW.end_date >= today;
+BEGIN
+    IF was_live = is_live AND was_upcoming = is_upcoming
+        AND NOT (is_upcoming AND NEW.end_date < OLD.end_date) THEN
+        RETURN NULL;
+    END IF;
+    PERFORM public.bump_user_counters(
+        i.user_id,
+        is_upcoming::integer - was_upcoming::integer,
+        coalesce(i.rsvp = 'pending', false)::integer * (is_live::integer - was_live::integer),
+        0,
+        CASE WHEN is_upcoming THEN NEW.end_date END
+    )
+    FROM (
+        SELECT user_id, rsvp FROM public.invitations
+        WHERE trip_id = NEW.id AND user_id IS NOT NULL
+        ORDER BY user_id
+    ) i;
+    RETURN NULL;
+END;
+$$
+"""
+
+BACKFILL = """
+INSERT INTO public.user_counters (
+    user_id, upcoming_trips, pending_invitations, pending_friend_requests, upcoming_valid_until
+)
+SELECT
+    u.id,
+    (SELECT count(*) FROM public.invitations i JOIN public.trips t ON t.id = i.trip_id
+     WHERE i.user_id = u.id AND t.deleted_at IS NULL
+       AND t.end_date >= (now() AT TIME ZONE 'UTC')::date),
+    (SELECT count(*) FROM public.invitations i JOIN public.trips t ON t.id = i.trip_id
+     WHERE i.user_id = u.id AND t.deleted_at IS NULL AND i.rsvp = 'pending'),
+    (SELECT count(*) FROM public.friendships f
+     WHERE f.addressee_id = u.id AND f.status = 'pending'),
+    (SELECT min(t.end_date) FROM public.invitations i JOIN public.trips t ON t.id = i.trip_id
+     WHERE i.user_id = u.id AND t.deleted_at IS NULL
+       AND t.end_date >= (now() AT TIME ZONE 'UTC')::date)
+FROM public.users u
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'user_counters',
+        sa.Column('user_id', sa.Uuid(), nullable=False),
+        sa.Column('upcoming_trips', sa.Integer(), nullable=False),
+        sa.Column('pending_invitations', sa.Integer(), nullable=False),
+        sa.Column('pending_friend_requests', sa.Integer(), nullable=False),
+        sa.Column('upcoming_valid_until', sa.Date(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['public.users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+        schema='public',
+    )
+
+    op.execute(BUMP_USER_COUNTERS)
+    op.execute(COUNT_INVITATION)
+    op.execute(COUNT_FRIENDSHIP)
+    op.execute(COUNT_TRIP)
+    op.execute(
+        'CREATE TRIGGER count_invitation '
+        'AFTER INSERT OR DELETE OR UPDATE OF user_id, rsvp, trip_id ON public.invitations '
+        'FOR EACH ROW EXECUTE FUNCTION public.count_invitation()'
+    )
+    op.execute(
+        'CREATE TRIGGER count_friendship '
+        'AFTER INSERT OR DELETE OR UPDATE OF status, addressee_id ON public.friendships '
+        'FOR EACH ROW EXECUTE FUNCTION public.count_friendship()'
+    )
+    op.execute(
+        'CREATE TRIGGER count_trip '
+        'AFTER UPDATE OF end_date, deleted_at ON public.trips '
+        'FOR EACH ROW EXECUTE FUNCTION public.count_trip()'
+    )
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER IF EXISTS count_trip ON public.trips')
+    op.execute('DROP TRIGGER IF EXISTS count_friendship ON public.friendships')
+    op.execute('DROP TRIGGER IF EXISTS count_invitation ON public.invitations')
+    op.execute('DROP FUNCTION IF EXISTS public.count_trip()')
+    op.execute('DROP FUNCTION IF EXISTS public.count_friendship()')
+    op.execute('DROP FUNCTION IF EXISTS public.count_invitation()')
+    op.execute('DROP FUNCTION IF EXISTS public.bump_user_counters(uuid, integer, integer, integer, date)')
+    op.drop_table('user_counters', schema='public')
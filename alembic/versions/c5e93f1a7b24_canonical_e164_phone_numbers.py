@@ -0,0 +1,99 @@
+"""canonical e164 phone numbers.
+
+Revision ID: c5e93f1a7b24
+Revises: b41c7e2d9a10
+Create Date: 2026-10-18 10:03:47.118520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e93f1a7b24'
+down_revision: str | None = 'b41c7e2d9a10'
+branch_labels: str | list[str] | None = None
+depends_on: str | list[str] | None = None
+
+# Mirrors clean_and_validate_phone: strip non digits, national numbers default to +1
+CANONICAL_PHONE_SQL = """
+    CASE
+        WHEN length(regexp_replace({column}, '\\D', '', 'g')) = 10
+            THEN '+1' || regexp_replace({column}, '\\D', '', 'g')
+        ELSE '+' || regexp_replace({column}, '\\D', '', 'g')
+    END
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column(
+        'users',
+        'phone',
+        existing_type=sa.String(length=15),
+        type_=sa.String(length=16),
+        existing_nullable=True,
+        schema='public',
+    )
+    # Backfill existing rows, blank numbers become NULL like on write
+    op.execute(
+        f"""
+        UPDATE public.users
+        SET phone = {CANONICAL_PHONE_SQL.format(column='phone')}
+        WHERE phone IS NOT NULL AND phone !~ '^\\+[0-9]+$'
+          AND regexp_replace(phone, '\\D', '', 'g') <> ''
+        """
+    )
+    op.execute(
+        "UPDATE public.users SET phone = NULL WHERE regexp_replace(phone, '\\D', '', 'g') = ''"
+    )
+    # "555-123-4567" and "+15551234567" on one trip canonicalize to the same number,
+    # keep one invite per trip and number so unique_invitation_external_user holds:
+    # the claimed one, else the oldest. Not restored by the downgrade
+    op.execute(
+        f"""
+        DELETE FROM public.invitations
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY trip_id, {CANONICAL_PHONE_SQL.format(column='registered_phone')}
+                    ORDER BY claim_user_id IS NULL, created_at, id
+                ) AS duplicate
+                FROM public.invitations
+                WHERE registered_phone IS NOT NULL
+                  AND regexp_replace(registered_phone, '\\D', '', 'g') <> ''
+            ) AS numbered
+            WHERE duplicate > 1
+        )
+        """
+    )
+    op.execute(
+        f"""
+        UPDATE public.invitations
+        SET registered_phone = {CANONICAL_PHONE_SQL.format(column='registered_phone')}
+        WHERE registered_phone IS NOT NULL AND registered_phone !~ '^\\+[0-9]+$'
+          AND regexp_replace(registered_phone, '\\D', '', 'g') <> ''
+        """
+    )
+    op.create_index(
+        op.f('ix_public_users_phone'), 'users', ['phone'], unique=False, schema='public'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_public_users_phone'), table_name='users', schema='public')
+    op.execute(
+        "UPDATE public.invitations SET registered_phone = ltrim(registered_phone, '+') "
+        "WHERE registered_phone IS NOT NULL"
+    )
+    op.execute("UPDATE public.users SET phone = ltrim(phone, '+') WHERE phone IS NOT NULL")
+    op.alter_column(
+        'users',
+        'phone',
+        existing_type=sa.String(length=16),
+        type_=sa.String(length=15),
+        existing_nullable=True,
+        schema='public',
+    )
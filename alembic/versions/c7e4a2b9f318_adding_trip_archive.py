@@ -0,0 +1,130 @@
+"""adding trip archive.
+
+Revision ID: c7e4a2b9f318
+Revises: b6c3f8a1d057
+Create Date: 2026-10-18 18:41:07.552810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e4a2b9f318'
+down_revision: str | None = 'b6c3f8a1d057'
+branch_labels: str | list[str] | None = None
+depends_on: str | list[str] | None = None
+
+SYNCED_TABLES = ('trips', 'invitations', 'cars', 'passengers', 'friendships')
+# archive-trips sets app.archiving, moving rows into the archive is not a delete
+NOT_ARCHIVING = "current_setting('app.archiving', true) IS DISTINCT FROM 'on'"
+
+# hot table to its archive columns, in the order both share
+ARCHIVED_COLUMNS = {
+    'trips': 'id, owner, title, start_date, end_date, start_time, mountain, "desc", '
+    'trip_image_storage_path, created_at, updated_at, deleted_at',
+    'invitations': 'id, trip_id, user_id, claim_user_id, registered_phone, rsvp, paid, '
+    'created_at, updated_at',
+    'cars': 'id, trip_id, created_at, updated_at, owner, seat_count',
+    'passengers': 'user_id, car_id, seat_position, created_at, updated_at',
+}
+
+
+def tombstone_triggers(when: dict[str, str]) -> None:
+    """Recreate the tombstone triggers with the given WHEN condition per table."""
+    for table in SYNCED_TABLES:
+        condition = f'WHEN ({when[table]}) ' if table in when else ''
+        op.execute(f'DROP TRIGGER record_tombstone ON public.{table}')
+        op.execute(
+            f'CREATE TRIGGER record_tombstone BEFORE DELETE ON public.{table} '
+            f'FOR EACH ROW {condition}EXECUTE FUNCTION public.record_tombstone()'
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'trips_archive',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('owner', sa.Uuid(), nullable=False),
+        sa.Column('title', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('start_time', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('mountain', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('desc', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('trip_image_storage_path', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id', 'end_date'),
+        schema='public',
+        postgresql_partition_by='RANGE (end_date)',
+    )
+    op.create_table(
+        'invitations_archive',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('trip_id', sa.Uuid(), nullable=False),
+        sa.Column('user_id', sa.Uuid(), nullable=True),
+        sa.Column('claim_user_id', sa.Uuid(), nullable=True),
+        sa.Column('registered_phone', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('rsvp', postgresql.ENUM('accepted', 'pending', 'uncertain', 'declined', name='invitationenum', create_type=False), nullable=True),
+        sa.Column('paid', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        schema='public',
+    )
+    op.create_index('ix_invitations_archive_trip_id', 'invitations_archive', ['trip_id'], unique=False, schema='public')
+    op.create_index('ix_invitations_archive_user_id', 'invitations_archive', ['user_id'], unique=False, schema='public')
+    op.create_table(
+        'cars_archive',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('trip_id', sa.Uuid(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('owner', sa.Uuid(), nullable=False),
+        sa.Column('seat_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        schema='public',
+    )
+    op.create_index('ix_cars_archive_trip_id', 'cars_archive', ['trip_id'], unique=False, schema='public')
+    op.create_table(
+        'passengers_archive',
+        sa.Column('user_id', sa.Uuid(), nullable=False),
+        sa.Column('car_id', sa.Uuid(), nullable=False),
+        sa.Column('seat_position', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('car_id', 'user_id'),
+        schema='public',
+    )
+
+    tombstone_triggers({
+        'trips': f'OLD.deleted_at IS NULL AND {NOT_ARCHIVING}',
+        **{table: NOT_ARCHIVING for table in SYNCED_TABLES if table != 'trips'},
+    })
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    tombstone_triggers({'trips': 'OLD.deleted_at IS NULL'})
+
+    # archived trips move back into the hot tables, parents first
+    for table, columns in ARCHIVED_COLUMNS.items():
+        op.execute(
+            f'INSERT INTO public.{table} ({columns}) '
+            f'SELECT {columns} FROM public.{table}_archive'
+        )
+
+    op.drop_table('passengers_archive', schema='public')
+    op.drop_index('ix_cars_archive_trip_id', table_name='cars_archive', schema='public')
+    op.drop_table('cars_archive', schema='public')
+    op.drop_index('ix_invitations_archive_user_id', table_name='invitations_archive', schema='public')
+    op.drop_index('ix_invitations_archive_trip_id', table_name='invitations_archive', schema='public')
+    op.drop_table('invitations_archive', schema='public')
+    # drops the yearly partitions with it
+    op.drop_table('trips_archive', schema='public')
@@ -0,0 +1,48 @@
+"""adding trip search vector.
+
+Revision ID: d1f5b8e3a962
+Revises: c7e4a2b9f318
+Create Date: 2026-10-18 20:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1f5b8e3a962'
+down_revision: str | None = 'c7e4a2b9f318'
+branch_labels: str | list[str] | None = None
+depends_on: str | list[str] | None = None
+
+# title ranks over mountain over description
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', title), 'A') || "
+    "setweight(to_tsvector('english', mountain), 'B') || "
+    "setweight(to_tsvector('english', coalesce(\"desc\", '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # rewrites the table, cheap while the archive keeps trips to the current season
+    for table in ('trips', 'trips_archive'):
+        op.add_column(
+            table,
+            sa.Column(
+                'search_vector',
+                postgresql.TSVECTOR(),
+                sa.Computed(SEARCH_VECTOR, persisted=True),
+                nullable=True,
+            ),
+            schema='public',
+        )
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], unique=False, schema='public', postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('trips', 'trips_archive'):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table, schema='public', postgresql_using='gin')
+        op.drop_column(table, 'search_vector', schema='public')
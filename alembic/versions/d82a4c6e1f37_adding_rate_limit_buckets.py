@@ -0,0 +1,37 @@
+"""adding rate limit buckets.
+
+Revision ID: d82a4c6e1f37
+Revises: c5e93f1a7b24
+Create Date: 2026-10-18 11:26:05.774391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd82a4c6e1f37'
+down_revision: str | None = 'c5e93f1a7b24'
+branch_labels: str | list[str] | None = None
+depends_on: str | list[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Unlogged: bucket state is disposable and written on every request
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('allowed', sa.Boolean(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+        schema='public',
+        prefixes=['UNLOGGED'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rate_limit_buckets', schema='public')
@@ -0,0 +1,110 @@
+"""adding tombstones and sync indexes.
+
+Revision ID: e4b7a9c2d513
+Revises: d82a4c6e1f37
+Create Date: 2026-10-18 14:02:31.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7a9c2d513'
+down_revision: str | None = 'd82a4c6e1f37'
+branch_labels: str | list[str] | None = None
+depends_on: str | list[str] | None = None
+
+SYNCED_TABLES = ('trips', 'invitations', 'cars', 'passengers', 'friendships')
+
+# Records every delete with the users who could see the row, so delta sync can
+# tell them. Children deleted by a cascade from their trip or car are skipped,
+# the parent's tombstone already covers them.
+RECORD_TOMBSTONE = """
+CREATE OR REPLACE FUNCTION public.record_tombstone() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    parent_trip uuid;
+    deleted_key jsonb;
+    audience uuid[];
+BEGIN
+    IF TG_TABLE_NAME = 'friendships' THEN
+        deleted_key := jsonb_build_object('id', OLD.id);
+        audience := ARRAY[OLD.requester_id, OLD.addressee_id];
+    ELSE
+        IF TG_TABLE_NAME = 'trips' THEN
+            parent_trip := OLD.id;
+            deleted_key := jsonb_build_object('id', OLD.id);
+        ELSIF TG_TABLE_NAME = 'passengers' THEN
+            SELECT c.trip_id INTO parent_trip FROM public.cars c WHERE c.id = OLD.car_id;
+            deleted_key := jsonb_build_object('car_id', OLD.car_id, 'user_id', OLD.user_id);
+        ELSE
+            parent_trip := OLD.trip_id;
+            deleted_key := jsonb_build_object('id', OLD.id);
+        END IF;
+        IF TG_TABLE_NAME <> 'trips'
+            AND NOT EXISTS (SELECT 1 FROM public.trips t WHERE t.id = parent_trip) THEN
+            RETURN OLD;
+        END IF;
+        SELECT array_agg(i.user_id) INTO audience
+        FROM public.invitations i
+        WHERE i.trip_id = parent_trip AND i.user_id IS NOT NULL;
+    END IF;
+    IF audience IS NOT NULL THEN
+        INSERT INTO public.tombstones (entity, entity_key, audience)
+        VALUES (TG_TABLE_NAME, deleted_key, audience);
+    END IF;
+    RETURN OLD;
+END;
+$$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'tombstones',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column('entity', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('entity_key', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('audience', postgresql.ARRAY(sa.Uuid()), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        schema='public',
+    )
+    op.create_index('ix_tombstones_deleted_at_id', 'tombstones', ['deleted_at', 'id'], unique=False, schema='public')
+    op.create_index('ix_tombstones_audience', 'tombstones', ['audience'], unique=False, schema='public', postgresql_using='gin')
+
+    op.create_index('ix_invitations_trip_id_updated_at', 'invitations', ['trip_id', 'updated_at'], unique=False, schema='public')
+    op.create_index('ix_invitations_user_id_updated_at', 'invitations', ['user_id', 'updated_at'], unique=False, schema='public')
+    op.create_index('ix_cars_trip_id_updated_at', 'cars', ['trip_id', 'updated_at'], unique=False, schema='public')
+    op.create_index('ix_passengers_car_id_updated_at', 'passengers', ['car_id', 'updated_at'], unique=False, schema='public')
+    op.create_index('ix_friendships_requester_id_updated_at', 'friendships', ['requester_id', 'updated_at'], unique=False, schema='public')
+    op.create_index('ix_friendships_addressee_id_updated_at', 'friendships', ['addressee_id', 'updated_at'], unique=False, schema='public')
+
+    op.execute(RECORD_TOMBSTONE)
+    for table in SYNCED_TABLES:
+        op.execute(
+            f'CREATE TRIGGER record_tombstone BEFORE DELETE ON public.{table} '
+            'FOR EACH ROW EXECUTE FUNCTION public.record_tombstone()'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in SYNCED_TABLES:
+        op.execute(f'DROP TRIGGER IF EXISTS record_tombstone ON public.{table}')
+    op.execute('DROP FUNCTION IF EXISTS public.record_tombstone()')
+
+    op.drop_index('ix_friendships_addressee_id_updated_at', table_name='friendships', schema='public')
+    op.drop_index('ix_friendships_requester_id_updated_at', table_name='friendships', schema='public')
+    op.drop_index('ix_passengers_car_id_updated_at', table_name='passengers', schema='public')
+    op.drop_index('ix_cars_trip_id_updated_at', table_name='cars', schema='public')
+    op.drop_index('ix_invitations_user_id_updated_at', table_name='invitations', schema='public')
+    op.drop_index('ix_invitations_trip_id_updated_at', table_name='invitations', schema='public')
+
+    op.drop_index('ix_tombstones_audience', table_name='tombstones', schema='public', postgresql_using='gin')
+    op.drop_index('ix_tombstones_deleted_at_id', table_name='tombstones', schema='public')
+    op.drop_table('tombstones', schema='public')
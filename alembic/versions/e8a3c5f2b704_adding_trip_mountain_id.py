@@ -0,0 +1,32 @@
+"""adding trip mountain id.
+
+Revision ID: e8a3c5f2b704
+Revises: d1f5b8e3a962
+Create Date: 2026-10-18 21:03:26.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a3c5f2b704'
+down_revision: str | None = 'd1f5b8e3a962'
+branch_labels: str | list[str] | None = None
+depends_on: str | list[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # nullable without a default, no rewrite. assign-mountains fills existing trips
+    op.add_column('trips', sa.Column('mountain_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True), schema='public')
+    op.create_index(op.f('ix_public_trips_mountain_id'), 'trips', ['mountain_id'], unique=False, schema='public')
+    op.add_column('trips_archive', sa.Column('mountain_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True), schema='public')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('trips_archive', 'mountain_id', schema='public')
+    op.drop_index(op.f('ix_public_trips_mountain_id'), table_name='trips', schema='public')
+    op.drop_column('trips', 'mountain_id', schema='public')
@@ -0,0 +1,27 @@
+"""adding trip date range index.
+
+Revision ID: f6b2d9a4c813
+Revises: e8a3c5f2b704
+Create Date: 2026-10-18 21:47:52.661930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b2d9a4c813'
+down_revision: str | None = 'e8a3c5f2b704'
+branch_labels: str | list[str] | None = None
+depends_on: str | list[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # both days included, overlap checks must compare this very expression
+    op.create_index('ix_trips_date_range', 'trips', [sa.text("daterange(start_date, end_date, '[]')")], unique=False, schema='public', postgresql_using='gist')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_trips_date_range', table_name='trips', schema='public', postgresql_using='gist')
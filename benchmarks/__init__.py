@@ -0,0 +1 @@
+"""Offline benchmarks for the API. Run each module with `python -m benchmarks.<name>`."""
@@ -0,0 +1,13 @@
+"""API app with Vonage swapped for the fake SMS server, served by the load driver.
+
+Supabase needs no override, the driver points SUPABASE_URL at the fake auth server.
+"""
+
+import os
+
+from benchmarks.fakes import FakeVonage
+from src.api.deps import get_vonage_client
+from src.main import app
+
+fake_vonage = FakeVonage(os.environ["BENCH_SMS_URL"])
+app.dependency_overrides[get_vonage_client] = lambda: fake_vonage
@@ -0,0 +1,198 @@
+"""Hermetic stand-ins for Supabase auth and the Vonage SMS API.
+
+Both servers run on localhost threads with configurable latency and error rate so
+benchmarks measure the API itself, offline and without spending SMS credit.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+from vonage_sms import SmsMessage, SmsResponse
+from vonage_sms.errors import SmsError
+
+# the fake accepts "<user uuid>.<phone>" bearer tokens, see bench_token
+TOKEN_PATTERN = re.compile(r"^(?P<user_id>[0-9a-f-]{36})\.(?P<phone>\+?\d+)$")
+
+
+def bench_token(user_id: uuid.UUID, phone: str) -> str:
+    """Return a bearer token the fake auth server resolves to this user."""
+    return f"{user_id}.{phone}"
+
+
+@dataclass
+class FaultProfile:
+    latency: float = 0.0
+    error_rate: float = 0.0
+
+    def apply(self) -> bool:
+        """Sleep for the configured latency and return True when this call should fail."""
+        if self.latency:
+            time.sleep(self.latency)
+        return random.random() < self.error_rate  # noqa: S311
+
+
+class _FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self, handler: type[BaseHTTPRequestHandler], faults: FaultProfile
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), handler)
+        self.faults = faults
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Base url of the running server."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_FakeServer":
+        """Serve on a daemon thread."""
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    server: "_FakeServer"
+
+    def send_json(self, status: int, payload: object) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        pass
+
+
+class _AuthHandler(_JsonHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        if urlparse(self.path).path != "/auth/v1/user":
+            self.send_json(404, {"msg": "not found"})
+            return
+        if self.server.faults.apply():
+            self.send_json(503, {"msg": "injected auth failure"})
+            return
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        match = TOKEN_PATTERN.match(token)
+        if not match:
+            self.send_json(401, {"code": 401, "msg": "invalid JWT"})
+            return
+        self.send_json(
+            200,
+            {
+                "id": match["user_id"],
+                "aud": "authenticated",
+                "role": "authenticated",
+                "phone": match["phone"],
+                "app_metadata": {},
+                "user_metadata": {},
+                "created_at": datetime.now(UTC).isoformat(),
+            },
+        )
+
+
+class FakeAuthServer(_FakeServer):
+    """Answers supabase.auth.get_user for bench_token tokens."""
+
+    def __init__(self, faults: FaultProfile | None = None) -> None:
+        """Bind an ephemeral localhost port."""
+        super().__init__(_AuthHandler, faults or FaultProfile())
+
+
+class _SmsHandler(_JsonHandler):
+    server: "FakeSmsServer"
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get("Content-Length", 0))
+        message = json.loads(self.rfile.read(length) or b"{}")
+        if self.server.faults.apply():
+            self.send_json(
+                200,
+                {
+                    "message-count": "1",
+                    "messages": [{"status": "1", "error-text": "Throttled"}],
+                },
+            )
+            return
+        self.server.record(message["to"], message["text"])
+        self.send_json(
+            200,
+            {
+                "message-count": "1",
+                "messages": [
+                    {
+                        "to": message["to"],
+                        "message-id": uuid.uuid4().hex,
+                        "status": "0",
+                        "remaining-balance": "100.0",
+                        "message-price": "0.0",
+                        "network": "00000",
+                    }
+                ],
+            },
+        )
+
+    def do_GET(self) -> None:  # noqa: N802
+        # lets the driver read invite links the way a phone would
+        query = parse_qs(urlparse(self.path).query)
+        to = query.get("to", [""])[0]
+        self.send_json(200, {"messages": self.server.messages_to(to)})
+
+
+class FakeSmsServer(_FakeServer):
+    """Accepts SMS sends and keeps the texts so scenarios can follow invite links."""
+
+    def __init__(self, faults: FaultProfile | None = None) -> None:
+        """Bind an ephemeral localhost port."""
+        super().__init__(_SmsHandler, faults or FaultProfile())
+        self._lock = threading.Lock()
+        self._messages: dict[str, list[str]] = defaultdict(list)
+
+    def record(self, to: str, text: str) -> None:
+        """Store a delivered text."""
+        with self._lock:
+            self._messages[to].append(text)
+
+    def messages_to(self, to: str) -> list[str]:
+        """Return texts delivered to a phone number."""
+        with self._lock:
+            return list(self._messages.get(to, []))
+
+
+class _FakeSms:
+    def __init__(self, url: str) -> None:
+        self._client = httpx.Client(base_url=url)
+
+    def send(self, message: SmsMessage) -> SmsResponse:
+        payload = message.model_dump(by_alias=True)
+        response = self._client.post("/sms/json", json=payload).json()
+        if response["messages"][0].get("status") != "0":
+            raise SmsError(response["messages"][0].get("error-text", "SMS failed"))
+        return SmsResponse(**response)
+
+
+class FakeVonage:
+    """Drop in for the Vonage client exposing the `sms.send` call the API uses."""
+
+    def __init__(self, url: str) -> None:
+        """Send through the fake SMS server at url."""
+        self.sms = _FakeSms(url)
@@ -0,0 +1,443 @@
+"""Load test the API against a local Postgres with fake Supabase auth and Vonage.
+
+Starts the fake servers, seeds benchmark users, serves benchmarks.app with uvicorn
+and drives a weighted mix of trip, invite, RSVP, car and friendship calls from
+concurrent virtual users. Prints per endpoint throughput and p50/p95/p99 latency
+and can store the result as a baseline or compare against one.
+
+    python -m benchmarks.load --duration 60 --concurrency 32
+    python -m benchmarks.load --save-baseline main
+    python -m benchmarks.load --baseline main --max-regression 0.2
+
+Needs the usual POSTGRES_* settings pointing at a disposable local database.
+Baselines are written to benchmarks/baselines/<name>.json, commit them so
+regressions in src/api/routes show up against the stored numbers.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+from benchmarks.fakes import (
+    FakeAuthServer,
+    FakeSmsServer,
+    FaultProfile,
+    bench_token,
+)
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+API_PREFIX = "/api/v1"
+INVITE_TOKEN = re.compile(r"invite_token=([0-9a-f-]{36})")
+# fixed namespace so reruns reuse the same seeded users
+BENCH_NAMESPACE = uuid.UUID("6c1f0f43-52a1-4a8e-9d0b-6a0d3c1f2b7e")
+HTTP_SERVER_ERROR = 500
+
+
+@dataclass
+class BenchUser:
+    id: uuid.UUID
+    phone: str
+
+    @property
+    def headers(self) -> dict[str, str]:
+        """Authorization header accepted by the fake auth server."""
+        return {"Authorization": f"Bearer {bench_token(self.id, self.phone)}"}
+
+
+@dataclass
+class SharedState:
+    users: list[BenchUser]
+    sms_url: str
+    trips: list[tuple[str, BenchUser]] = field(default_factory=list)
+    pending_rsvps: list[tuple[str, BenchUser]] = field(default_factory=list)
+
+
+@dataclass
+class Samples:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def record(self, endpoint: str, seconds: float, *, ok: bool) -> None:
+        """Store one request outcome under its endpoint template."""
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+
+def bench_users(count: int) -> list[BenchUser]:
+    """Return deterministic benchmark users."""
+    return [
+        BenchUser(id=uuid.uuid5(BENCH_NAMESPACE, str(i)), phone=f"+1555{i:07d}")
+        for i in range(count)
+    ]
+
+
+def seed_users(users: list[BenchUser]) -> None:
+    """Upsert the benchmark users so every fake auth token maps to a real row."""
+    from sqlmodel import Session
+
+    from src.core.db import engine
+    from src.models.models import User
+
+    with Session(engine) as session:
+        for index, user in enumerate(users):
+            session.merge(
+                User(
+                    id=user.id,
+                    phone=user.phone,
+                    firstname="Bench",
+                    lastname=str(index),
+                    username=f"bench{index}",
+                    is_onboarded=True,
+                )
+            )
+        session.commit()
+
+
+class Driver:
+    """Runs weighted scenarios for one virtual user until the deadline."""
+
+    def __init__(
+        self, client: httpx.AsyncClient, state: SharedState, samples: Samples
+    ) -> None:
+        """Construct driver sharing trips and pending RSVPs with the other virtual users."""
+        self.client = client
+        self.state = state
+        self.samples = samples
+        self.scenarios = [
+            (self.list_trips, 20),
+            (self.get_trip, 12),
+            (self.create_trip, 5),
+            (self.attendance, 10),
+            (self.invite, 5),
+            (self.rsvp, 5),
+            (self.list_cars, 10),
+            (self.create_car, 3),
+            (self.friends, 10),
+            (self.friend_requests, 5),
+            (self.send_friend_request, 3),
+        ]
+
+    async def call(
+        self, endpoint: str, method: str, path: str, user: BenchUser, **kwargs: object
+    ) -> httpx.Response | None:
+        """Time one request and record it under endpoint."""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, API_PREFIX + path, headers=user.headers, **kwargs
+            )
+        except httpx.HTTPError:
+            self.samples.record(endpoint, time.perf_counter() - start, ok=False)
+            return None
+        self.samples.record(
+            endpoint,
+            time.perf_counter() - start,
+            ok=response.status_code < HTTP_SERVER_ERROR,
+        )
+        return response
+
+    def random_trip(self) -> tuple[str, BenchUser] | None:
+        return random.choice(self.state.trips) if self.state.trips else None  # noqa: S311
+
+    def other_user(self, user: BenchUser) -> BenchUser:
+        return random.choice([u for u in self.state.users if u is not user])  # noqa: S311
+
+    async def list_trips(self, user: BenchUser) -> None:
+        await self.call("GET /trips/", "GET", "/trips/", user)
+
+    async def get_trip(self, user: BenchUser) -> None:
+        if trip := self.random_trip():
+            await self.call("GET /trips/{trip_id}", "GET", f"/trips/{trip[0]}", user)
+
+    async def create_trip(self, user: BenchUser) -> None:
+        start = datetime.now(UTC).date() + timedelta(days=random.randint(1, 90))  # noqa: S311
+        response = await self.call(
+            "POST /trips/",
+            "POST",
+            "/trips/",
+            user,
+            json={
+                "title": "Bench trip",
+                "startDate": start.isoformat(),
+                "endDate": (start + timedelta(days=2)).isoformat(),
+                "mountain": "Bench Mountain",
+            },
+        )
+        if response is not None and response.is_success:
+            self.state.trips.append((response.json()["data"]["id"], user))
+
+    async def attendance(self, user: BenchUser) -> None:
+        if trip := self.random_trip():
+            await self.call(
+                "GET /trips/{trip_id}/invites", "GET", f"/trips/{trip[0]}/invites", user
+            )
+
+    async def invite(self, user: BenchUser) -> None:
+        own_trips = [trip for trip in self.state.trips if trip[1] is user]
+        if not own_trips:
+            return
+        trip_id = random.choice(own_trips)[0]  # noqa: S311
+        invitee = self.other_user(user)
+        response = await self.call(
+            "POST /trips/{trip_id}/invites",
+            "POST",
+            f"/trips/{trip_id}/invites",
+            user,
+            json={"invitees": [{"type": "registered", "userId": str(invitee.id)}]},
+        )
+        if response is not None and response.is_success:
+            self.state.pending_rsvps.append((trip_id, invitee))
+
+    async def rsvp(self, _user: BenchUser) -> None:
+        if not self.state.pending_rsvps:
+            return
+        trip_id, invitee = self.state.pending_rsvps.pop()
+        # read the deep link from the fake phone like the real invitee would
+        response = await self.client.get(
+            self.state.sms_url, params={"to": invitee.phone}
+        )
+        messages = response.json()
+        tokens = INVITE_TOKEN.findall(" ".join(messages["messages"]))
+        if not tokens:
+            return
+        await self.call(
+            "PATCH /trips/{trip_id}/invites",
+            "PATCH",
+            f"/trips/{trip_id}/invites",
+            invitee,
+            json={
+                "inviteToken": tokens[-1],
+                "rsvp": random.choice(["accepted", "declined"]),  # noqa: S311
+            },
+        )
+
+    async def list_cars(self, user: BenchUser) -> None:
+        if trip := self.random_trip():
+            await self.call(
+                "GET /trips/{trip_id}/cars/", "GET", f"/trips/{trip[0]}/cars/", user
+            )
+
+    async def create_car(self, user: BenchUser) -> None:
+        if trip := self.random_trip():
+            await self.call(
+                "POST /trips/{trip_id}/cars/",
+                "POST",
+                f"/trips/{trip[0]}/cars/",
+                user,
+                json={"seatCount": 4},
+            )
+
+    async def friends(self, user: BenchUser) -> None:
+        await self.call("GET /friendships/me", "GET", "/friendships/me", user)
+
+    async def friend_requests(self, user: BenchUser) -> None:
+        await self.call(
+            "GET /friendships/{user_id}",
+            "GET",
+            f"/friendships/{user.id}",
+            user,
+            params={"request_type": "incoming"},
+        )
+
+    async def send_friend_request(self, user: BenchUser) -> None:
+        await self.call(
+            "POST /friendships/",
+            "POST",
+            "/friendships/",
+            user,
+            json={"addresseeId": str(self.other_user(user).id)},
+        )
+
+    async def run(self, user: BenchUser, deadline: float) -> None:
+        """Pick scenarios by weight until the deadline passes."""
+        scenarios, weights = zip(*self.scenarios, strict=True)
+        # make sure there is something to read before the mix starts
+        await self.create_trip(user)
+        while time.perf_counter() < deadline:
+            scenario = random.choices(scenarios, weights=weights)[0]  # noqa: S311
+            await scenario(user)
+
+
+def summarize(samples: Samples, duration: float) -> dict[str, dict[str, float]]:
+    """Return count, errors, throughput and latency percentiles per endpoint."""
+    report = {}
+    for endpoint, latencies in sorted(samples.latencies.items()):
+        cuts = (
+            statistics.quantiles(latencies, n=100, method="inclusive")
+            if len(latencies) > 1
+            else [latencies[0]] * 99
+        )
+        report[endpoint] = {
+            "count": len(latencies),
+            "errors": samples.errors[endpoint],
+            "rps": len(latencies) / duration,
+            "p50_ms": cuts[49] * 1000,
+            "p95_ms": cuts[94] * 1000,
+            "p99_ms": cuts[98] * 1000,
+        }
+    return report
+
+
+def print_report(report: dict[str, dict[str, float]]) -> None:
+    """Print the per endpoint report as a table."""
+    header = f"{'endpoint':<34}{'count':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header)  # noqa: T201
+    print("-" * len(header))  # noqa: T201
+    for endpoint, row in report.items():
+        print(  # noqa: T201
+            f"{endpoint:<34}{row['count']:>8}{row['errors']:>8}{row['rps']:>9.1f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+        )
+
+
+def compare_to_baseline(
+    report: dict[str, dict[str, float]], name: str, max_regression: float
+) -> list[str]:
+    """Return endpoints whose p95 regressed more than max_regression against the baseline."""
+    baseline = json.loads((BASELINE_DIR / f"{name}.json").read_text())["endpoints"]
+    regressions = []
+    for endpoint, row in report.items():
+        if endpoint not in baseline:
+            continue
+        before, after = baseline[endpoint]["p95_ms"], row["p95_ms"]
+        if after > before * (1 + max_regression):
+            regressions.append(f"{endpoint}: p95 {before:.1f}ms -> {after:.1f}ms")
+    return regressions
+
+
+def start_api(
+    args: argparse.Namespace, auth_url: str, sms_url: str
+) -> subprocess.Popen:
+    """Serve benchmarks.app with uvicorn and wait until it reports ready."""
+    env = {
+        **os.environ,
+        "SUPABASE_URL": auth_url,
+        "BENCH_SMS_URL": sms_url,
+        # benchmarks measure throughput, not the admission limits
+        "RATE_LIMIT_ENABLED": "false",
+        "METRICS_ENABLED": "false",
+    }
+    process = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "benchmarks.app:app",
+            "--port",
+            str(args.port),
+            "--workers",
+            str(args.workers),
+            "--loop",
+            "uvloop",
+            "--http",
+            "httptools",
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            response = httpx.get(
+                f"http://127.0.0.1:{args.port}{API_PREFIX}/health/ready"
+            )
+        except httpx.TransportError:
+            time.sleep(0.2)
+            continue
+        if response.is_success:
+            return process
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API was not ready within 30s")
+
+
+async def drive(args: argparse.Namespace, state: SharedState) -> Samples:
+    """Run every virtual user concurrently until the configured duration elapses."""
+    samples = Samples()
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=30
+    ) as client:
+        driver = Driver(client, state, samples)
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(
+            *(
+                driver.run(state.users[i % len(state.users)], deadline)
+                for i in range(args.concurrency)
+            )
+        )
+    return samples
+
+
+def main() -> None:
+    """Run the load test and report, save or compare results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--auth-latency", type=float, default=0.02)
+    parser.add_argument("--auth-error-rate", type=float, default=0.0)
+    parser.add_argument("--sms-latency", type=float, default=0.1)
+    parser.add_argument("--sms-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--baseline", metavar="NAME")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    auth = FakeAuthServer(FaultProfile(args.auth_latency, args.auth_error_rate)).start()
+    sms = FakeSmsServer(FaultProfile(args.sms_latency, args.sms_error_rate)).start()
+    users = bench_users(args.users)
+    seed_users(users)
+    api = start_api(args, auth.url, sms.url)
+    try:
+        samples = asyncio.run(drive(args, SharedState(users=users, sms_url=sms.url)))
+    finally:
+        api.terminate()
+        api.wait()
+        auth.stop()
+        sms.stop()
+
+    report = summarize(samples, args.duration)
+    print_report(report)
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        config = {
+            k: v
+            for k, v in vars(args).items()
+            if k not in {"save_baseline", "baseline"}
+        }
+        (BASELINE_DIR / f"{args.save_baseline}.json").write_text(
+            json.dumps({"config": config, "endpoints": report}, indent=2) + "\n"
+        )
+    if args.baseline:
+        regressions = compare_to_baseline(report, args.baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")  # noqa: T201
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark UserPublic serialization throughput with and without read-time phone validation.
+
+Run with `python -m benchmarks.serialization`.
+"""
+
+import argparse
+import timeit
+import uuid
+
+from pydantic import field_validator
+
+from src.models.models import User, UserPublic, clean_and_validate_phone
+
+
+class LegacyUserPublic(UserPublic):
+    """UserPublic as it was before phones were normalized on write."""
+
+    @field_validator("phone", mode="before")
+    @classmethod
+    def validate_phone(cls, v: str) -> str | None:
+        return clean_and_validate_phone(v)
+
+
+def build_users(count: int) -> list[User]:
+    """Build unsaved ORM users with canonical phone numbers."""
+    return [
+        User(
+            id=uuid.uuid4(),
+            phone=f"+1555{index:07d}",
+            firstname="First",
+            lastname="Last",
+            username=f"user{index}",
+            is_onboarded=True,
+        )
+        for index in range(count)
+    ]
+
+
+def measure(model: type[UserPublic], users: list[User], repeat: int) -> float:
+    """Return users serialized per second for the given read model."""
+
+    def serialize() -> None:
+        for user in users:
+            model.model_validate(user).model_dump(by_alias=True)
+
+    best = min(timeit.repeat(serialize, number=1, repeat=repeat))
+    return len(users) / best
+
+
+def main() -> None:
+    """Print serialization throughput before and after dropping read-time validation."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    users = build_users(args.users)
+    before = measure(LegacyUserPublic, users, args.repeat)
+    after = measure(UserPublic, users, args.repeat)
+    print(f"before (validator on read): {before:>12,.0f} users/s")  # noqa: T201
+    print(f"after  (canonical on write): {after:>12,.0f} users/s")  # noqa: T201
+    print(f"speedup: {after / before:.2f}x")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Compare worker memory of src.server with and without preloading the app.
+
+Starts the server once per mode, waits until the workers have warmed up and reads
+the supervisor's and each worker's memory from /proc. PSS splits shared pages
+between the processes sharing them, so it is the number that drops when workers
+share the preloaded app copy on write; RSS counts shared pages in full for every
+worker. With preload the supervisor holds the imported app too, so its PSS is
+part of the total.
+
+    python -m benchmarks.server_memory --workers 4
+
+Linux only. Warmup does not need a reachable database, a failed pool warmup
+still finishes and is reported by /health/ready.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+MODES = ("--preload", "--no-preload")
+
+
+def memory_kb(pid: int) -> dict[str, int]:
+    """Return Rss, Pss and private (unshared) memory of a process in kB."""
+    fields = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        name, value, *_ = line.split()
+        fields[name.rstrip(":")] = int(value)
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def workers_of(pid: int) -> list[int]:
+    """Pids of the supervisor's worker processes."""
+    children = Path(f"/proc/{pid}/task/{pid}/children").read_text()
+    return [int(child) for child in children.split()]
+
+
+def wait_until_warm(port: int, timeout: float) -> None:
+    """Poll readiness until a worker reports its warmup finished."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = httpx.get(f"http://127.0.0.1:{port}/api/v1/health/ready")
+        except httpx.TransportError:
+            time.sleep(0.2)
+            continue
+        if response.json()["data"]["warmupSeconds"] is not None:
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f"server was not warm within {timeout}s")
+
+
+def measure(
+    mode: str, args: argparse.Namespace
+) -> tuple[dict[str, int], list[dict[str, int]]]:
+    """Run the server in one mode and return memory of the supervisor and each worker."""
+    process = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "src.server",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(args.port),
+            "--workers",
+            str(args.workers),
+            mode,
+        ],
+        env={**os.environ, "METRICS_ENABLED": "false"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_warm(args.port, args.timeout)
+        # readiness answers from one worker, give the others time to finish too
+        time.sleep(args.settle)
+        workers = [memory_kb(pid) for pid in workers_of(process.pid)]
+        return memory_kb(process.pid), workers
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main() -> None:
+    """Measure both modes and print supervisor, per worker and total memory."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--settle", type=float, default=3)
+    args = parser.parse_args()
+
+    header = f"{'mode':<13} {'supervisor pss MB':>18} {'pss/worker MB':>14} {'rss/worker MB':>14} {'private/worker MB':>18} {'total pss MB':>13}"
+    print(header)  # noqa: T201
+    print("-" * len(header))  # noqa: T201
+    totals = {}
+    for mode in MODES:
+        supervisor, workers = measure(mode, args)
+        count = len(workers)
+        worker_pss = sum(worker["pss"] for worker in workers) / 1024
+        totals[mode] = supervisor["pss"] / 1024 + worker_pss
+        print(  # noqa: T201
+            f"{mode.removeprefix('--'):<13}"
+            f" {supervisor['pss'] / 1024:>18.1f}"
+            f" {worker_pss / count:>14.1f}"
+            f" {sum(worker['rss'] for worker in workers) / count / 1024:>14.1f}"
+            f" {sum(worker['private'] for worker in workers) / count / 1024:>18.1f}"
+            f" {totals[mode]:>13.1f}"
+        )
+    saved = totals["--no-preload"] - totals["--preload"]
+    print(f"preload saves {saved:.1f} MB across {args.workers} workers")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
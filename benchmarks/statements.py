@@ -0,0 +1,218 @@
+"""Per query overhead of hot route statements, built per call and prebuilt.
+
+Runs the statements of get_trips, get_invited_users and get_invitations through
+an ORM session the way the routes do. Each runs once as the routes used to build
+it, select() per call, and once from src.core.statements, each with psycopg
+prepared statements off and on. Time spent inside the driver's cursor.execute
+is reported as database time, the rest of each execution as Python time.
+
+    python -m benchmarks.statements --iterations 2000
+
+Needs the usual POSTGRES_* settings pointing at a disposable local database.
+"""
+
+import argparse
+import time
+import uuid
+from collections.abc import Callable
+from datetime import UTC, date, datetime, timedelta
+
+from sqlalchemy import Engine, Select, event
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, create_engine, select
+
+from benchmarks.load import BENCH_NAMESPACE
+from src.core import db, statements
+from src.core.config import settings
+from src.core.soft_delete import trip_is_live
+from src.models.models import Invitation, InvitationEnum, Trip, User
+
+USER_ID = uuid.uuid5(BENCH_NAMESPACE, "statements-user")
+
+
+def seed(trips: int) -> uuid.UUID:
+    """Seed trips the benchmark user is invited to, returning one trip's id."""
+    trip_ids = [
+        uuid.uuid5(BENCH_NAMESPACE, f"statements-trip-{n}") for n in range(trips)
+    ]
+    start = datetime.now(UTC).date() + timedelta(days=7)
+    with Session(db.engine) as session:
+        session.execute(
+            insert(User)
+            .values(id=USER_ID, phone="+16669999999", firstname="Statements")
+            .on_conflict_do_nothing()
+        )
+        session.execute(
+            insert(Trip)
+            .values(
+                [
+                    {
+                        "id": trip_id,
+                        "owner": USER_ID,
+                        "title": f"Trip {n}",
+                        "start_date": start,
+                        "end_date": start + timedelta(days=2),
+                        "mountain": "Bench Peak",
+                    }
+                    for n, trip_id in enumerate(trip_ids)
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+        session.execute(
+            insert(Invitation)
+            .values(
+                [
+                    {
+                        "id": uuid.uuid5(trip_id, "owner"),
+                        "trip_id": trip_id,
+                        "user_id": USER_ID,
+                        "rsvp": InvitationEnum.PENDING,
+                    }
+                    for trip_id in trip_ids
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+        session.commit()
+    return trip_ids[0]
+
+
+# how the routes built their statements before src.core.statements
+def built_trips(user_id: uuid.UUID, today: date) -> tuple[Select, dict]:
+    """Build get_trips's statement per call."""
+    statement = (
+        select(Trip)
+        .options(selectinload(Trip.owner_user))
+        .join(Invitation, Trip.id == Invitation.trip_id)
+        .where(
+            Invitation.user_id == user_id,
+            Trip.deleted_at.is_(None),
+            Trip.end_date >= today,
+        )
+        .distinct()
+    )
+    return statement, {}
+
+
+def built_invited_users(trip_id: uuid.UUID) -> tuple[Select, dict]:
+    """Build get_invited_users's statement per call."""
+    statement = (
+        select(User, Invitation.rsvp)
+        .join(Invitation, Invitation.user_id == User.id)
+        .where(Invitation.trip_id == trip_id, trip_is_live(trip_id))
+    )
+    return statement, {}
+
+
+def built_invitations(user_id: uuid.UUID) -> tuple[Select, dict]:
+    """Build get_invitations's statement per call."""
+    statement = (
+        select(Invitation, Trip, User.firstname, User.lastname)
+        .join(Trip, Invitation.trip_id == Trip.id)
+        .join(User, Trip.owner == User.id)
+        .where(
+            Invitation.user_id == user_id,
+            Invitation.rsvp == InvitationEnum.PENDING,
+            Trip.deleted_at.is_(None),
+        )
+    )
+    return statement, {}
+
+
+def cases(trip_id: uuid.UUID) -> dict[str, dict[str, Callable[[], tuple]]]:
+    """Per route, the per call and the prebuilt way to get its statement and params."""
+    today = datetime.now(UTC).date()
+    return {
+        "get_trips": {
+            "built": lambda: built_trips(USER_ID, today),
+            "prebuilt": lambda: (
+                statements.UPCOMING_TRIPS,
+                {"user_id": USER_ID, "today": today},
+            ),
+        },
+        "get_invited_users": {
+            "built": lambda: built_invited_users(trip_id),
+            "prebuilt": lambda: (statements.INVITED_USERS, {"trip_id": trip_id}),
+        },
+        "get_invitations": {
+            "built": lambda: built_invitations(USER_ID),
+            "prebuilt": lambda: (
+                statements.PENDING_INVITATIONS,
+                {"user_id": USER_ID},
+            ),
+        },
+    }
+
+
+def measure(
+    engine: Engine, make: Callable[[], tuple], iterations: int
+) -> tuple[float, float]:
+    """Return Python and database microseconds per execution."""
+    in_driver = 0.0
+
+    def before(conn: object, *_: object) -> None:
+        conn.info["driver_start"] = time.perf_counter()
+
+    def after(conn: object, *_: object) -> None:
+        nonlocal in_driver
+        in_driver += time.perf_counter() - conn.info.pop("driver_start")
+
+    with Session(engine) as session:
+        # warm up the compiled cache and let psycopg reach its prepare threshold
+        for _ in range(10):
+            statement, params = make()
+            session.exec(statement, params=params).all()
+        event.listen(engine, "before_cursor_execute", before)
+        event.listen(engine, "after_cursor_execute", after)
+        try:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                statement, params = make()
+                session.exec(statement, params=params).all()
+            total = time.perf_counter() - started
+        finally:
+            event.remove(engine, "before_cursor_execute", before)
+            event.remove(engine, "after_cursor_execute", after)
+    per_query = 1e6 / iterations
+    return (total - in_driver) * per_query, in_driver * per_query
+
+
+def main() -> None:
+    """Seed, measure every route, build and prepare mode and print the comparison."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--trips", type=int, default=20)
+    args = parser.parse_args()
+
+    trip_id = seed(args.trips)
+    engines = {
+        "off": create_engine(
+            str(settings.sqlalchemy_database_uri),
+            connect_args={"prepare_threshold": None},
+        ),
+        "on": create_engine(
+            str(settings.sqlalchemy_database_uri),
+            connect_args={"prepare_threshold": settings.DB_PREPARE_THRESHOLD},
+        ),
+    }
+
+    header = (
+        f"{'route':<18} {'statement':<9} {'prepared':<8} {'python us':>10} {'db us':>8}"
+    )
+    print(header)  # noqa: T201
+    print("-" * len(header))  # noqa: T201
+    for route, ways in cases(trip_id).items():
+        for way, make in ways.items():
+            for prepared, engine in engines.items():
+                python_us, db_us = measure(engine, make, args.iterations)
+                print(  # noqa: T201
+                    f"{route:<18} {way:<9} {prepared:<8} {python_us:>10.1f} {db_us:>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Compare buffered and streamed responses of a large collection.
+
+Seeds the users table up to --rows users, then fetches GET /users once per mode
+from a fresh API process: buffered, streamed as a JSON array and streamed as
+NDJSON. Reports time to first byte, total time and how far the server's peak RSS
+(VmHWM) grew over its RSS before the request. The API restarts per mode because
+the high water mark never goes down.
+
+    python -m benchmarks.streaming --rows 50000
+
+Needs the usual POSTGRES_* settings pointing at a disposable local database.
+Linux only.
+"""
+
+import argparse
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+from benchmarks.fakes import FakeAuthServer, FaultProfile, bench_token
+from benchmarks.load import API_PREFIX, BENCH_NAMESPACE, start_api
+
+MODES = {"buffered": {}, "json": {"stream": "json"}, "ndjson": {"stream": "ndjson"}}
+
+
+def seed_rows(count: int) -> None:
+    """Insert benchmark users until count of them exist, in batches."""
+    from sqlalchemy.dialects.postgresql import insert
+    from sqlmodel import Session
+
+    from src.core.db import engine
+    from src.models.models import User
+
+    batch = 5000
+    with Session(engine) as session:
+        for start in range(0, count, batch):
+            rows = [
+                {
+                    "id": uuid.uuid5(BENCH_NAMESPACE, f"stream-{index}"),
+                    "phone": f"+1666{index:07d}",
+                    "firstname": "Stream",
+                    "lastname": str(index),
+                    "username": f"stream{index}",
+                    "is_onboarded": True,
+                }
+                for index in range(start, min(start + batch, count))
+            ]
+            session.execute(insert(User).values(rows).on_conflict_do_nothing())
+        session.commit()
+
+
+def memory_kb(pid: int) -> dict[str, int]:
+    """Return current and peak RSS of a process in kB."""
+    fields = {}
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        name, _, value = line.partition(":")
+        if name in ("VmRSS", "VmHWM"):
+            fields[name] = int(value.split()[0])
+    return fields
+
+
+def measure(mode: str, args: argparse.Namespace, auth_url: str) -> dict[str, float]:
+    """Fetch the collection once in mode from a fresh API process."""
+    user_id = uuid.uuid5(BENCH_NAMESPACE, "stream-0")
+    headers = {"Authorization": f"Bearer {bench_token(user_id, '+16660000000')}"}
+    api = start_api(args, auth_url, "http://127.0.0.1:9")
+    try:
+        before = memory_kb(api.pid)["VmRSS"]
+        started = time.perf_counter()
+        first_byte = None
+        size = 0
+        with httpx.stream(
+            "GET",
+            f"http://127.0.0.1:{args.port}{API_PREFIX}/users/",
+            params=MODES[mode],
+            headers=headers,
+            timeout=300,
+        ) as response:
+            response.raise_for_status()
+            for chunk in response.iter_raw():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                size += len(chunk)
+        total = time.perf_counter() - started
+        peak = memory_kb(api.pid)["VmHWM"]
+    finally:
+        api.terminate()
+        api.wait()
+    return {
+        "ttfb": first_byte or total,
+        "total": total,
+        "mb": size / 1024 / 1024,
+        "peak_growth_mb": (peak - before) / 1024,
+    }
+
+
+def main() -> None:
+    """Seed, measure every mode and print the comparison."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+    # start_api options the load driver would set
+    args.workers = 1
+
+    seed_rows(args.rows)
+    auth = FakeAuthServer(FaultProfile()).start()
+    try:
+        results = {mode: measure(mode, args, auth.url) for mode in MODES}
+    finally:
+        auth.stop()
+
+    header = f"{'mode':<9} {'ttfb ms':>9} {'total ms':>9} {'body MB':>8} {'peak rss +MB':>13}"
+    print(header)  # noqa: T201
+    print("-" * len(header))  # noqa: T201
+    for mode, result in results.items():
+        print(  # noqa: T201
+            f"{mode:<9} {result['ttfb'] * 1000:>9.1f} {result['total'] * 1000:>9.1f}"
+            f" {result['mb']:>8.1f} {result['peak_growth_mb']:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
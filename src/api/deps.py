@@ -1,27 +1,49 @@
 """Defines Dependencies to be injected into FastAPI endpoints."""
 
+import importlib
+import uuid
 from collections.abc import Generator
 from functools import lru_cache
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated
 
-from fastapi import Depends
+from fastapi import Depends, Header, HTTPException, Query, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from gotrue.errors import AuthApiError
-from gotrue.types import User
+from pydantic import BaseModel
 from sqlmodel import Session
-from supabase import Client, create_client
-from vonage import Auth, Vonage
-from vonage_sms import SmsMessage, SmsResponse
 
 from src.core.config import settings
 from src.core.db import engine
-from src.core.exceptions import InvalidTokenError
+from src.core.exceptions import InvalidTokenError, RateLimitExceededError
+from src.core.fieldsets import FieldSet
+from src.core.idempotency import STATE_CLAIM, acquire, fingerprint
+from src.core.images import ImageService, LocalImageStorage, SupabaseImageStorage
+from src.core.metrics import observe_outbound
+from src.core.rate_limit import limit_for, rate_limiter
+
+# the SDKs take over a second to import, they load on first use (during warmup)
+# so worker boot stays fast, see `import-budget`
+if TYPE_CHECKING:
+    from gotrue.types import User
+    from supabase import Client
+    from vonage import Vonage
+    from vonage_sms import SmsResponse
 
 security = HTTPBearer()
 
 
-def get_db() -> Generator[Session]:
-    """Return a DB session."""
+def import_sdks() -> None:
+    """Import the lazily loaded SDKs now, used by src.server before forking workers."""
+    for module in ("gotrue.errors", "supabase", "vonage", "vonage_sms"):
+        importlib.import_module(module)
+
+
+def get_db(request: Request) -> Generator[Session]:
+    """Return a DB session, the batch's shared one inside a batch sub-request."""
+    shared = getattr(request.state, "batch_session", None)
+    if shared is not None:
+        # the batch owns it and closes it once every sub-request is done
+        yield shared
+        return
     with Session(engine) as session:
         yield session
 
@@ -31,55 +53,151 @@ SessionDep = Annotated[Session, Depends(get_db)]
 
 
 @lru_cache(maxsize=1)  # caches function result
-def get_vonage_client() -> Vonage:
+def get_vonage_client() -> "Vonage":
     """Return Vonage Client."""
+    from vonage import Auth, Vonage
+
     return Vonage(
         Auth(api_key=settings.VONAGE_API_KEY, api_secret=settings.VONAGE_API_SECRET)
     )
 
 
-VonageDep = Annotated[Vonage, Depends(get_vonage_client)]
+VonageDep = Annotated["Vonage", Depends(get_vonage_client)]
 
 
-def get_supabase_client() -> Client:
+@lru_cache(maxsize=1)
+def get_supabase_client() -> "Client":
     """Return Supabase client."""
+    from supabase import create_client
+
     supabase: Client = create_client(
         supabase_key=settings.SUPABASE_KEY, supabase_url=settings.SUPABASE_URL
     )
     return supabase
 
 
-SupabaseDep = Annotated[Client, Depends(get_supabase_client)]
+SupabaseDep = Annotated["Client", Depends(get_supabase_client)]
 
 
-def get_current_user(
-    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
-    supabase: SupabaseDep,
-) -> User | None:
-    """Extract bearer token and validate it with supabase client. Return Validated User data."""
-    token = credentials.credentials
+@lru_cache(maxsize=1)
+def get_image_service() -> ImageService:
+    """Return the image service for the configured storage backend."""
+    if settings.IMAGE_STORAGE_BACKEND == "local":
+        storage = LocalImageStorage(
+            settings.IMAGE_LOCAL_DIR, settings.IMAGE_SIGNING_SECRET
+        )
+    else:
+        storage = SupabaseImageStorage(get_supabase_client(), settings.IMAGE_BUCKET)
+    return ImageService(storage)
+
+
+ImagesDep = Annotated[ImageService, Depends(get_image_service)]
+
+
+def authenticate_token(token: str, supabase: "Client") -> "User":
+    """Validate a bearer token with supabase client. Return Validated User data."""
+    from gotrue.errors import AuthApiError
+
+    resource = "Token"
     try:
-        user_response = supabase.auth.get_user(token)
+        with observe_outbound("supabase", "get_user"):
+            user_response = supabase.auth.get_user(token)
     except AuthApiError as exc:
-        resource = "Token"
         raise InvalidTokenError(resource, "12345") from exc
-    if not user_response.user:
+    if not user_response or not user_response.user:
         raise InvalidTokenError(resource, "12345")
     return user_response.user
 
 
-SecurityDep = Annotated[User, Depends(get_current_user)]
+def get_current_user(
+    request: Request,
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
+    supabase: SupabaseDep,
+) -> "User | None":
+    """Extract bearer token and validate it with supabase client. Return Validated User data."""
+    # sub-requests of a batch carry the batch's token, validated once by the batch
+    batch_user = getattr(request.state, "batch_user", None)
+    if batch_user is not None:
+        return batch_user
+    return authenticate_token(credentials.credentials, supabase)
+
+
+SecurityDep = Annotated["User", Depends(get_current_user)]
+
+
+class RateLimit:
+    """Dependency that takes a token from the current user's bucket for a route group."""
+
+    def __init__(self, route_group: str) -> None:
+        """Construct dependency for the route group whose limit is configured in settings."""
+        self.route_group = route_group
+
+    def __call__(self, user: SecurityDep) -> None:
+        """Raise RateLimitExceededError when the user's bucket is empty."""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        decision = rate_limiter.acquire(
+            f"{self.route_group}:{user.id}", limit_for(self.route_group)
+        )
+        if not decision.allowed:
+            raise RateLimitExceededError(self.route_group, decision.retry_after)
+
+
+async def claim_idempotency_key(
+    request: Request,
+    user: SecurityDep,
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
+) -> None:
+    """Run the route once per Idempotency-Key, replaying the stored response to retries."""
+    if idempotency_key is None:
+        return
+    request_hash = fingerprint(
+        request.method, request.url.path, request.url.query, await request.body()
+    )
+    user_id = uuid.UUID(str(user.id))
+    await acquire(user_id, idempotency_key, request_hash)
+    # IdempotencyMiddleware stores the response under the claim
+    setattr(request.state, STATE_CLAIM, (user_id, idempotency_key))
+
+
+class Fields:
+    """Dependency parsing the fields query parameter against a response DTO."""
+
+    def __init__(self, dto: type[BaseModel]) -> None:
+        """Construct dependency for the DTO the route responds with."""
+        self.dto = dto
+
+    def __call__(
+        self,
+        fields: Annotated[
+            str | None,
+            Query(
+                description="comma separated fields to return, e.g. id,title,owner.username"
+            ),
+        ] = None,
+    ) -> FieldSet:
+        """Return the picked fields, every field without the parameter."""
+        if not fields:
+            return FieldSet(self.dto)
+        try:
+            return FieldSet.parse(self.dto, fields)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
 
 # add validaiton to numbers everywher with pydantic and put this in dedicated service
 
 
-def send_sms_invte(phone: str, deep_link: str, client: Vonage) -> SmsResponse:
+def send_sms_invte(phone: str, deep_link: str, client: "Vonage") -> "SmsResponse":
     """Text an rsvp link to an invited user."""
+    from vonage_sms import SmsMessage
+
     message = SmsMessage(
         to=phone,
         from_=settings.VONAGE_NUMBER,
         text=f"You Have been invited to a trip, click here to RSVP, {deep_link}",
     )
 
-    response: SmsResponse = client.sms.send(message)
+    with observe_outbound("vonage", "sms_send"):
+        response: SmsResponse = client.sms.send(message)
     return response
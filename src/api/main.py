@@ -1,20 +1,59 @@
 """Group all API Routers and respective endpoints."""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, FastAPI
 
-from src.api.routes import cars, friendships, invites, trips, users
+from src.api.deps import RateLimit
+from src.api.routes import (
+    batch,
+    cars,
+    friendships,
+    health,
+    images,
+    invites,
+    live,
+    mountains,
+    sync,
+    trips,
+    users,
+)
+from src.core.config import settings
 
-api_router = APIRouter()
+root_router = APIRouter()
 
 
-@api_router.get("/")
+@root_router.get("/")
 def main() -> str:
     """Root API endpoint."""
     return "Hello World!"
 
 
-api_router.include_router(users.router)
-api_router.include_router(trips.router)
-api_router.include_router(cars.router)
-api_router.include_router(invites.router)
-api_router.include_router(friendships.router)
+def include_api(app: FastAPI) -> None:
+    """Serve every router under API_V1_STR.
+
+    Included into the app one by one, an intermediate router would make FastAPI
+    build every route and its response schemas once more at import.
+    """
+
+    def include(router: APIRouter, group: str | None = None) -> None:
+        dependencies = [Depends(RateLimit(group))] if group else []
+        app.include_router(
+            router, prefix=settings.API_V1_STR, dependencies=dependencies
+        )
+
+    include(root_router)
+    # probes come from the load balancer, unauthenticated and never rate limited
+    include(health.router)
+    # signed URLs are the authorization, like Supabase Storage signed URLs
+    if settings.IMAGE_STORAGE_BACKEND == "local":
+        include(images.router)
+    # every router is rate limited per user under its own route group
+    include(users.router, "users")
+    include(trips.router, "trips")
+    include(cars.router, "cars")
+    include(invites.router, "invites")
+    include(friendships.router, "friendships")
+    include(batch.router, "batch")
+    include(sync.router, "sync")
+    include(mountains.router, "mountains")
+    # the WebSocket authenticates itself, SSE streams are limited per route
+    include(live.router)
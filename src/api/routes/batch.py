@@ -0,0 +1,173 @@
+"""FastAPI endpoint running several API requests in one HTTP round trip.
+
+Sub-requests go through the app in process, with the middleware, routing,
+validation and rate limits of a normal request. The caller is authenticated once
+for the whole batch. Runs of consecutive GETs execute concurrently, each with a
+session of its own since a session cannot be shared between threads. Writes run
+one at a time in request order and share a single session, so a batch of writes
+checks out one pooled connection instead of one per write.
+"""
+
+import asyncio
+import json
+import logging
+from typing import TYPE_CHECKING, Any
+
+from fastapi import APIRouter, HTTPException, Request, status
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.types import Message
+
+from src.api.deps import SecurityDep
+from src.core.config import settings
+from src.core.db import engine
+from src.models.models import BatchItem, BatchRequest, BatchResult
+from src.models.shared import DTO
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+logger = logging.getLogger(__name__)
+
+# describe the outer request body, or belong to a single sub-request: a key on
+# the batch would be claimed by its first write and rejected for every other one
+SKIPPED_HEADERS = {
+    b"content-length",
+    b"content-type",
+    b"transfer-encoding",
+    b"idempotency-key",
+}
+PROTECTED_HEADERS = {"authorization", "content-length", "content-type", "host"}
+# copied from the batch request so sub-requests see the same client and server
+INHERITED_SCOPE_KEYS = ("asgi", "http_version", "scheme", "server", "client")
+
+
+async def dispatch(request: Request, item: BatchItem, state: dict) -> BatchResult:
+    """Run one sub-request through the app and capture its response."""
+    path, _, query = item.path.partition("?")
+    body = b"" if item.body is None else json.dumps(item.body).encode()
+    headers = [
+        (name, value)
+        for name, value in request.headers.raw
+        if name not in SKIPPED_HEADERS
+    ]
+    headers += [
+        (name.lower().encode(), value.encode())
+        for name, value in item.headers.items()
+        if name.lower() not in PROTECTED_HEADERS
+    ]
+    if body:
+        headers += [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+    full_path = settings.API_V1_STR + path
+    scope = {
+        **{
+            key: request.scope[key]
+            for key in INHERITED_SCOPE_KEYS
+            if key in request.scope
+        },
+        "type": "http",
+        "method": item.method,
+        "path": full_path,
+        "raw_path": full_path.encode(),
+        "root_path": request.scope.get("root_path", ""),
+        "query_string": query.encode(),
+        "headers": headers,
+        "state": state,
+    }
+
+    received = False
+
+    async def receive() -> Message:
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # the client stays connected until the sub-request is done
+        await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    content_type = ""
+    chunks: list[bytes] = []
+
+    async def send(message: Message) -> None:
+        nonlocal status_code, content_type
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            content_type = (
+                dict(message.get("headers", [])).get(b"content-type", b"").decode()
+            )
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        # answered 500 already, the error stops here instead of failing the batch
+        logger.exception("Batch item %s failed", item.id)
+        return BatchResult(id=item.id, status=status_code)
+    content = b"".join(chunks)
+    parsed: Any = content.decode(errors="replace") or None
+    if content and content_type.startswith("application/json"):
+        parsed = json.loads(content)
+    return BatchResult(id=item.id, status=status_code, body=parsed)
+
+
+@router.post("/", response_model=DTO[list[BatchResult]])
+async def run_batch(batch: BatchRequest, request: Request, user: SecurityDep) -> dict:
+    """Run the sub-requests and return their results in request order.
+
+    GETs between two writes run concurrently, a write waits for everything before
+    it. Items fail independently, each result carries its own status.
+    """
+    if len(batch.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch holds at most {settings.BATCH_MAX_REQUESTS} requests.",
+        )
+    nested = [item.id for item in batch.requests if item.path.startswith("/batch")]
+    if nested:
+        raise HTTPException(status_code=400, detail=f"Batches cannot nest: {nested}")
+
+    # lifespan state of the batch request, plus what sub-requests reuse from it
+    state = {**request.scope.get("state", {}), "batch_user": user}
+    # bounds the pooled connections the concurrent reads of one batch hold
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+    async def read(item: BatchItem) -> BatchResult:
+        async with semaphore:
+            try:
+                async with asyncio.timeout(settings.BATCH_ITEM_TIMEOUT_SECONDS):
+                    return await dispatch(request, item, state)
+            except TimeoutError:
+                return BatchResult(id=item.id, status=status.HTTP_504_GATEWAY_TIMEOUT)
+
+    results: list[BatchResult] = []
+    reads: list[Awaitable[BatchResult]] = []
+    with Session(engine) as shared:
+        for item in batch.requests:
+            if item.method == "GET":
+                reads.append(read(item))
+                continue
+            results += await asyncio.gather(*reads)
+            reads = []
+            # not timed out, a write given up on would keep running in its thread
+            # on the shared session while the next write uses it
+            result = await dispatch(request, item, {**state, "batch_session": shared})
+            if result.status >= status.HTTP_400_BAD_REQUEST:
+                # leave nothing half flushed for the next write
+                await run_in_threadpool(shared.rollback)
+            results.append(result)
+        results += await asyncio.gather(*reads)
+    logger.info(
+        "Ran batch of %d requests for %s, %d failed",
+        len(results),
+        user.id,
+        sum(result.status >= status.HTTP_400_BAD_REQUEST for result in results),
+    )
+    return {"data": results}
@@ -1,13 +1,27 @@
 """FastAPI endpoints for retrieving and querying car data."""
 
 import logging
+from typing import Annotated
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import selectinload
 from sqlmodel import select
 
-from src.api.deps import SecurityDep, SessionDep, get_current_user
+from src.api.deps import (
+    Fields,
+    SecurityDep,
+    SessionDep,
+    claim_idempotency_key,
+    get_current_user,
+)
 from src.core.exceptions import ResourceNotFoundError
+from src.core.fieldsets import FieldSet, load_partial
+from src.core.idempotency import IdempotentRoute
+from src.core.query_budget import QueryBudget
+from src.core.realtime import notify_trip
+from src.core.soft_delete import get_live_trip, trip_is_live
+from src.core.statements import ARCHIVED_CARS
 from src.models.models import (
     Car,
     CarCreate,
@@ -15,10 +29,13 @@ from src.models.models import (
     Passenger,
     PassengerCreate,
     PassengerPublic,
+    User,
 )
 from src.models.shared import DTO
 
-router = APIRouter(prefix="/trips/{trip_id}/cars", tags=["cars"])
+router = APIRouter(
+    prefix="/trips/{trip_id}/cars", tags=["cars"], route_class=IdempotentRoute
+)
 
 logger = logging.getLogger(__name__)
 
@@ -26,13 +43,41 @@ logger = logging.getLogger(__name__)
 @router.get(
     "/",
     response_model=DTO[list[CarPublic]],
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(QueryBudget(10)), Depends(get_current_user)],
 )
-def get_cars_for_trip(trip_id: str, session: SessionDep) -> dict:
-    """Return all cars for a trip."""
+def get_cars_for_trip(
+    trip_id: str,
+    session: SessionDep,
+    fields: Annotated[FieldSet, Depends(Fields(CarPublic))],
+) -> dict | JSONResponse:
+    """Return all cars for a trip, only the requested fields with fields set."""
+    if fields.partial:
+        rows = (
+            session.execute(
+                select(*fields.columns(Car, "id")).where(
+                    Car.trip_id == trip_id, trip_is_live(trip_id)
+                )
+            )
+            .mappings()
+            .all()
+        )
+        cars_partial = [fields.construct(row) for row in rows]
+        owner_fields = fields.nested("owner")
+        if owner_fields is not None:
+            owners = load_partial(
+                session, User, owner_fields, (row["owner"] for row in rows)
+            )
+            for car, row in zip(cars_partial, rows, strict=True):
+                car.owner = owners.get(row["owner"])
+        return fields.response(cars_partial)
+
     cars = session.exec(
-        select(Car).where(Car.trip_id == trip_id).options(selectinload(Car.owner_user))
+        select(Car)
+        .where(Car.trip_id == trip_id, trip_is_live(trip_id))
+        .options(selectinload(Car.owner_user))
     ).all()
+    if not cars:
+        cars = session.exec(ARCHIVED_CARS, params={"trip_id": trip_id}).all()
 
     cars_public = [
         CarPublic(**car.model_dump(exclude={"owner"}), owner=car.owner_user)
@@ -46,7 +91,9 @@ def get_cars_for_trip(trip_id: str, session: SessionDep) -> dict:
 def get_car_by_id(trip_id: str, car_id: str, session: SessionDep) -> dict:
     """Return a car."""
     car = session.exec(
-        select(Car).where(Car.trip_id == trip_id, Car.id == car_id)
+        select(Car).where(
+            Car.trip_id == trip_id, Car.id == car_id, trip_is_live(trip_id)
+        )
     ).first()
     resource = "Car"
     if not car:
@@ -54,13 +101,21 @@ def get_car_by_id(trip_id: str, car_id: str, session: SessionDep) -> dict:
     return {"data": car}
 
 
-@router.post("/", response_model=DTO[CarPublic])
+@router.post(
+    "/",
+    response_model=DTO[CarPublic],
+    dependencies=[Depends(claim_idempotency_key)],
+)
 def create_car(
     trip_id: str, car: CarCreate, session: SessionDep, user: SecurityDep
 ) -> dict:
     """Create a new car."""
+    get_live_trip(session, trip_id)
     new_car = Car(**car.model_dump(), trip_id=trip_id, owner=user.id)
     session.add(new_car)
+    # the INSERT runs now instead of at commit so the event can carry the new id
+    session.flush()
+    notify_trip(session, trip_id, "car_created", car_id=new_car.id)
     session.commit()
     # Refresh to load both the new Car's data and its owner relationship.
     session.refresh(new_car, attribute_names=["owner_user"])
@@ -75,12 +130,15 @@ def create_car(
 @router.delete("/{car_id}", dependencies=[Depends(get_current_user)])
 def delete_car(trip_id: str, car_id: str, session: SessionDep) -> dict:
     """Delete a car."""
-    query = select(Car).where(Car.trip_id == trip_id, Car.id == car_id)
+    query = select(Car).where(
+        Car.trip_id == trip_id, Car.id == car_id, trip_is_live(trip_id)
+    )
     car = session.exec(query).first()
     resource = "Car"
     if not car:
         raise ResourceNotFoundError(resource, car_id)
     session.delete(car)
+    notify_trip(session, trip_id, "car_deleted", car_id=car_id)
     session.commit()
     return {"data": True}
 
@@ -97,14 +155,25 @@ def add_passenger(
     session: SessionDep,
 ) -> dict:
     """Add a passenger to a car."""
-    car = session.get(Car, car_id)
+    car = session.exec(
+        select(Car).where(
+            Car.trip_id == trip_id, Car.id == car_id, trip_is_live(trip_id)
+        )
+    ).first()
     resource = "Car"
-    if not car or car.trip_id != trip_id:
+    if not car:
         raise ResourceNotFoundError(resource, car_id)
 
     # TODO: fix logic and decide whether to have role based passenger selection
     new_passenger = Passenger(**passenger.model_dump(), car_id=car_id)
     session.add(new_passenger)
+    notify_trip(
+        session,
+        trip_id,
+        "passenger_added",
+        car_id=car_id,
+        user_id=new_passenger.user_id,
+    )
     session.commit()
     session.refresh(new_passenger)
     return {"data": new_passenger}
@@ -113,13 +182,17 @@ def add_passenger(
 @router.get(
     "/{car_id}/passengers",
     response_model=DTO[list[PassengerPublic]],
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(QueryBudget(4)), Depends(get_current_user)],
 )
 def get_passengers(trip_id: str, car_id: str, session: SessionDep) -> dict:
     """Return all passengers for a car."""
-    car = session.get(Car, car_id)
+    car = session.exec(
+        select(Car).where(
+            Car.trip_id == trip_id, Car.id == car_id, trip_is_live(trip_id)
+        )
+    ).first()
     resource = "Car"
-    if not car or car.trip_id != trip_id:
+    if not car:
         raise ResourceNotFoundError(resource, car_id)
     session.refresh(car)
     return {"data": car.passengers}
@@ -2,13 +2,23 @@
 
 import logging
 import uuid
+from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import selectinload
 from sqlmodel import and_, func, or_, select
 
-from src.api.deps import SecurityDep, SessionDep, get_current_user
+from src.api.deps import (
+    Fields,
+    ImagesDep,
+    SecurityDep,
+    SessionDep,
+    get_current_user,
+)
 from src.core.exceptions import ResourceNotFoundError
+from src.core.fieldsets import FieldSet, load_partial
+from src.core.query_budget import QueryBudget
 from src.models.models import (
     FriendRequestType,
     FriendshipCreate,
@@ -29,13 +39,16 @@ logger = logging.getLogger(__name__)
 @router.get(
     "/me",
     response_model=DTO[list[UserWithFriendshipInfo]],
+    dependencies=[Depends(QueryBudget(10))],
 )
-def get_friends(session: SessionDep, user: SecurityDep) -> dict:
+def get_friends(session: SessionDep, user: SecurityDep, images: ImagesDep) -> dict:
     """Fetch a friends list for a specific friend."""
     user: User = session.get(User, user.id)
     if not user:
         raise ResourceNotFoundError("User", user.id)
-    return {"data": user.friends_with_details}
+    friends = user.friends_with_details
+    images.attach(users=[friend.user for friend in friends])
+    return {"data": friends}
 
 
 @router.post("/", response_model=DTO[bool])
@@ -126,13 +139,19 @@ def create_friend_request(
 
 @router.get(
     "/{user_id}",
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(QueryBudget(10)), Depends(get_current_user)],
     response_model=DTO[list[FriendshipPublic]],
 )
 def get_friend_requests(
-    user_id: str, request_type: FriendRequestType | None, session: SessionDep
-) -> dict:
-    """Get incoming or outgoing friend requests based on request_type."""
+    user_id: str,
+    request_type: FriendRequestType | None,
+    session: SessionDep,
+    fields: Annotated[FieldSet, Depends(Fields(FriendshipPublic))],
+) -> dict | JSONResponse:
+    """Get incoming or outgoing friend requests based on request_type.
+
+    Only the requested fields with fields set.
+    """
     user = session.get(User, user_id)
     if not user:
         raise ResourceNotFoundError("User", user_id)
@@ -148,14 +167,28 @@ def get_friend_requests(
         user_involvement_condition = or_(
             Friendships.requester_id == user.id, Friendships.addressee_id == user.id
         )
+    condition = and_(
+        user_involvement_condition, Friendships.status == FriendshipStatus.PENDING
+    )
+    if fields.partial:
+        statement = select(*fields.columns(Friendships, "id")).where(condition)
+        rows = session.execute(statement).mappings().all()
+        friendships = [fields.construct(row) for row in rows]
+        # requester and addressee each load only when picked, one query apiece
+        for side in ("requester", "addressee"):
+            side_fields = fields.nested(side)
+            if side_fields is None:
+                continue
+            users = load_partial(
+                session, User, side_fields, (row[f"{side}_id"] for row in rows)
+            )
+            for friendship, row in zip(friendships, rows, strict=True):
+                setattr(friendship, side, users.get(row[f"{side}_id"]))
+        return fields.response(friendships)
+
     query = (
         select(Friendships)
-        .where(
-            and_(
-                user_involvement_condition,
-                Friendships.status == FriendshipStatus.PENDING,
-            )
-        )
+        .where(condition)
         .options(  # solve N + 1 query problem (sqlalchemy lazy load by defautl)
             selectinload(Friendships.requester),
             selectinload(Friendships.addressee),
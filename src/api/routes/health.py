@@ -0,0 +1,23 @@
+"""FastAPI endpoints for load balancer liveness and readiness probes."""
+
+from fastapi import APIRouter, Response, status
+
+from src.core.warmup import readiness
+from src.models.models import ReadinessPublic
+from src.models.shared import DTO
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live")
+def live() -> str:
+    """Report that the worker process is up."""
+    return "ok"
+
+
+@router.get("/ready", response_model=DTO[ReadinessPublic])
+def ready(response: Response) -> dict:
+    """Report whether this worker finished warming up and can take traffic."""
+    if not readiness.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"data": readiness}
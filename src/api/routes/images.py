@@ -0,0 +1,27 @@
+"""FastAPI endpoint serving images from local storage through signed URLs, for dev and tests."""
+
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import FileResponse
+
+from src.api.deps import ImagesDep
+from src.core.exceptions import ResourceNotFoundError
+from src.core.images import LocalImageStorage
+
+router = APIRouter(prefix="/images", tags=["images"])
+
+
+@router.get("/{path:path}")
+def get_image(
+    path: str, expires: int, signature: str, images: ImagesDep
+) -> FileResponse:
+    """Return the image file when the signature is valid and unexpired."""
+    storage = images.storage
+    file = None
+    if isinstance(storage, LocalImageStorage):
+        file = storage.verify(path, expires, signature)
+    if file is None:
+        raise ResourceNotFoundError("Image", path)
+    max_age = max(0, expires - int(time.time()))
+    return FileResponse(file, headers={"Cache-Control": f"private, max-age={max_age}"})
@@ -3,19 +3,31 @@
 import logging
 import urllib
 import uuid
+from collections.abc import Iterator
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlmodel import select
 
 from src.api.deps import (
+    RateLimit,
     SecurityDep,
     SessionDep,
     VonageDep,
+    claim_idempotency_key,
     get_current_user,
     send_sms_invte,
 )
+from src.core.conflicts import overlap_warnings
 from src.core.exceptions import InvalidTokenError, ResourceNotFoundError
+from src.core.fieldsets import FieldSet
+from src.core.idempotency import IdempotentRoute
+from src.core.query_budget import QueryBudget
+from src.core.realtime import notify_trip
+from src.core.soft_delete import get_live_trip, trip_is_live
+from src.core.statements import ARCHIVED_INVITED_USERS, INVITED_USERS
+from src.core.streaming import StreamFormat, row_batches, stream_items
 from src.models.models import (
     AttendanceList,
     ExternalInvitee,
@@ -24,13 +36,17 @@ from src.models.models import (
     InvitationCreate,
     InvitationEnum,
     InvitationUpdate,
+    InvitedUser,
     RegisteredInvitee,
-    Trip,
     User,
+    UserPublic,
+    clean_and_validate_phone,
 )
-from src.models.shared import DTO
+from src.models.shared import DTO, ConflictsDTO
 
-router = APIRouter(prefix="/trips/{trip_id}", tags=["invites"])
+router = APIRouter(
+    prefix="/trips/{trip_id}", tags=["invites"], route_class=IdempotentRoute
+)
 
 logger = logging.getLogger(__name__)
 
@@ -38,16 +54,22 @@ logger = logging.getLogger(__name__)
 @router.get(
     "/invites",
     response_model=DTO[AttendanceList],
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(QueryBudget(8)), Depends(get_current_user)],
 )
-def get_invited_users(trip_id: str, session: SessionDep) -> dict:
-    """Return Invited Users for a trip."""
-    statement = (
-        select(User, Invitation.rsvp)
-        .join(Invitation, Invitation.user_id == User.id)
-        .where(Invitation.trip_id == trip_id)
-    )
-    users = session.exec(statement).all()
+def get_invited_users(
+    trip_id: str, session: SessionDep, stream: StreamFormat | None = None
+) -> dict | StreamingResponse:
+    """Return Invited Users for a trip.
+
+    With stream set the invitees are streamed from a server side cursor as a flat
+    list of InvitedUser instead of grouped by rsvp.
+    """
+    if stream is not None:
+        return stream_items(encoded_invitees(trip_id), stream)
+    params = {"trip_id": trip_id}
+    users = session.exec(INVITED_USERS, params=params).all()
+    if not users:
+        users = session.exec(ARCHIVED_INVITED_USERS, params=params).all()
     sorted_users = {"accepted": [], "pending": [], "uncertain": [], "declined": []}
 
     for user, rsvp in users:
@@ -57,10 +79,38 @@ def get_invited_users(trip_id: str, session: SessionDep) -> dict:
     return {"data": sorted_users}
 
 
+def encoded_invitees(trip_id: str) -> Iterator[list[bytes]]:
+    """Encode the invited users of a trip batch by batch, for a streamed response."""
+    statement = (
+        select(Invitation.rsvp, *FieldSet(UserPublic).columns(User))
+        .join(Invitation, Invitation.user_id == User.id)
+        .where(
+            Invitation.trip_id == trip_id,
+            Invitation.rsvp.is_not(None),
+            trip_is_live(trip_id),
+        )
+    )
+    for rows in row_batches(statement):
+        yield [
+            InvitedUser(rsvp=row["rsvp"], user=UserPublic.model_validate(row))
+            .model_dump_json(by_alias=True)
+            .encode()
+            for row in rows
+        ]
+
+
 @router.post(
     "/invites",
     response_model=DTO[InvitationBatchResponseData],
-    dependencies=[Depends(get_current_user)],
+    dependencies=[
+        # lookups still run per invitee, the budget covers a handful of invitees
+        Depends(QueryBudget(40)),
+        Depends(get_current_user),
+        # sms sends have their own, much smaller rate limit
+        Depends(RateLimit("sms")),
+        # retries replay the first response and never text anyone twice
+        Depends(claim_idempotency_key),
+    ],
 )
 def invite_users(  # noqa: PLR0912, PLR0915
     trip_id: uuid.UUID,
@@ -79,9 +129,7 @@ def invite_users(  # noqa: PLR0912, PLR0915
         raise HTTPException(
             status_code=400, detail="Please provide at least one user to invite."
         )
-    trip = session.get(Trip, trip_id)
-    if not trip:
-        raise ResourceNotFoundError("Trip", trip_id)
+    trip = get_live_trip(session, trip_id)
     invitations_to_create = []
     phone_numbers_that_failed = []
     for invite in payload.invitees:
@@ -119,7 +167,7 @@ def invite_users(  # noqa: PLR0912, PLR0915
             except Exception:
                 phone_numbers_that_failed.append(user.phone)
                 logger.exception(
-                    f"Failed to send SMS to user {user.id} at phone {user.phone}"  # noqa: G004
+                    "Failed to send SMS to user %s at phone %s", user.id, user.phone
                 )
             else:
                 # add invited users to trips in 'pending' state
@@ -162,7 +210,7 @@ def invite_users(  # noqa: PLR0912, PLR0915
                 except Exception:
                     phone_numbers_that_failed.append(invite.phone_number)
                     logger.exception(
-                        f"Failed to send SMS to user {user.id} at phone {user.phone}"  # noqa: G004
+                        "Failed to send SMS to phone %s", invite.phone_number
                     )
                 else:
                     # Create invitation as registered user
@@ -199,7 +247,7 @@ def invite_users(  # noqa: PLR0912, PLR0915
                 except Exception:
                     phone_numbers_that_failed.append(invite.phone_number)
                     logger.exception(
-                        f"Failed to send SMS to user {user.id} at phone {user.phone}"  # noqa: G004
+                        "Failed to send SMS to phone %s", invite.phone_number
                     )
                 else:
                     invitations_to_create.append(
@@ -212,6 +260,7 @@ def invite_users(  # noqa: PLR0912, PLR0915
 
     if invitations_to_create:
         session.add_all(invitations_to_create)
+        notify_trip(session, trip_id, "invitations", count=len(invitations_to_create))
         session.commit()
     if len(phone_numbers_that_failed) > 0:
         return {
@@ -230,10 +279,9 @@ def invite_users(  # noqa: PLR0912, PLR0915
     }
 
 
-# TODO: fix phone number comparison and fix in UI phone number validation input
 @router.patch(
     "/invites",
-    response_model=DTO[bool],
+    response_model=ConflictsDTO[bool],
     dependencies=[Depends(get_current_user)],
 )
 def rsvp(
@@ -242,18 +290,20 @@ def rsvp(
     invitation_update: InvitationUpdate,
     session: SessionDep,
 ) -> dict:
-    """RSVP to a trip invite."""
+    """RSVP to a trip invite.
+
+    Accepting lists the user's other accepted trips on overlapping dates in conflicts.
+    """
     if not invitation_update.invite_token:
         raise InvalidTokenError("Token", invitation_update.invite_token)
     current_user = session.get(User, user.id)
-    trip = session.get(Trip, trip_id)
+    trip = get_live_trip(session, trip_id)
     invitation = session.get(Invitation, invitation_update.invite_token)
 
     if not current_user:
         raise ResourceNotFoundError("User", user.id)
-    if not trip:
-        raise ResourceNotFoundError("Trip", trip_id)
-    if not invitation:
+    # an invitation answered under another trip's path would notify that trip
+    if not invitation or invitation.trip_id != trip.id:
         raise ResourceNotFoundError("Invitation", invitation_update.invite_token)
     if not invitation_update.rsvp:
         raise HTTPException(403, "Missing RSVP update")
@@ -262,9 +312,9 @@ def rsvp(
     if invitation.rsvp is not InvitationEnum.PENDING or invitation.claim_user_id:
         raise HTTPException(409, "Invitation has already been RSVP'd")
 
-    if invitation.registered_phone and user.phone != invitation.registered_phone:
-        logger.info(invitation.registered_phone)
-        logger.info(user.phone)
+    if invitation.registered_phone and not same_phone(
+        user.phone, invitation.registered_phone
+    ):
         raise HTTPException(403, "User is not the intended external invitee")
 
     if invitation.user_id and current_user.id != invitation.user_id:
@@ -274,9 +324,33 @@ def rsvp(
     invitation.claim_user_id = user.id
     invitation.user_id = user.id
     session.add(invitation)
+    notify_trip(
+        session,
+        invitation.trip_id,
+        "rsvp",
+        invitation_id=invitation.id,
+        rsvp=invitation.rsvp,
+    )
+    conflicts = (
+        overlap_warnings(session, user.id, trip)
+        if invitation.rsvp == InvitationEnum.ACCEPTED
+        else []
+    )
     session.commit()
 
-    return {"data": True}
+    return {"data": True, "conflicts": conflicts}
+
+
+def same_phone(auth_phone: str | None, registered_phone: str) -> bool:
+    """Whether the auth phone is the canonical registered phone.
+
+    registered_phone is stored canonical, the auth phone is not. An auth phone that
+    is not a valid number matches nothing.
+    """
+    try:
+        return clean_and_validate_phone(auth_phone) == registered_phone
+    except ValueError:
+        return False
 
 
 def generate_invite_link(trip_id: str | UUID, invitation_id: str | UUID) -> str:
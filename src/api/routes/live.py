@@ -0,0 +1,114 @@
+"""FastAPI endpoints streaming trip change events over Server-Sent Events and WebSocket."""
+
+import asyncio
+import json
+import logging
+import uuid
+from collections.abc import AsyncGenerator
+
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocketState
+
+from src.api.deps import (
+    RateLimit,
+    SecurityDep,
+    SupabaseDep,
+    authenticate_token,
+)
+from src.core.config import settings
+from src.core.db import engine
+from src.core.exceptions import InvalidTokenError, ResourceNotFoundError
+from src.core.realtime import Subscription, broker
+from src.core.statements import TRIP_MEMBERSHIP
+
+router = APIRouter(prefix="/trips/{trip_id}", tags=["live"])
+
+logger = logging.getLogger(__name__)
+
+
+def can_view_trip(trip_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    """Return whether the user is invited to the trip, owners included."""
+    # own short lived session, a stream must not hold a pooled connection
+    with Session(engine) as session:
+        params = {"trip_id": trip_id, "user_id": user_id}
+        return session.exec(TRIP_MEMBERSHIP, params=params).first() is not None
+
+
+async def sse_stream(subscription: Subscription) -> AsyncGenerator[str]:
+    """Format events as SSE messages, with comment lines as heartbeats."""
+    yield "retry: 3000\n\n"
+    async for event in subscription.events(settings.REALTIME_HEARTBEAT_SECONDS):
+        if event is None:
+            yield ": keep-alive\n\n"
+            continue
+        yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+@router.get("/events", dependencies=[Depends(RateLimit("live"))])
+async def trip_events(trip_id: uuid.UUID, user: SecurityDep) -> StreamingResponse:
+    """Stream change events of a trip as Server-Sent Events."""
+    if not await run_in_threadpool(can_view_trip, trip_id, user.id):
+        raise ResourceNotFoundError("Trip", trip_id)
+
+    async def stream() -> AsyncGenerator[str]:
+        async with broker.subscribe(trip_id) as subscription:
+            async for message in sse_stream(subscription):
+                yield message
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # keep reverse proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def close_on_disconnect(websocket: WebSocket, subscription: Subscription) -> None:
+    """Read until the client goes away, then end its subscription."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            subscription.close()
+            return
+
+
+@router.websocket("/ws")
+async def trip_events_ws(
+    websocket: WebSocket,
+    trip_id: uuid.UUID,
+    supabase: SupabaseDep,
+    token: str | None = None,
+) -> None:
+    """Stream change events of a trip over a WebSocket.
+
+    The bearer token comes from the Authorization header, or the token query
+    parameter for clients that cannot set headers on a WebSocket.
+    """
+    token = token or websocket.headers.get("authorization", "").removeprefix("Bearer ")
+    try:
+        user = await run_in_threadpool(authenticate_token, token, supabase)
+    except InvalidTokenError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if not await run_in_threadpool(can_view_trip, trip_id, user.id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    async with broker.subscribe(trip_id) as subscription:
+        reader = asyncio.create_task(close_on_disconnect(websocket, subscription))
+        try:
+            # idle sockets are kept alive by uvicorn's protocol level pings
+            async for event in subscription.events(settings.REALTIME_HEARTBEAT_SECONDS):
+                if event is not None:
+                    await websocket.send_json(event)
+        except WebSocketDisconnect:
+            return
+        finally:
+            reader.cancel()
+    if websocket.client_state == WebSocketState.CONNECTED:
+        # closed by the server, slow consumer or shutdown
+        await websocket.close()
@@ -0,0 +1,33 @@
+"""FastAPI endpoints for the ski resort catalog, served from memory."""
+
+from typing import Annotated
+
+from fastapi import APIRouter, Query
+
+from src.core.config import settings
+from src.core.exceptions import ResourceNotFoundError
+from src.core.mountains import get_catalog
+from src.models.models import MountainPublic
+from src.models.shared import DTO
+
+router = APIRouter(prefix="/mountains", tags=["mountains"])
+
+
+@router.get("/", response_model=DTO[list[MountainPublic]])
+def autocomplete(
+    q: Annotated[str, Query(min_length=1, max_length=100)],
+    limit: Annotated[
+        int, Query(ge=1, le=settings.MOUNTAIN_AUTOCOMPLETE_MAX_LIMIT)
+    ] = settings.MOUNTAIN_AUTOCOMPLETE_LIMIT,
+) -> dict:
+    """Return the mountains with a name or alias word starting with q, for autocomplete."""
+    return {"data": get_catalog().complete(q, limit)}
+
+
+@router.get("/{mountain_id}", response_model=DTO[MountainPublic])
+def get_mountain(mountain_id: str) -> dict:
+    """Return a mountain of the catalog."""
+    mountain = get_catalog().get(mountain_id)
+    if mountain is None:
+        raise ResourceNotFoundError("Mountain", mountain_id)
+    return {"data": mountain}
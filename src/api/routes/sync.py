@@ -0,0 +1,274 @@
+"""FastAPI endpoint for delta sync of offline first clients.
+
+A sync runs in rounds. A round pages through every row changed after the round's
+since, each entity by keyset on (updated_at, primary key) so pages stay stable
+while rows keep changing. Once the last page of a round is served the cursor moves
+since to the start of the round, minus an overlap: updated_at is the start time of
+the writing transaction, so a row stamped before the round may commit after it was
+scanned. Rows in the overlap are sent twice, which clients absorb because every
+row is an upsert.
+"""
+
+import base64
+import binascii
+import json
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import ColumnElement, Select, or_, true, tuple_
+from sqlmodel import func, select
+
+from src.api.deps import SecurityDep, SessionDep
+from src.core.config import settings
+from src.core.query_budget import QueryBudget
+from src.core.soft_delete import trip_is_live
+from src.models.models import (
+    Car,
+    CarSync,
+    Friendships,
+    FriendshipSync,
+    Invitation,
+    InvitationSync,
+    Passenger,
+    PassengerSync,
+    SyncResponse,
+    Tombstone,
+    TombstonePublic,
+    Trip,
+    TripSync,
+)
+from src.models.shared import DTO
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+logger = logging.getLogger(__name__)
+
+DTOS: dict[str, type[BaseModel]] = {
+    "trips": TripSync,
+    "invitations": InvitationSync,
+    "cars": CarSync,
+    "passengers": PassengerSync,
+    "friendships": FriendshipSync,
+    "tombstones": TombstonePublic,
+}
+
+
+@dataclass
+class SyncCursor:
+    # None until the first round has finished, meaning a full sync
+    since: datetime | None = None
+    round_started: datetime | None = None
+    # entity name to the keyset position of the last row served this round
+    positions: dict[str, list[str]] = field(default_factory=dict)
+    done: list[str] = field(default_factory=list)
+
+    def encode(self) -> str:
+        """Opaque token handed to the client."""
+        payload = {
+            "since": self.since.isoformat() if self.since else None,
+            "round": self.round_started.isoformat() if self.round_started else None,
+            "positions": self.positions,
+            "done": self.done,
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "SyncCursor":
+        """Parse a token from encode, raising ValueError for anything else."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            payload = json.loads(raw)
+            return cls(
+                since=_parse_timestamp(payload["since"]),
+                round_started=_parse_timestamp(payload["round"]),
+                positions={
+                    entity: [str(value) for value in position]
+                    for entity, position in payload["positions"].items()
+                    if entity in DTOS
+                },
+                done=[entity for entity in payload["done"] if entity in DTOS],
+            )
+        except (
+            binascii.Error,
+            UnicodeDecodeError,
+            KeyError,
+            TypeError,
+            AttributeError,
+        ) as exc:
+            raise ValueError("malformed sync cursor") from exc
+
+
+def _parse_timestamp(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def changed_statements(
+    user_id: uuid.UUID, since: datetime | None
+) -> dict[str, tuple[Select, tuple[ColumnElement, ...]]]:
+    """Statement selecting the visible rows changed after since, per entity.
+
+    Each comes with its keyset columns, updated_at first. Trips the user joined
+    after since are sent whole, their rows may be older than since.
+    """
+    visible_trips = select(Invitation.trip_id).where(
+        Invitation.user_id == user_id, trip_is_live(Invitation.trip_id)
+    )
+
+    def changed(updated_at: ColumnElement, trip_id: ColumnElement) -> ColumnElement:
+        if since is None:
+            return true()
+        joined_trips = visible_trips.where(Invitation.updated_at > since)
+        return or_(updated_at > since, trip_id.in_(joined_trips))
+
+    def columns(model: type, dto: type[BaseModel]) -> list[ColumnElement]:
+        return [getattr(model, name) for name in dto.model_fields]
+
+    statements = {
+        "trips": (
+            select(*columns(Trip, TripSync)).where(
+                Trip.id.in_(visible_trips), changed(Trip.updated_at, Trip.id)
+            ),
+            (Trip.updated_at, Trip.id),
+        ),
+        "invitations": (
+            select(*columns(Invitation, InvitationSync)).where(
+                Invitation.trip_id.in_(visible_trips),
+                changed(Invitation.updated_at, Invitation.trip_id),
+            ),
+            (Invitation.updated_at, Invitation.id),
+        ),
+        "cars": (
+            select(*columns(Car, CarSync)).where(
+                Car.trip_id.in_(visible_trips), changed(Car.updated_at, Car.trip_id)
+            ),
+            (Car.updated_at, Car.id),
+        ),
+        "passengers": (
+            select(*columns(Passenger, PassengerSync))
+            .join(Car, Car.id == Passenger.car_id)
+            .where(
+                Car.trip_id.in_(visible_trips),
+                changed(Passenger.updated_at, Car.trip_id),
+            ),
+            (Passenger.updated_at, Passenger.car_id, Passenger.user_id),
+        ),
+        "friendships": (
+            select(*columns(Friendships, FriendshipSync)).where(
+                or_(
+                    Friendships.requester_id == user_id,
+                    Friendships.addressee_id == user_id,
+                ),
+                Friendships.updated_at > since if since is not None else true(),
+            ),
+            (Friendships.updated_at, Friendships.id),
+        ),
+    }
+    # a full sync has nothing local to delete
+    if since is not None:
+        statements["tombstones"] = (
+            select(
+                Tombstone.id,
+                Tombstone.entity,
+                Tombstone.entity_key,
+                Tombstone.deleted_at,
+            ).where(
+                Tombstone.audience.contains([user_id]),
+                Tombstone.deleted_at > since,
+            ),
+            (Tombstone.deleted_at, Tombstone.id),
+        )
+    return statements
+
+
+def after_position(
+    keyset: tuple[ColumnElement, ...], position: list[str]
+) -> ColumnElement:
+    """Rows ordered after the keyset position of the last row served."""
+    timestamp, *keys = position
+    values = [datetime.fromisoformat(timestamp)] + [
+        column.type.python_type(value)
+        for column, value in zip(keyset[1:], keys, strict=True)
+    ]
+    return tuple_(*keyset) > tuple_(*values)
+
+
+@router.get(
+    "/",
+    response_model=DTO[SyncResponse],
+    dependencies=[Depends(QueryBudget(8))],
+)
+def sync(
+    session: SessionDep,
+    user: SecurityDep,
+    since: Annotated[
+        str | None, Query(description="cursor of the previous page")
+    ] = None,
+    limit: Annotated[
+        int, Query(ge=1, le=settings.SYNC_MAX_PAGE_SIZE)
+    ] = settings.SYNC_PAGE_SIZE,
+) -> dict:
+    """Return what changed for the user since the cursor, limit rows per entity.
+
+    Without a cursor the first pages are a full sync.
+    """
+    try:
+        cursor = SyncCursor.decode(since) if since else SyncCursor()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor") from exc
+
+    now = session.scalar(select(func.now()))
+    reset = False
+    retention = timedelta(days=settings.TOMBSTONE_RETENTION_DAYS)
+    if cursor.since is not None and cursor.since < now - retention:
+        # deletes before the retention window are purged and cannot be replayed
+        cursor = SyncCursor()
+        reset = True
+    if cursor.round_started is None:
+        cursor.round_started = now
+
+    response: dict[str, Any] = {"reset": reset}
+    statements = changed_statements(uuid.UUID(str(user.id)), cursor.since)
+    for entity, (changed, keyset) in statements.items():
+        if entity in cursor.done:
+            continue
+        statement = changed.order_by(*keyset).limit(limit + 1)
+        position = cursor.positions.get(entity)
+        if position is not None:
+            try:
+                statement = statement.where(after_position(keyset, position))
+            except ValueError as exc:
+                raise HTTPException(
+                    status_code=400, detail="Invalid sync cursor"
+                ) from exc
+        rows = session.execute(statement).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            cursor.positions[entity] = [
+                getattr(last, column.key).isoformat()
+                if index == 0
+                else str(getattr(last, column.key))
+                for index, column in enumerate(keyset)
+            ]
+        else:
+            cursor.done.append(entity)
+            cursor.positions.pop(entity, None)
+        response[entity] = [DTOS[entity].model_validate(row) for row in rows]
+
+    has_more = any(entity not in cursor.done for entity in statements)
+    if not has_more:
+        # next round rescans the overlap for transactions that committed late
+        overlap = timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+        cursor = SyncCursor(since=cursor.round_started - overlap)
+    logger.debug(
+        "Synced %d rows for %s",
+        sum(len(rows) for rows in response.values() if isinstance(rows, list)),
+        user.id,
+    )
+    return {"data": SyncResponse(cursor=cursor.encode(), has_more=has_more, **response)}
@@ -3,50 +3,110 @@
 import logging
 import uuid
 from datetime import UTC, datetime
+from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import selectinload
-from sqlmodel import select
+from sqlmodel import func, select, update
 
 from src.api.deps import (
+    Fields,
+    ImagesDep,
     SecurityDep,
     SessionDep,
+    claim_idempotency_key,
     get_current_user,
 )
+from src.core.archive import past_trips
+from src.core.config import settings
+from src.core.conflicts import overlap_warnings
 from src.core.exceptions import ResourceNotFoundError
+from src.core.fieldsets import FieldSet, load_partial
+from src.core.idempotency import IdempotentRoute
+from src.core.mountains import mountain_id_for
+from src.core.query_budget import QueryBudget
+from src.core.realtime import notify_trip
+from src.core.search import SearchCursor, search_trips
+from src.core.soft_delete import get_live_trip
+from src.core.statements import (
+    ARCHIVED_TRIP_WITH_OWNER,
+    PAST_TRIPS,
+    TRIP_WITH_OWNER,
+    UPCOMING_TRIPS,
+)
 from src.models.models import (
     Invitation,
     Trip,
     TripCreate,
     TripPublic,
+    TripSearchPage,
     TripUpdate,
     User,
     UserPublic,
 )
-from src.models.shared import DTO
+from src.models.shared import DTO, ConflictsDTO
 
-router = APIRouter(prefix="/trips", tags=["trips"])
+router = APIRouter(prefix="/trips", tags=["trips"], route_class=IdempotentRoute)
 
 logger = logging.getLogger(__name__)
 
 
-@router.get("/", response_model=DTO[list[TripPublic]])
-def get_trips(session: SessionDep, user: SecurityDep, *, past: bool = False) -> dict:
-    """Return all trips for a user."""
+def checked_mountain_id(mountain: str, mountain_id: str | None) -> str | None:
+    """Resort id for a trip write, a 422 when the client sent an unknown one."""
+    try:
+        return mountain_id_for(mountain, mountain_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+
+@router.get(
+    "/", response_model=DTO[list[TripPublic]], dependencies=[Depends(QueryBudget(10))]
+)
+def get_trips(
+    session: SessionDep,
+    user: SecurityDep,
+    images: ImagesDep,
+    fields: Annotated[FieldSet, Depends(Fields(TripPublic))],
+    *,
+    past: bool = False,
+) -> dict | JSONResponse:
+    """Return all trips for a user, only the requested fields with fields set."""
     today_utc = datetime.now(UTC).date()
 
-    query = (
-        select(Trip)
-        .join(Invitation, Trip.id == Invitation.trip_id)
-        .options(selectinload(Trip.owner_user))
-        .where(
-            Invitation.user_id == user.id,
-            Trip.end_date < today_utc if past else Trip.end_date >= today_utc,
-        )
-        .distinct()
-    )
+    if fields.partial:
+        columns = fields.columns(Trip, "id")
+        if past:
+            names = [column.key for column in columns]
+            query = select(past_trips(user.id, today_utc, names))
+        else:
+            query = (
+                select(*columns)
+                .join(Invitation, Trip.id == Invitation.trip_id)
+                .where(
+                    Invitation.user_id == user.id,
+                    Trip.deleted_at.is_(None),
+                    Trip.end_date >= today_utc,
+                )
+                .distinct()
+            )
+        rows = session.execute(query).mappings().all()
+        trips_partial = [fields.construct(row) for row in rows]
+        owner_fields = fields.nested("owner")
+        if owner_fields is not None:
+            owners = load_partial(
+                session, User, owner_fields, (row["owner"] for row in rows)
+            )
+            for trip, row in zip(trips_partial, rows, strict=True):
+                trip.owner = owners.get(row["owner"])
+        if fields.wants("image") or (owner_fields and owner_fields.wants("avatar")):
+            images.attach(trips=trips_partial)
+        return fields.response(trips_partial)
 
-    trips = session.exec(query).all()
+    trips = session.exec(
+        PAST_TRIPS if past else UPCOMING_TRIPS,
+        params={"user_id": user.id, "today": today_utc},
+    ).all()
     trips_public = [
         TripPublic(
             **trip.model_dump(exclude={"owner"}),
@@ -54,21 +114,60 @@ def get_trips(session: SessionDep, user: SecurityDep, *, past: bool = False) ->
         )
         for trip in trips
     ]
+    # one signing batch for every trip image and owner avatar in the list
+    images.attach(trips=trips_public)
 
     return {"data": trips_public}
 
 
+@router.get(
+    "/search",
+    response_model=DTO[TripSearchPage],
+    dependencies=[Depends(QueryBudget(4))],
+)
+def search(  # noqa: PLR0913
+    session: SessionDep,
+    user: SecurityDep,
+    images: ImagesDep,
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    cursor: Annotated[
+        str | None, Query(description="cursor of the previous page")
+    ] = None,
+    limit: Annotated[
+        int, Query(ge=1, le=settings.TRIP_SEARCH_MAX_PAGE_SIZE)
+    ] = settings.TRIP_SEARCH_PAGE_SIZE,
+) -> dict:
+    """Return the user's trips, past and upcoming, whose title, mountain or description match q."""
+    try:
+        after = SearchCursor.decode(cursor) if cursor else None
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid search cursor") from exc
+
+    rows = session.exec(search_trips(user.id, q, limit, after)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_trip, last_rank = rows[-1]
+        next_cursor = SearchCursor(rank=last_rank, id=last_trip.id).encode()
+    trips_public = [
+        TripPublic(**trip.model_dump(exclude={"owner"}), owner=trip.owner_user)
+        for trip, _ in rows
+    ]
+    images.attach(trips=trips_public)
+    return {"data": TripSearchPage(trips=trips_public, cursor=next_cursor)}
+
+
 @router.get(
     "/{trip_id}",
     response_model=DTO[TripPublic],
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(QueryBudget(10)), Depends(get_current_user)],
 )
-async def get_trip(trip_id: str, session: SessionDep) -> dict:
+def get_trip(trip_id: str, session: SessionDep, images: ImagesDep) -> dict:
     """Return a specific trip for a user."""
-    query = (
-        select(Trip).options(selectinload(Trip.owner_user)).where(Trip.id == trip_id)
-    )
-    trip = session.exec(query).one_or_none()
+    params = {"trip_id": trip_id}
+    trip = session.exec(TRIP_WITH_OWNER, params=params).one_or_none()
+    if not trip:
+        trip = session.exec(ARCHIVED_TRIP_WITH_OWNER, params=params).one_or_none()
 
     resource = "Trip"
     if not trip:
@@ -77,15 +176,27 @@ async def get_trip(trip_id: str, session: SessionDep) -> dict:
     trip_public = TripPublic(
         **trip.model_dump(exclude={"owner"}), owner=trip.owner_user.model_dump()
     )
+    images.attach(trips=[trip_public])
     return {"data": trip_public}
 
 
-@router.post("/", response_model=DTO[TripPublic])
-async def create_trip(trip: TripCreate, user: SecurityDep, session: SessionDep) -> dict:
-    """Create a new trip and user as trip participant."""
+@router.post(
+    "/",
+    response_model=ConflictsDTO[TripPublic],
+    dependencies=[Depends(claim_idempotency_key)],
+)
+def create_trip(trip: TripCreate, user: SecurityDep, session: SessionDep) -> dict:
+    """Create a new trip and user as trip participant.
+
+    conflicts lists the owner's other accepted trips on overlapping dates.
+    """
     owner = user.id
-    new_trip = Trip(**trip.model_dump(), owner=owner)
-    logger.info("Adding new trip %s", new_trip)
+    new_trip = Trip(
+        **trip.model_dump(exclude={"mountain_id"}),
+        mountain_id=checked_mountain_id(trip.mountain, trip.mountain_id),
+        owner=owner,
+    )
+    logger.info("Adding new trip for owner %s", owner)
     session.add(new_trip)
     session.flush()
     # associate new trip with owner
@@ -104,7 +215,10 @@ async def create_trip(trip: TripCreate, user: SecurityDep, session: SessionDep)
         owner, from_attributes=True
     )  # convert User SQLModel obj to pydantic UserPublic model
     return {
-        "data": TripPublic(**new_trip.model_dump(exclude={"owner"}), owner=owner_public)
+        "data": TripPublic(
+            **new_trip.model_dump(exclude={"owner"}), owner=owner_public
+        ),
+        "conflicts": overlap_warnings(session, user.id, new_trip),
     }
 
 
@@ -113,17 +227,31 @@ async def create_trip(trip: TripCreate, user: SecurityDep, session: SessionDep)
     response_model=DTO[TripPublic],
     dependencies=[Depends(get_current_user)],
 )
-async def update_trip(trip: TripUpdate, trip_id: str, session: SessionDep) -> dict:
+def update_trip(
+    trip: TripUpdate,
+    trip_id: str,
+    session: SessionDep,
+    images: ImagesDep,
+    background_tasks: BackgroundTasks,
+) -> dict:
     """Update existing trip data and refetch updated trip with owner."""
-    trip_db = session.get(Trip, trip_id)
+    trip_db = get_live_trip(session, trip_id)
     resource = "Trip"
-    if not trip_db:
-        raise ResourceNotFoundError(resource, trip_id)
     trip_update_data = trip.model_dump(exclude_unset=True)
+    if "mountain" in trip_update_data or "mountain_id" in trip_update_data:
+        trip_update_data["mountain_id"] = checked_mountain_id(
+            trip_update_data.get("mountain") or trip_db.mountain,
+            trip_update_data.get("mountain_id"),
+        )
     trip_db.sqlmodel_update(trip_update_data)
     session.add(trip_db)
+    notify_trip(session, trip_id, "trip", fields=sorted(trip_update_data))
     session.commit()
     session.refresh(trip_db)
+    if trip_update_data.get("trip_image_storage_path"):
+        background_tasks.add_task(
+            images.generate_variants, trip_update_data["trip_image_storage_path"]
+        )
 
     # Re-query with eager loading to get the owner_user relationship.
     query = (
@@ -136,16 +264,20 @@ async def update_trip(trip: TripUpdate, trip_id: str, session: SessionDep) -> di
         **updated_trip.model_dump(exclude={"owner"}),
         owner=UserPublic.model_validate(updated_trip.owner_user),
     )
+    images.attach(trips=[response_trip])
     return {"data": response_trip}
 
 
 @router.delete("/{trip_id}", dependencies=[Depends(get_current_user)])
 def delete_trip(trip_id: str, session: SessionDep) -> dict:
-    """Delete the specified trip."""
-    trip_db = session.get(Trip, trip_id)
-    resource = "Trip"
-    if not trip_db:
-        raise ResourceNotFoundError(resource, trip_id)
-    session.delete(trip_db)
+    """Soft delete the specified trip, purge-trips removes its rows later."""
+    statement = (
+        update(Trip)
+        .where(Trip.id == trip_id, Trip.deleted_at.is_(None))
+        .values(deleted_at=func.now())
+        .returning(Trip.id)
+    )
+    if session.execute(statement).first() is None:
+        raise ResourceNotFoundError("Trip", trip_id)
     session.commit()
     return {"data": True}
@@ -1,21 +1,41 @@
 """FastAPI endpoints for querying and retrieving user data."""
 
 import logging
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
-from sqlmodel import and_, select
+from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi.responses import Response
+from sqlmodel import and_, func, select, update
 
-from src.api.deps import SecurityDep, SessionDep, get_current_user
+from src.api.deps import (
+    Fields,
+    ImagesDep,
+    SecurityDep,
+    SessionDep,
+    get_current_user,
+)
+from src.core.conflicts import conflicting_trips
+from src.core.counters import get_counters
 from src.core.exceptions import ResourceNotFoundError
+from src.core.fieldsets import FieldSet
+from src.core.images import ImageService
+from src.core.query_budget import QueryBudget
+from src.core.statements import PENDING_INVITATIONS
+from src.core.streaming import StreamFormat, row_batches, stream_items
 from src.models.models import (
     Invitation,
-    InvitationEnum,
     InvitationPublic,
-    Trip,
+    OnboardingResponseData,
+    TripConflict,
+    TripOverlap,
     User,
     UserPublic,
+    UserSummary,
     UserUpdate,
+    clean_and_validate_phone,
 )
 from src.models.shared import DTO
 
@@ -25,28 +45,95 @@ logger = logging.getLogger(__name__)
 
 
 @router.get(
-    "/", response_model=DTO[list[UserPublic]], dependencies=[Depends(get_current_user)]
+    "/",
+    response_model=DTO[list[UserPublic]],
+    dependencies=[Depends(QueryBudget(8)), Depends(get_current_user)],
 )
-def get_users(session: SessionDep) -> dict:
-    """Return every user in the database."""
-    users = session.exec(select(User)).all()
-    logger.info("Fetching Users %s", users)
-    return {"data": list(users)}
+def get_users(
+    session: SessionDep,
+    images: ImagesDep,
+    fields: Annotated[FieldSet, Depends(Fields(UserPublic))],
+    stream: StreamFormat | None = None,
+) -> dict | Response:
+    """Return every user in the database, only the requested fields with fields set.
+
+    With stream set the users are streamed from a server side cursor instead.
+    """
+    if stream is not None:
+        return stream_items(encoded_users(fields, images), stream)
+    if fields.partial:
+        rows = session.execute(select(*fields.columns(User, "id"))).mappings()
+        users = [fields.construct(row) for row in rows]
+    else:
+        users = [UserPublic.model_validate(user) for user in session.exec(select(User))]
+    if fields.wants("avatar"):
+        images.attach(users=users)
+    logger.info("Fetched %d users", len(users))
+    return fields.response(users) if fields.partial else {"data": users}
+
+
+def encoded_users(fields: FieldSet, images: ImageService) -> Iterator[list[bytes]]:
+    """Encode every user batch by batch, for a streamed response."""
+    include = fields.include()
+    for rows in row_batches(select(*fields.columns(User, "id"))):
+        users = [
+            fields.construct(row) if fields.partial else UserPublic.model_validate(row)
+            for row in rows
+        ]
+        if fields.wants("avatar"):
+            # one signing batch per batch of rows
+            images.attach(users=users)
+        yield [
+            user.model_dump_json(by_alias=True, include=include).encode()
+            for user in users
+        ]
+
+
+@router.get(
+    "/me/summary",
+    response_model=DTO[UserSummary],
+    dependencies=[Depends(QueryBudget(4))],
+)
+def get_summary(session: SessionDep, user: SecurityDep) -> dict:
+    """Return the home screen counts of the current user, read from one row."""
+    counters = get_counters(session, UUID(str(user.id)))
+    return {"data": UserSummary.model_validate(counters)}
+
+
+@router.get(
+    "/me/conflicts",
+    response_model=DTO[list[TripConflict]],
+    dependencies=[Depends(QueryBudget(2))],
+)
+def get_conflicts(session: SessionDep, user: SecurityDep) -> dict:
+    """Return the upcoming trips the user accepted that overlap another accepted trip."""
+    today_utc = datetime.now(UTC).date()
+    rows = session.exec(conflicting_trips(UUID(str(user.id)), today_utc)).all()
+    conflicts: dict[UUID, TripConflict] = {}
+    for trip, other in rows:
+        if trip.id not in conflicts:
+            conflicts[trip.id] = TripConflict(
+                trip=TripOverlap.model_validate(trip), overlaps=[]
+            )
+        conflicts[trip.id].overlaps.append(TripOverlap.model_validate(other))
+    return {"data": list(conflicts.values())}
 
 
 @router.get(
     "/{user_id}",
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(QueryBudget(8)), Depends(get_current_user)],
     response_model=DTO[UserPublic],
 )
-def get_user_by_id(user_id: UUID, session: SessionDep) -> dict:
+def get_user_by_id(user_id: UUID, session: SessionDep, images: ImagesDep) -> dict:
     """Return a specified user."""
     user = session.get(User, user_id)
     resource_type = "User"
     if not user:
         raise ResourceNotFoundError(resource_type, user_id)
-    logger.info("Successfully fetched user %s by ID: %s", user, user_id)
-    return {"data": user}
+    logger.info("Successfully fetched user by ID: %s", user_id)
+    user_public = UserPublic.model_validate(user)
+    images.attach(users=[user_public])
+    return {"data": user_public}
 
 
 @router.patch(
@@ -54,7 +141,13 @@ def get_user_by_id(user_id: UUID, session: SessionDep) -> dict:
     dependencies=[Depends(get_current_user)],
     response_model=DTO[UserPublic],
 )
-def update_user(user_id: UUID, user: UserUpdate, session: SessionDep) -> dict:
+def update_user(
+    user_id: UUID,
+    user: UserUpdate,
+    session: SessionDep,
+    images: ImagesDep,
+    background_tasks: BackgroundTasks,
+) -> dict:
     """Update a user."""
     user_db = session.get(User, user_id)
     if not user_db:
@@ -64,44 +157,72 @@ def update_user(user_id: UUID, user: UserUpdate, session: SessionDep) -> dict:
     session.add(user_db)
     session.commit()
     session.refresh(user_db)
-    return {"data": user_db}
+    if updated_user.get("avatar_storage_path"):
+        background_tasks.add_task(
+            images.generate_variants, updated_user["avatar_storage_path"]
+        )
+    user_public = UserPublic.model_validate(user_db)
+    images.attach(users=[user_public])
+    return {"data": user_public}
 
 
 @router.post(
     "/onboarding",
-    response_model=DTO[bool],
+    response_model=DTO[OnboardingResponseData],
 )
 def complete_onboarding(user: SecurityDep, session: SessionDep) -> dict:
-    """Mark the currently authenticated user as having completed onboarding and backfill user_id's to any pending invitations of the new user."""
+    """Mark the currently authenticated user as having completed onboarding and backfill user_id's to any pending invitations of the new user.
+
+    Returns the trip ids of the backfilled invitations so the client can prefetch them.
+    """
     user_db = session.get(User, user.id)
     if not user_db:
         raise ResourceNotFoundError("User", user.id)
 
     user_db.is_onboarded = True
+    # phone is written by supabase auth, store it in canonical form once here
+    try:
+        phone = clean_and_validate_phone(user_db.phone)
+    except ValueError:
+        # invites are stored canonical, a raw phone could never match one
+        logger.warning("Skipping invitation backfill, user %s has a bad phone", user.id)
+        phone = None
+    else:
+        user_db.phone = phone
     session.add(user_db)
 
-    # Backfill user_id for any invitations sent to this user's phone number
-    if user_db.phone:
-        invitations_to_update = session.exec(
-            select(Invitation).where(
+    # Backfill user_id for any invitations sent to this user's phone number in a single
+    # set based UPDATE, served by the partial index on unclaimed registered phones
+    backfilled_trip_ids: list[UUID] = []
+    if phone:
+        statement = (
+            update(Invitation)
+            .where(
                 and_(
-                    Invitation.registered_phone == user_db.phone,
+                    Invitation.registered_phone == phone,
                     Invitation.user_id.is_(None),
                 )
             )
-        ).all()
-
-        for invitation in invitations_to_update:
-            invitation.user_id = user.id
-            session.add(invitation)
+            # bulk updates skip the ORM onupdate, stamp them for delta sync
+            .values(user_id=user_db.id, updated_at=func.now())
+            .returning(Invitation.trip_id)
+        )
+        backfilled_trip_ids = list(session.execute(statement).scalars().all())
+        logger.info(
+            "Backfilled %d invitations for user %s", len(backfilled_trip_ids), user.id
+        )
 
     session.commit()
-    return {"data": True}
+    return {
+        "data": OnboardingResponseData(
+            is_onboarded=True, backfilled_trip_ids=backfilled_trip_ids
+        )
+    }
 
 
 @router.get(
     "/{user_id}/invites",
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(QueryBudget(10)), Depends(get_current_user)],
     response_model=DTO[list[InvitationPublic]],
 )
 def get_invitations(
@@ -115,18 +236,7 @@ def get_invitations(
             "Error User Not found with id %(user_id)s", {"user_id": user_id}
         )
         raise ResourceNotFoundError("User", user_id)
-    statement = (
-        select(Invitation, Trip, User.firstname, User.lastname)
-        .join(Trip, Invitation.trip_id == Trip.id)
-        .join(User, Trip.owner == User.id)
-        .where(
-            and_(
-                Invitation.user_id == user_id, Invitation.rsvp == InvitationEnum.PENDING
-            )
-        )
-    )
-
-    results = session.exec(statement).all()
+    results = session.exec(PENDING_INVITATIONS, params={"user_id": user_id}).all()
 
     invitations = []
     for invitation, trip, owner_firstname, owner_lastname in results:
@@ -0,0 +1,153 @@
+"""Archive of trips that ended long ago.
+
+archive-trips moves every trip that ended over TRIP_ARCHIVE_AFTER_DAYS ago, with
+its invitations, cars and passengers, from the hot tables into the *_archive
+tables. The hot tables then hold the current season only, which is all that
+upcoming trip queries and the mutation routes ever touch.
+
+Reads of past trips stay transparent. get_trips?past=true reads a union of both
+sides, and lookups of a single trip, its invitees or its cars fall back to the
+archive when the hot tables have nothing. Archived trips are read only. Delta
+sync clients keep them, because moving a trip records no tombstone.
+"""
+
+import logging
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from datetime import date
+
+from sqlalchemy import (
+    ColumnElement,
+    Subquery,
+    Table,
+    delete,
+    func,
+    insert,
+    select,
+    text,
+    union_all,
+)
+from sqlalchemy.orm import aliased
+from sqlmodel import Session
+
+from src.core.db import engine
+from src.models.models import (
+    Car,
+    Invitation,
+    Passenger,
+    Trip,
+    cars_archive,
+    invitations_archive,
+    passengers_archive,
+    trips_archive,
+)
+
+logger = logging.getLogger(__name__)
+
+# the ORM models loaded from their archive tables, matched by column name
+ArchivedTrip = aliased(Trip, trips_archive, adapt_on_names=True)
+ArchivedInvitation = aliased(Invitation, invitations_archive, adapt_on_names=True)
+ArchivedCar = aliased(Car, cars_archive, adapt_on_names=True)
+
+
+def stored_columns(table: Table) -> list[str]:
+    """Names of the columns of table that are written, not generated by Postgres."""
+    return [column.name for column in table.columns if column.computed is None]
+
+
+def past_trips(
+    user_id: ColumnElement | uuid.UUID | str,
+    today: ColumnElement | date,
+    names: Iterable[str] | None = None,
+) -> Subquery:
+    """Past trips the user is invited to, hot and archived, as one subquery.
+
+    Has the named trip columns, every stored one by default, under their Trip names.
+    """
+    names = list(names or stored_columns(Trip.__table__))
+    hot = (
+        select(*(Trip.__table__.c[name] for name in names))
+        .join(Invitation, Trip.id == Invitation.trip_id)
+        .where(
+            Invitation.user_id == user_id,
+            Trip.deleted_at.is_(None),
+            Trip.end_date < today,
+        )
+        .distinct()
+    )
+    archived = (
+        select(*(trips_archive.c[name] for name in names))
+        .join(invitations_archive, invitations_archive.c.trip_id == trips_archive.c.id)
+        .where(invitations_archive.c.user_id == user_id)
+        .distinct()
+    )
+    return union_all(hot, archived).subquery("past_trips")
+
+
+def _copy(session: Session, source: Table, target: Table, *where: object) -> None:
+    names = stored_columns(source)
+    rows = select(*(source.c[name] for name in names)).where(*where)
+    session.execute(insert(target).from_select(names, rows))
+
+
+def archive_ended_trips(
+    after_days: int, batch_size: int, pause: float = 0.0
+) -> Iterator[int]:
+    """Move trips that ended over after_days ago into the archive, yielding each batch's count.
+
+    Every batch is one transaction, a trip is either wholly hot or wholly
+    archived. Trips another run is busy with are skipped instead of waited for.
+    """
+    trips = Trip.__table__
+    invitations = Invitation.__table__
+    cars = Car.__table__
+    while True:
+        with Session(engine) as session:
+            # read by the tombstone triggers, clients keep what is archived
+            session.execute(text("SET LOCAL app.archiving = 'on'"))
+            picked = session.execute(
+                select(trips.c.id, trips.c.end_date)
+                .where(
+                    trips.c.end_date < func.current_date() - after_days,
+                    trips.c.deleted_at.is_(None),
+                )
+                .order_by(trips.c.end_date)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not picked:
+                return
+            for year in sorted({row.end_date.year for row in picked}):
+                session.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS public.trips_archive_{year:d} "
+                        "PARTITION OF public.trips_archive "
+                        f"FOR VALUES FROM ('{year:d}-01-01') TO ('{year + 1:d}-01-01')"
+                    )
+                )
+            ids = [row.id for row in picked]
+            _copy(session, trips, trips_archive, trips.c.id.in_(ids))
+            _copy(
+                session,
+                invitations,
+                invitations_archive,
+                invitations.c.trip_id.in_(ids),
+            )
+            _copy(session, cars, cars_archive, cars.c.trip_id.in_(ids))
+            _copy(
+                session,
+                Passenger.__table__,
+                passengers_archive,
+                Passenger.car_id.in_(select(cars.c.id).where(cars.c.trip_id.in_(ids))),
+            )
+            # invitations first, so the counter triggers still see their trip
+            session.execute(delete(invitations).where(invitations.c.trip_id.in_(ids)))
+            # cars and passengers go with the cascade
+            session.execute(delete(trips).where(trips.c.id.in_(ids)))
+            session.commit()
+        logger.info("Archived %d trips", len(ids))
+        yield len(ids)
+        if len(ids) < batch_size:
+            return
+        time.sleep(pause)
@@ -1,6 +1,21 @@
 """Defines CLI commands that are exposed in pyproject.toml and built into binaries in venv. Executable from CLI."""
 
+import argparse
+import json
+import os
 import subprocess
+import sys
+
+# imported on first use, importing any of them at boot is a regression
+LAZY_MODULES = ("supabase", "gotrue", "vonage", "vonage_sms", "rich", "PIL")
+COLD_IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import src.main
+elapsed = time.perf_counter() - started
+lazy = [name for name in sys.argv[1:] if name in sys.modules]
+print(json.dumps({"seconds": elapsed, "loaded": lazy}))
+"""
 
 
 def formatter() -> None:
@@ -13,3 +28,177 @@ def lint() -> None:
     """Run Ruff linter in current directory."""
     args = ["uv", "run", "ruff", "check", "."]
     subprocess.run(args, check=False)  # noqa: S603
+
+
+def import_profile() -> None:
+    """Print the modules that take longest to import when src.main is imported cold."""
+    parser = argparse.ArgumentParser(description=import_profile.__doc__)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument(
+        "--self", action="store_true", help="sort by own time, excluding submodules"
+    )
+    args = parser.parse_args()
+
+    # a fresh interpreter so nothing is already in sys.modules
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", "import src.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line.removeprefix("import time:").split("|")
+        rows.append((int(own), int(cumulative), module.strip()))
+    rows.sort(key=lambda row: row[0] if args.self else row[1], reverse=True)
+    print(f"{'self ms':>9} {'cumulative ms':>14}  module")  # noqa: T201
+    for own, cumulative, module in rows[: args.top]:
+        print(f"{own / 1000:9.1f} {cumulative / 1000:14.1f}  {module}")  # noqa: T201
+
+
+def cold_import(runs: int) -> tuple[float, list[str]]:
+    """Import src.main in fresh interpreters runs times.
+
+    Return the fastest import in seconds and every lazy module any run loaded.
+    Measured as production boots, rich is only loaded for local dev logging.
+    """
+    env = {**os.environ, "LOG_FORMAT": "json"}
+    results = []
+    for _ in range(runs):
+        result = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", COLD_IMPORT_SCRIPT, *LAZY_MODULES],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=env,
+        )
+        results.append(json.loads(result.stdout.splitlines()[-1]))
+    best = min(result["seconds"] for result in results)
+    loaded = sorted({name for result in results for name in result["loaded"]})
+    return best, loaded
+
+
+def import_budget() -> None:
+    """Exit non zero when cold importing src.main is over budget or loads a lazy SDK.
+
+    tests/test_import_budget.py asserts the same, this reports it from the CLI.
+    """
+    from src.core.config import settings
+
+    parser = argparse.ArgumentParser(description=import_budget.__doc__)
+    parser.add_argument("--budget", type=float, default=settings.IMPORT_BUDGET_SECONDS)
+    parser.add_argument(
+        "--runs", type=int, default=3, help="best run counts, noise only adds time"
+    )
+    args = parser.parse_args()
+
+    best, loaded = cold_import(args.runs)
+    print(f"cold import of src.main: {best:.3f}s, budget {args.budget:.3f}s")  # noqa: T201
+    failures = []
+    if best > args.budget:
+        failures.append("over budget, run import-profile to find the slow modules")
+    if loaded:
+        failures.append(f"imported at boot instead of on first use: {loaded}")
+    for failure in failures:
+        print(failure, file=sys.stderr)  # noqa: T201
+    sys.exit(1 if failures else 0)
+
+
+def purge_tombstones() -> None:
+    """Delete tombstones older than TOMBSTONE_RETENTION_DAYS, run daily from cron."""
+    from sqlmodel import Session, delete, func
+
+    from src.core.config import settings
+    from src.core.db import engine
+    from src.models.models import Tombstone
+
+    cutoff = func.now() - func.make_interval(0, 0, 0, settings.TOMBSTONE_RETENTION_DAYS)
+    with Session(engine) as session:
+        result = session.execute(delete(Tombstone).where(Tombstone.deleted_at < cutoff))
+        session.commit()
+    print(f"purged {result.rowcount} tombstones")  # noqa: T201
+
+
+def purge_idempotency_keys() -> None:
+    """Delete expired idempotency keys, run hourly from cron."""
+    from sqlmodel import Session, delete, func
+
+    from src.core.db import engine
+    from src.models.models import IdempotencyKey
+
+    with Session(engine) as session:
+        result = session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at < func.now())
+        )
+        session.commit()
+    print(f"purged {result.rowcount} idempotency keys")  # noqa: T201
+
+
+def purge_rate_limit_buckets() -> None:
+    """Delete rate limit buckets that have refilled completely, run hourly from cron."""
+    from sqlmodel import Session, delete, func
+
+    from src.core.db import engine
+    from src.core.rate_limit import SECONDS_PER_MINUTE
+    from src.models.models import RateLimitBucket
+
+    # a bucket untouched for a minute is full, the next request recreates it as such
+    cutoff = func.now() - func.make_interval(0, 0, 0, 0, 0, 0, SECONDS_PER_MINUTE)
+    with Session(engine) as session:
+        result = session.execute(
+            delete(RateLimitBucket).where(RateLimitBucket.refreshed_at < cutoff)
+        )
+        session.commit()
+    print(f"purged {result.rowcount} rate limit buckets")  # noqa: T201
+
+
+def purge_trips() -> None:
+    """Hard delete soft deleted trips past TRIP_PURGE_AFTER_HOURS, run hourly from cron."""
+    from datetime import timedelta
+
+    from src.core.config import settings
+    from src.core.soft_delete import purge_deleted_trips
+
+    batches = purge_deleted_trips(
+        timedelta(hours=settings.TRIP_PURGE_AFTER_HOURS),
+        settings.TRIP_PURGE_BATCH_SIZE,
+        settings.TRIP_PURGE_PAUSE_SECONDS,
+    )
+    print(f"purged {sum(batches)} trips")  # noqa: T201
+
+
+def archive_trips() -> None:
+    """Move trips that ended over TRIP_ARCHIVE_AFTER_DAYS ago to the archive, run nightly."""
+    from src.core.archive import archive_ended_trips
+    from src.core.config import settings
+
+    batches = archive_ended_trips(
+        settings.TRIP_ARCHIVE_AFTER_DAYS,
+        settings.TRIP_ARCHIVE_BATCH_SIZE,
+        settings.TRIP_ARCHIVE_PAUSE_SECONDS,
+    )
+    print(f"archived {sum(batches)} trips")  # noqa: T201
+
+
+def reconcile_counters() -> None:
+    """Recount every user's dashboard counters and fix drift, run nightly from cron."""
+    from src.core.config import settings
+    from src.core.counters import reconcile
+
+    drifted = sum(reconcile(settings.COUNTER_RECONCILE_BATCH_SIZE))
+    print(f"corrected counters of {drifted} users")  # noqa: T201
+
+
+def assign_mountains() -> None:
+    """Give trips written before the mountain catalog, hot and archived, their resort id."""
+    from src.core import mountains
+    from src.core.config import settings
+    from src.models.models import Trip, trips_archive
+
+    assigned = sum(
+        sum(mountains.assign_mountains(table, settings.MOUNTAIN_ASSIGN_BATCH_SIZE))
+        for table in (Trip.__table__, trips_archive)
+    )
+    print(f"assigned a mountain to {assigned} trips")  # noqa: T201
@@ -4,11 +4,15 @@ Env Variables are automatically imported and validated.
 """
 
 import logging
+import tempfile
+from pathlib import Path
+from typing import Literal
 
-from pydantic import PostgresDsn, computed_field
+from pydantic import PostgresDsn, computed_field, model_validator
 from pydantic_core import MultiHostUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from rich.logging import RichHandler
+
+from src.core.log_config import configure_logging
 
 uvicorn_logger = logging.getLogger("uvicorn")
 uvicorn_error_logger = logging.getLogger("uvicorn.error")
@@ -25,13 +29,6 @@ starlette_logger.propagate = False
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env")
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(name)s | %(message)s",
-        datefmt="[%X]",
-        handlers=[RichHandler(markup=True, show_path=True, rich_tracebacks=True)],
-    )
-
     PROJECT_NAME: str
     SUPABASE_URL: str
     SUPABASE_KEY: str
@@ -67,5 +64,144 @@ class Settings(BaseSettings):
     VONAGE_API_SECRET: str
     VONAGE_NUMBER: str
 
+    # seconds a request waits for a pooled connection before being shed with a 503
+    DB_POOL_TIMEOUT: float = 5.0
+    # per process pool, src.server derives both from DB_POOL_BUDGET and the worker count
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # connections one server instance may hold across all of its workers
+    DB_POOL_BUDGET: int = 20
+    # psycopg prepares a statement server side once a connection ran it this often
+    DB_PREPARE_THRESHOLD: int = 2
+    # prepared statements kept per connection, the least recently used is deallocated
+    DB_PREPARED_MAX: int = 200
+    # POSTGRES_HOST is PgBouncer in transaction mode, each transaction may land on
+    # another server connection, so nothing is prepared. Not needed from PgBouncer
+    # 1.21 with max_prepared_statements set
+    DB_PGBOUNCER_TRANSACTION_MODE: bool = False
+    # Postgres itself for the realtime LISTEN connection when POSTGRES_HOST is a pooler
+    POSTGRES_DIRECT_HOST: str | None = None
+    POSTGRES_DIRECT_PORT: int | None = None
+
+    # src.server, workers default to the cpus available to the container
+    SERVER_WORKERS: int | None = None
+    # longer than the load balancer idle timeout so it never reuses a closed socket
+    SERVER_KEEP_ALIVE: int = 75
+    SERVER_BACKLOG: int = 2048
+    # import the app once before forking so workers share its memory copy on write
+    SERVER_PRELOAD: bool = True
+
+    RATE_LIMIT_ENABLED: bool = True
+    # memory keeps buckets per worker, postgres shares them across every worker
+    RATE_LIMIT_BACKEND: Literal["memory", "postgres"] = "memory"
+    # requests per minute per user for each route group, unlisted groups use default
+    RATE_LIMITS: dict[str, int] = {"default": 120, "sms": 10, "mountains": 600}
+
+    METRICS_ENABLED: bool = True
+    # internal port, keep it off the public load balancer
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 9100
+    # workers flush snapshots here so the exporter can aggregate all of them
+    METRICS_DIR: Path = Path(tempfile.gettempdir()) / "ikonic-metrics"
+    METRICS_FLUSH_INTERVAL: float = 5.0
+
+    # what to do when a route goes over its QueryBudget, use raise in dev and test
+    QUERY_BUDGET_MODE: Literal["off", "log", "raise"] = "off"
+
+    # supabase stores images in IMAGE_BUCKET, local writes to IMAGE_LOCAL_DIR (dev and tests)
+    IMAGE_STORAGE_BACKEND: Literal["supabase", "local"] = "supabase"
+    IMAGE_BUCKET: str = "images"
+    IMAGE_LOCAL_DIR: Path = Path(tempfile.gettempdir()) / "ikonic-images"
+    # HMAC key of the URLs signed by the local backend, required with it
+    IMAGE_SIGNING_SECRET: str | None = None
+    IMAGE_SIGNED_URL_TTL: int = 3600
+    # cached URLs are re-signed this many seconds before they expire
+    IMAGE_SIGNED_URL_REFRESH_MARGIN: int = 300
+    IMAGE_URL_CACHE_SIZE: int = 50_000
+
+    REALTIME_ENABLED: bool = True
+    # events buffered per subscriber before a slow one is disconnected
+    REALTIME_SUBSCRIBER_BUFFER: int = 100
+    # SSE comment sent on idle streams so proxies keep them open
+    REALTIME_HEARTBEAT_SECONDS: float = 25.0
+
+    # sub-requests in one /batch call
+    BATCH_MAX_REQUESTS: int = 10
+    # GETs of one batch running at once, each holds a pooled connection
+    BATCH_CONCURRENCY: int = 4
+    # a GET sub-request still running after this answers 504, e.g. an event stream
+    BATCH_ITEM_TIMEOUT_SECONDS: float = 10.0
+
+    # stored responses of Idempotency-Key requests are replayed this long
+    IDEMPOTENCY_TTL_SECONDS: int = 86_400
+    # a duplicate waits this long for the first request before answering 409
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    # an unfinished key older than this is taken over, its worker likely died
+    IDEMPOTENCY_LOCK_SECONDS: int = 60
+
+    # rows fetched per round trip of a streamed response's server side cursor
+    STREAM_BATCH_SIZE: int = 500
+
+    # rows per entity in one /sync page, clients may ask for up to the max
+    SYNC_PAGE_SIZE: int = 200
+    SYNC_MAX_PAGE_SIZE: int = 1000
+    # updated_at is stamped at transaction start, rescan this far back for late commits
+    SYNC_OVERLAP_SECONDS: int = 60
+    # deletes are replayable this long, older sync cursors start over with a full sync
+    TOMBSTONE_RETENTION_DAYS: int = 30
+
+    # soft deleted trips are hard deleted by purge-trips once this old
+    TRIP_PURGE_AFTER_HOURS: int = 24
+    # trips hard deleted per transaction, each cascades to its children
+    TRIP_PURGE_BATCH_SIZE: int = 20
+    TRIP_PURGE_PAUSE_SECONDS: float = 0.2
+
+    # archive-trips moves trips that ended this long ago out of the hot tables
+    TRIP_ARCHIVE_AFTER_DAYS: int = 365
+    # trips moved per transaction, with their invitations, cars and passengers
+    TRIP_ARCHIVE_BATCH_SIZE: int = 100
+    TRIP_ARCHIVE_PAUSE_SECONDS: float = 0.2
+
+    # trips per /trips/search page, clients may ask for up to the max
+    TRIP_SEARCH_PAGE_SIZE: int = 20
+    TRIP_SEARCH_MAX_PAGE_SIZE: int = 100
+
+    # mountains per autocomplete response, clients may ask for up to the max
+    MOUNTAIN_AUTOCOMPLETE_LIMIT: int = 10
+    MOUNTAIN_AUTOCOMPLETE_MAX_LIMIT: int = 50
+    # trips given a mountain_id per transaction by assign-mountains
+    MOUNTAIN_ASSIGN_BATCH_SIZE: int = 500
+
+    # users recounted per transaction by reconcile-counters
+    COUNTER_RECONCILE_BATCH_SIZE: int = 500
+
+    # cold import of src.main allowed by the import-budget check
+    IMPORT_BUDGET_SECONDS: float = 2.0
+
+    # rich for local development, json writes from a background thread for production
+    LOG_FORMAT: Literal["rich", "json"] = "rich"
+    LOG_LEVEL: str = "INFO"
+    # records waiting for the writer thread, further records are dropped
+    LOG_QUEUE_SIZE: int = 10_000
+    # share of records below WARNING kept per logger name, e.g. {"src.api.routes": 0.1}
+    LOG_SAMPLE_RATES: dict[str, float] = {}
+
+    @model_validator(mode="after")
+    def check_rate_limits(self) -> "Settings":
+        """Refuse RATE_LIMITS without the default that unlisted route groups use."""
+        if "default" not in self.RATE_LIMITS:
+            raise ValueError('RATE_LIMITS must have a "default" limit')
+        return self
+
+    @model_validator(mode="after")
+    def check_image_signing_secret(self) -> "Settings":
+        """Refuse to start the local image backend without its own signing key."""
+        if self.IMAGE_STORAGE_BACKEND == "local" and not self.IMAGE_SIGNING_SECRET:
+            raise ValueError(
+                "IMAGE_SIGNING_SECRET is required with the local image backend"
+            )
+        return self
+
 
 settings = Settings()
+configure_logging(settings)
@@ -0,0 +1,109 @@
+"""Trips a user accepted on overlapping dates.
+
+A trip covers start_date through end_date, both days included. Every check
+compares daterange(start_date, end_date, '[]') with &&, the expression of the
+GiST index ix_trips_date_range, so Postgres finds overlapping trips in the index.
+It can also start from the user's invitations when they have fewer rows to
+check. Trips are never loaded into Python to be compared.
+"""
+
+import uuid
+from datetime import date
+
+from sqlalchemy import ColumnElement, Select, exists, func, literal_column
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+
+from src.models.models import Invitation, InvitationEnum, Trip, TripOverlap
+
+# both ends inside the range, a trip ending the 5th overlaps one starting the 5th
+INCLUSIVE = literal_column("'[]'")
+
+
+def trip_dates(
+    start_date: ColumnElement | date, end_date: ColumnElement | date
+) -> ColumnElement:
+    """Days of a trip as a daterange, inlined to match the indexed expression."""
+    return func.daterange(start_date, end_date, INCLUSIVE)
+
+
+def accepted_by(user_id: uuid.UUID, trip_id: ColumnElement) -> ColumnElement:
+    """Condition that the user accepted their invitation to the trip."""
+    # invitations stays inside the subquery even when the enclosing query joins it
+    return (
+        exists()
+        .where(
+            Invitation.trip_id == trip_id,
+            Invitation.user_id == user_id,
+            Invitation.rsvp == InvitationEnum.ACCEPTED,
+        )
+        .correlate_except(Invitation)
+    )
+
+
+def overlapping_trips(
+    user_id: uuid.UUID,
+    start_date: date,
+    end_date: date,
+    exclude: uuid.UUID | None = None,
+) -> Select:
+    """Select the live trips the user accepted on days of start_date to end_date.
+
+    The trip being checked is left out by its id, exclude.
+    """
+    statement = (
+        select(Trip)
+        .where(
+            trip_dates(Trip.start_date, Trip.end_date).op("&&")(
+                trip_dates(start_date, end_date)
+            ),
+            Trip.deleted_at.is_(None),
+            accepted_by(user_id, Trip.id),
+        )
+        .order_by(Trip.start_date, Trip.id)
+    )
+    if exclude is not None:
+        statement = statement.where(Trip.id != exclude)
+    return statement
+
+
+def overlap_warnings(
+    session: Session, user_id: uuid.UUID, trip: Trip
+) -> list[TripOverlap]:
+    """Return the other trips the user accepted on days of trip, for a write's response."""
+    overlapping = session.exec(
+        overlapping_trips(user_id, trip.start_date, trip.end_date, exclude=trip.id)
+    ).all()
+    return [TripOverlap.model_validate(other) for other in overlapping]
+
+
+def conflicting_trips(user_id: uuid.UUID, today: date) -> Select:
+    """Select pairs of live trips the user accepted that overlap, from today on.
+
+    Both orders of a pair are selected, each trip comes with everything it overlaps.
+    """
+    trip = aliased(Trip, name="trip")
+    other = aliased(Trip, name="other")
+    return (
+        select(trip, other)
+        .join(
+            Invitation,
+            (Invitation.trip_id == trip.id)
+            & (Invitation.user_id == user_id)
+            & (Invitation.rsvp == InvitationEnum.ACCEPTED),
+        )
+        .join(
+            other,
+            trip_dates(other.start_date, other.end_date).op("&&")(
+                trip_dates(trip.start_date, trip.end_date)
+            )
+            & (other.id != trip.id),
+        )
+        .where(
+            trip.end_date >= today,
+            trip.deleted_at.is_(None),
+            other.deleted_at.is_(None),
+            accepted_by(user_id, other.id),
+        )
+        .order_by(trip.start_date, trip.id, other.start_date, other.id)
+    )
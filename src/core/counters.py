@@ -0,0 +1,147 @@
+"""Per user dashboard counters.
+
+Triggers on invitations, friendships and trips keep a user_counters row per user
+current with every write, so the home screen reads one row instead of counting.
+The one change no write announces is a trip ending. A row remembers the earliest
+end_date among its upcoming trips and the count is redone once that date has
+passed. reconcile-counters recounts everyone to fix drift, e.g. after a hard
+delete that skipped the soft delete path.
+"""
+
+import logging
+import uuid
+from collections.abc import Iterator, Sequence
+from datetime import UTC, datetime
+
+from sqlalchemy import Date, ScalarSelect, cast, exists, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session
+
+from src.core.db import engine
+from src.models.models import (
+    Friendships,
+    FriendshipStatus,
+    Invitation,
+    InvitationEnum,
+    Trip,
+    User,
+    UserCounters,
+)
+
+logger = logging.getLogger(__name__)
+
+COUNTED = (
+    "upcoming_trips",
+    "pending_invitations",
+    "pending_friend_requests",
+    "upcoming_valid_until",
+)
+
+
+def true_counts(user_id: object) -> dict[str, ScalarSelect]:
+    """Build the counts of a user from the counted tables, by the rules of the triggers."""
+    today = cast(func.timezone("UTC", func.now()), Date)
+    live_invitations = (
+        select(Invitation.id)
+        .join(Trip, Trip.id == Invitation.trip_id)
+        .where(Invitation.user_id == user_id, Trip.deleted_at.is_(None))
+    )
+    upcoming = live_invitations.where(Trip.end_date >= today)
+    return {
+        "upcoming_trips": upcoming.with_only_columns(func.count()).scalar_subquery(),
+        "pending_invitations": live_invitations.with_only_columns(func.count())
+        .where(Invitation.rsvp == InvitationEnum.PENDING)
+        .scalar_subquery(),
+        "pending_friend_requests": select(func.count())
+        .where(
+            Friendships.addressee_id == user_id,
+            Friendships.status == FriendshipStatus.PENDING,
+        )
+        .scalar_subquery(),
+        "upcoming_valid_until": upcoming.with_only_columns(
+            func.min(Trip.end_date)
+        ).scalar_subquery(),
+    }
+
+
+def recount(session: Session, user_ids: Sequence[uuid.UUID]) -> list[UserCounters]:
+    """Rewrite the counters of user_ids from scratch, returning the rows that drifted.
+
+    Locks the existing rows first, so writes already bumping them commit before
+    the counts are taken and writes after wait to bump the recounted value.
+    """
+    session.execute(
+        select(UserCounters.user_id)
+        .where(UserCounters.user_id.in_(user_ids))
+        .with_for_update()
+    )
+    counts = true_counts(User.id)
+    rows = select(User.id, *counts.values()).where(User.id.in_(user_ids))
+    statement = insert(UserCounters).from_select(["user_id", *counts], rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[UserCounters.user_id],
+        set_={
+            **{name: statement.excluded[name] for name in COUNTED},
+            "updated_at": func.now(),
+        },
+        where=tuple_(
+            *(UserCounters.__table__.c[name] for name in COUNTED)
+        ).is_distinct_from(tuple_(*(statement.excluded[name] for name in COUNTED))),
+    ).returning(UserCounters)
+    return list(
+        session.scalars(statement, execution_options={"populate_existing": True}).all()
+    )
+
+
+def count_missing(session: Session) -> int:
+    """Insert the counters of every user without a row in one statement.
+
+    For bulk loads that ran with the triggers disabled, recounting batch by batch
+    would take longer than the load.
+    """
+    counts = true_counts(User.id)
+    rows = select(User.id, *counts.values()).where(
+        ~exists().where(UserCounters.user_id == User.id)
+    )
+    statement = (
+        insert(UserCounters)
+        .from_select(["user_id", *counts], rows)
+        .on_conflict_do_nothing()
+    )
+    # only UPDATE and DELETE keep their rowcount by default
+    result = session.execute(statement, execution_options={"preserve_rowcount": True})
+    return result.rowcount
+
+
+def get_counters(session: Session, user_id: uuid.UUID) -> UserCounters:
+    """Return the counters of a user, recounted first when missing or a trip ended."""
+    counters = session.get(UserCounters, user_id)
+    today = datetime.now(UTC).date()
+    stale = counters is None or (
+        counters.upcoming_valid_until is not None
+        and counters.upcoming_valid_until < today
+    )
+    if stale:
+        recount(session, [user_id])
+        session.commit()
+        counters = session.get(UserCounters, user_id, populate_existing=True)
+    return counters or UserCounters(user_id=user_id)
+
+
+def reconcile(batch_size: int) -> Iterator[int]:
+    """Recount every user batch_size at a time, yielding how many rows drifted."""
+    after = None
+    while True:
+        with Session(engine) as session:
+            batch = select(User.id).order_by(User.id).limit(batch_size)
+            if after is not None:
+                batch = batch.where(User.id > after)
+            user_ids = session.scalars(batch).all()
+            if not user_ids:
+                return
+            drifted = [counters.user_id for counters in recount(session, user_ids)]
+            session.commit()
+        if drifted:
+            logger.info("Corrected counters of users %s", drifted)
+        yield len(drifted)
+        after = user_ids[-1]
@@ -1,10 +1,39 @@
 """Connects to database using connection string and initializes ORM engine."""
 
+from typing import TYPE_CHECKING
+
+from sqlalchemy import event
 from sqlmodel import SQLModel, create_engine
 
 from src.core.config import settings
+from src.core.metrics import instrument_engine
+from src.core.query_budget import install_query_counter
+
+if TYPE_CHECKING:
+    import psycopg
+
+engine = create_engine(
+    url=str(settings.sqlalchemy_database_uri),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    connect_args={
+        "prepare_threshold": None
+        if settings.DB_PGBOUNCER_TRANSACTION_MODE
+        else settings.DB_PREPARE_THRESHOLD
+    },
+)
+
+
+@event.listens_for(engine, "connect")
+def _set_prepared_max(dbapi_connection: "psycopg.Connection", *_: object) -> None:
+    dbapi_connection.prepared_max = settings.DB_PREPARED_MAX
+
 
-engine = create_engine(url=str(settings.sqlalchemy_database_uri))
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+if settings.QUERY_BUDGET_MODE != "off":
+    install_query_counter(engine)
 
 
 def init_db() -> None:
@@ -5,12 +5,22 @@ Returns opaque error responses to avoid exposing internal implementation details
 """
 
 import logging
+import math
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
-from src.core.exceptions import InvalidTokenError, ResourceNotFoundError, SmsError
+from src.core.exceptions import (
+    IdempotencyKeyInProgressError,
+    IdempotencyKeyReusedError,
+    IdempotentReplayError,
+    InvalidTokenError,
+    RateLimitExceededError,
+    ResourceNotFoundError,
+    SmsError,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -22,29 +32,78 @@ def setup_exception_handlers(app: FastAPI) -> None:
     async def sqlalchemy_exception_handler(
         request: Request, exc: SQLAlchemyError
     ) -> JSONResponse:
-        logger.error("Database error on %s: %s", str(request.url), exc, exc_info=True)
+        logger.error("Database error on %s: %s", request.url, exc, exc_info=True)
         return JSONResponse(
             status_code=500,
             content={"detail": "Internal server error occured"},
         )
 
+    @app.exception_handler(PoolTimeoutError)
+    async def pool_timeout_exception_handler(
+        request: Request, exc: PoolTimeoutError
+    ) -> JSONResponse:
+        # every pooled connection stayed busy past DB_POOL_TIMEOUT, shed the request
+        logger.warning("Shedding load on %s: %s", request.url, exc)
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Service temporarily overloaded, please retry"},
+            headers={"Retry-After": "1"},
+        )
+
+    @app.exception_handler(RateLimitExceededError)
+    async def rate_limit_exception_handler(
+        request: Request, exc: RateLimitExceededError
+    ) -> JSONResponse:
+        logger.warning("%s on %s", str(exc), request.url)
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(math.ceil(exc.retry_after))},
+        )
+
+    @app.exception_handler(IdempotentReplayError)
+    async def idempotent_replay_handler(
+        request: Request, exc: IdempotentReplayError
+    ) -> Response:
+        logger.info("Replaying stored response on %s", request.url.path)
+        return Response(
+            content=exc.body,
+            status_code=exc.status_code,
+            media_type=exc.content_type,
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    @app.exception_handler(IdempotencyKeyReusedError)
+    async def idempotency_key_reused_handler(
+        request: Request, exc: IdempotencyKeyReusedError
+    ) -> JSONResponse:
+        logger.warning("%s on %s", str(exc), request.url.path)
+        return JSONResponse(status_code=422, content={"detail": str(exc)})
+
+    @app.exception_handler(IdempotencyKeyInProgressError)
+    async def idempotency_key_in_progress_handler(
+        request: Request, exc: IdempotencyKeyInProgressError
+    ) -> JSONResponse:
+        logger.warning("%s on %s", str(exc), request.url.path)
+        return JSONResponse(
+            status_code=409, content={"detail": str(exc)}, headers={"Retry-After": "1"}
+        )
+
     @app.exception_handler(ResourceNotFoundError)
     async def missing_resource_exception_handler(
         request: Request, exc: ResourceNotFoundError
     ) -> JSONResponse:
-        logger.error(
-            "Resource not found error on %s: %s", str(request.url), exc, exc_info=True
-        )
+        logger.info("Resource not found on %s: %s", request.url.path, exc)
         return JSONResponse(status_code=404, content={"detail": str(exc)})
 
     @app.exception_handler(InvalidTokenError)
     async def invalid_token_handler(request: Request, exc: InvalidTokenError) -> None:
-        logger.error("%s on %s", str(exc), str(request.url))
+        logger.error("%s on %s", str(exc), request.url)
         return JSONResponse(status_code=403, content={"detail": str(exc)})
 
     @app.exception_handler(SmsError)
     async def sms_error_handler(request: Request, exc: SmsError) -> None:
         logger.error(
-            "Sms error on %s with error %s", str(request.url), str(exc), exc_info=True
+            "Sms error on %s with error %s", request.url, str(exc), exc_info=True
         )
         return JSONResponse(status_code=500, content={"detail": str(exc)})
@@ -48,3 +48,46 @@ class SmsError(Exception):
         if self.request_id is not None:
             message += f" with ID: {request_id}"
         super().__init__(message)
+
+
+class RateLimitExceededError(Exception):
+    """Raised when a user has used up the request budget of a route group."""
+
+    def __init__(self, route_group: str, retry_after: float) -> None:
+        """Construct instance with the exhausted route group and seconds until a retry may succeed."""
+        self.route_group = route_group
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit exceeded for {route_group} requests")
+
+
+class QueryBudgetExceededError(Exception):
+    """Raised in dev and test when a route issues more DB queries than its budget."""
+
+
+class IdempotencyKeyReusedError(Exception):
+    """Raised when an Idempotency-Key comes back with a different request."""
+
+    def __init__(self, key: str) -> None:
+        """Construct instance with the reused key."""
+        self.key = key
+        super().__init__(f"Idempotency key {key} was already used for another request")
+
+
+class IdempotencyKeyInProgressError(Exception):
+    """Raised when the first request with an Idempotency-Key is still running."""
+
+    def __init__(self, key: str) -> None:
+        """Construct instance with the busy key."""
+        self.key = key
+        super().__init__(f"A request with idempotency key {key} is still in progress")
+
+
+class IdempotentReplayError(Exception):
+    """Raised to answer a retried request with its stored response instead of running the route."""
+
+    def __init__(self, status_code: int, content_type: str | None, body: bytes) -> None:
+        """Construct instance with the stored response."""
+        self.status_code = status_code
+        self.content_type = content_type
+        self.body = body
+        super().__init__(f"Replaying stored {status_code} response")
@@ -0,0 +1,164 @@
+"""Sparse fieldsets, the fields query parameter of collection endpoints.
+
+fields=title,startDate,owner.username picks response DTO fields by their JSON
+names, a dotted name picks fields of a nested DTO. Routes select only the columns
+behind the picked fields and skip loading relations nobody asked for. The
+response then carries just those fields, and the full DTO is never built.
+"""
+
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from typing import Any, get_args
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlmodel import Session, SQLModel, select
+
+# DTO fields built from a column of another name
+SOURCE_COLUMNS = {
+    "image": "trip_image_storage_path",
+    "avatar": "avatar_storage_path",
+    "requester": "requester_id",
+    "addressee": "addressee_id",
+}
+
+
+def nested_model(annotation: Any) -> type[BaseModel] | None:  # noqa: ANN401
+    """DTO inside a field annotation such as UserPublic, list[UserPublic] or X | None."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        model = nested_model(arg)
+        if model is not None:
+            return model
+    return None
+
+
+@dataclass(frozen=True)
+class FieldSet:
+    dto: type[BaseModel]
+    # field name to the FieldSet of a nested DTO, None for plain fields. None as a
+    # whole selects every field
+    selected: dict[str, "FieldSet | None"] | None = None
+
+    @classmethod
+    def parse(cls, dto: type[BaseModel], fields: str) -> "FieldSet":
+        """Build from comma separated JSON field names, raising ValueError for unknown ones."""
+        names = {
+            info.alias or name: name
+            for name, info in dto.model_fields.items()
+            if not info.exclude
+        }
+        selected: dict[str, FieldSet | None] = {}
+        subfields: defaultdict[str, list[str]] = defaultdict(list)
+        for raw in fields.split(","):
+            head, _, rest = raw.strip().partition(".")
+            if not head:
+                continue
+            name = names.get(head)
+            if name is None:
+                raise ValueError(
+                    f"Unknown field {head!r} of {dto.__name__}, "
+                    f"expected any of {sorted(names)}"
+                )
+            model = nested_model(dto.model_fields[name].annotation)
+            if rest and model is None:
+                raise ValueError(f"Field {head!r} has no nested fields")
+            if rest:
+                subfields[name].append(rest)
+            else:
+                selected[name] = cls(model) if model else None
+        for name, nested in subfields.items():
+            # a nested DTO picked whole wins over picks of its fields
+            if name not in selected:
+                model = nested_model(dto.model_fields[name].annotation)
+                selected[name] = cls.parse(model, ",".join(nested))
+        if not selected:
+            raise ValueError("fields picks no field")
+        return cls(dto, selected)
+
+    @property
+    def partial(self) -> bool:
+        """Whether only some fields were picked."""
+        return self.selected is not None
+
+    def wants(self, name: str) -> bool:
+        """Whether the field is part of the response."""
+        return self.selected is None or name in self.selected
+
+    def nested(self, name: str) -> "FieldSet | None":
+        """FieldSet of a nested DTO field, None when the field was not picked."""
+        if self.selected is None:
+            return FieldSet(nested_model(self.dto.model_fields[name].annotation))
+        return self.selected.get(name)
+
+    def columns(self, model: type[SQLModel], *always: str) -> list[Any]:
+        """Columns of model behind the picked fields, plus the always named ones."""
+        names = [*always]
+        for name in self.selected or self.dto.model_fields:
+            names += [name, SOURCE_COLUMNS.get(name)]
+        table_columns = model.__table__.columns
+        return [
+            getattr(model, name)
+            for name in dict.fromkeys(names)
+            if name is not None and name in table_columns
+        ]
+
+    def construct(self, values: Mapping[str, Any]) -> BaseModel:
+        """DTO holding just the given values, unvalidated since they come from the database."""
+        return self.dto.model_construct(
+            **{
+                name: value
+                for name, value in values.items()
+                if name in self.dto.model_fields
+            }
+        )
+
+    def include(self) -> dict[str, Any] | None:
+        """Pydantic include argument that serializes the picked fields only."""
+        if self.selected is None:
+            return None
+        include: dict[str, Any] = {}
+        for name, nested in self.selected.items():
+            if nested is None or nested.selected is None:
+                include[name] = True
+                continue
+            annotation = self.dto.model_fields[name].annotation
+            many = getattr(annotation, "__origin__", None) is list
+            include[name] = {"__all__": nested.include()} if many else nested.include()
+        return include
+
+    def response(self, items: Iterable[BaseModel]) -> JSONResponse:
+        """DTO envelope with the picked fields.
+
+        Returned as a response so FastAPI skips validating against the full DTO,
+        which would reject the missing fields.
+        """
+        include = self.include()
+        return JSONResponse(
+            {
+                "data": [
+                    item.model_dump(mode="json", by_alias=True, include=include)
+                    for item in items
+                ]
+            }
+        )
+
+
+def load_partial(
+    session: Session,
+    model: type[SQLModel],
+    fields: FieldSet,
+    ids: Iterable[uuid.UUID],
+) -> dict[uuid.UUID, BaseModel]:
+    """Load the picked fields of the rows with ids in one query, keyed by id."""
+    wanted = set(ids)
+    if not wanted:
+        return {}
+    statement = select(*fields.columns(model, "id")).where(model.id.in_(wanted))
+    return {
+        row["id"]: fields.construct(row)
+        for row in session.execute(statement).mappings()
+    }
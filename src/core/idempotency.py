@@ -0,0 +1,279 @@
+"""Idempotency-Key support for expensive POSTs.
+
+The first request with a key claims it in Postgres, shared by every worker, and
+runs the route. The middleware stores the response under the key, and a retry
+with the same key and body gets that response replayed without the route
+running again. A duplicate arriving while the first request still runs waits
+for it to finish. Keys are scoped per user and expire after
+IDEMPOTENCY_TTL_SECONDS.
+
+Only a response the route's endpoint produced is stored, IdempotentRoute marks
+when the endpoint starts. A dependency that rejects the request after the claim,
+e.g. the sms rate limit, releases the key, as do responses that tell the client
+to come back later: conflicts, rate limits and server errors.
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import logging
+import time
+import uuid
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import timedelta
+from enum import Enum
+from typing import Any
+
+from fastapi.routing import APIRoute
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.config import settings
+from src.core.db import engine
+from src.core.exceptions import (
+    IdempotencyKeyInProgressError,
+    IdempotencyKeyReusedError,
+    IdempotentReplayError,
+)
+from src.models.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+# request.state attribute naming the key a request claimed
+STATE_CLAIM = "idempotency_claim"
+# request.state attribute set once the route's endpoint started running
+STATE_ENDPOINT_STARTED = "idempotency_endpoint_started"
+MAX_POLL_DELAY = 0.5
+# retrying these can succeed, so they are never replayed
+RETRYABLE_STATUS_CODES = frozenset({409, 429})
+
+# state of the request the middleware is handling, for IdempotentRoute's endpoints
+_request_state: ContextVar[dict[str, Any] | None] = ContextVar(
+    "idempotency_request_state", default=None
+)
+
+
+class Claim(Enum):
+    ACQUIRED = "acquired"
+    IN_PROGRESS = "in_progress"
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status_code: int
+    content_type: str | None
+    body: bytes
+
+
+def fingerprint(method: str, path: str, query: str, body: bytes) -> str:
+    """Hash of what makes two requests the same request."""
+    digest = hashlib.sha256()
+    for part in (method.encode(), path.encode(), query.encode(), body):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def claim(user_id: uuid.UUID, key: str, request_hash: str) -> Claim | StoredResponse:
+    """Claim key for a request, or return what the earlier request with it left.
+
+    Raises IdempotencyKeyReusedError when the key was used for another request.
+    """
+    table = IdempotencyKey.__table__
+    now = func.now()
+    expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+    stale = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+    statement = (
+        insert(table)
+        .values(
+            user_id=user_id,
+            key=key,
+            fingerprint=request_hash,
+            locked_at=now,
+            expires_at=expires_at,
+        )
+        .on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.key],
+            set_={
+                "fingerprint": request_hash,
+                "status_code": None,
+                "content_type": None,
+                "body": None,
+                "locked_at": now,
+                "expires_at": expires_at,
+            },
+            # expired keys are free again, a claim whose worker died is taken over
+            where=or_(
+                table.c.expires_at < now,
+                and_(table.c.status_code.is_(None), table.c.locked_at < stale),
+            ),
+        )
+        .returning(table.c.key)
+    )
+    existing = select(
+        table.c.fingerprint, table.c.status_code, table.c.content_type, table.c.body
+    ).where(table.c.user_id == user_id, table.c.key == key)
+    with engine.begin() as connection:
+        if connection.execute(statement).first() is not None:
+            return Claim.ACQUIRED
+        row = connection.execute(existing).first()
+    if row is None:
+        # released between the two statements, claim again
+        return claim(user_id, key, request_hash)
+    if row.fingerprint != request_hash:
+        raise IdempotencyKeyReusedError(key)
+    if row.status_code is None:
+        return Claim.IN_PROGRESS
+    return StoredResponse(row.status_code, row.content_type, row.body)
+
+
+def complete(user_id: uuid.UUID, key: str, response: StoredResponse) -> None:
+    """Store the response of the request holding the claim on key."""
+    table = IdempotencyKey.__table__
+    statement = (
+        update(table)
+        .where(table.c.user_id == user_id, table.c.key == key)
+        .values(
+            status_code=response.status_code,
+            content_type=response.content_type,
+            body=response.body,
+        )
+    )
+    with engine.begin() as connection:
+        connection.execute(statement)
+
+
+def release(user_id: uuid.UUID, key: str) -> None:
+    """Drop an unfinished claim so a retry runs the route again."""
+    table = IdempotencyKey.__table__
+    statement = delete(table).where(
+        table.c.user_id == user_id, table.c.key == key, table.c.status_code.is_(None)
+    )
+    with engine.begin() as connection:
+        connection.execute(statement)
+
+
+async def acquire(user_id: uuid.UUID, key: str, request_hash: str) -> None:
+    """Return once this request holds key, waiting out a concurrent duplicate.
+
+    Raises IdempotentReplayError with the stored response when the key already
+    finished, IdempotencyKeyInProgressError when the wait runs out.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.05
+    while True:
+        outcome = await run_in_threadpool(claim, user_id, key, request_hash)
+        if outcome is Claim.ACQUIRED:
+            return
+        if isinstance(outcome, StoredResponse):
+            raise IdempotentReplayError(
+                outcome.status_code, outcome.content_type, outcome.body
+            )
+        if time.monotonic() + delay > deadline:
+            raise IdempotencyKeyInProgressError(key)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, MAX_POLL_DELAY)
+
+
+def _mark_started() -> None:
+    state = _request_state.get()
+    if state is not None:
+        state[STATE_ENDPOINT_STARTED] = True
+
+
+def mark_endpoint_start(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap endpoint to record in the request state that it started running."""
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_endpoint(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            _mark_started()
+            return await endpoint(*args, **kwargs)
+
+        return async_endpoint
+
+    @functools.wraps(endpoint)
+    def sync_endpoint(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        # runs in the threadpool, which copies the context and so sees the state
+        _mark_started()
+        return endpoint(*args, **kwargs)
+
+    return sync_endpoint
+
+
+class IdempotentRoute(APIRoute):
+    """Route class of routers with claim_idempotency_key routes.
+
+    Tells IdempotencyMiddleware which responses the endpoint produced.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:  # noqa: ANN401
+        """Construct the route around the marking endpoint."""
+        super().__init__(path, mark_endpoint_start(endpoint), **kwargs)
+
+
+def should_store(state: dict[str, Any], status_code: int) -> bool:
+    """Whether the response is the route's outcome, to replay to retries."""
+    return (
+        state.get(STATE_ENDPOINT_STARTED, False)
+        and status_code < 500  # noqa: PLR2004
+        and status_code not in RETRYABLE_STATUS_CODES
+    )
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware storing the response of requests that claimed an idempotency key."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Wrap the ASGI app."""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Capture the response and store it under the claimed key, if any."""
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        # the dependency records its claim in the request state, shared through scope
+        state = scope.setdefault("state", {})
+        token = _request_state.set(state)
+        status_code = 500
+        content_type = None
+        chunks: list[bytes] = []
+
+        async def capture(message: Message) -> None:
+            nonlocal status_code, content_type
+            if STATE_CLAIM in state:
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    headers = dict(message.get("headers", []))
+                    content_type = headers.get(b"content-type", b"").decode() or None
+                elif message["type"] == "http.response.body":
+                    chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except Exception:
+            if STATE_CLAIM in state:
+                await run_in_threadpool(release, *state[STATE_CLAIM])
+            raise
+        finally:
+            _request_state.reset(token)
+        if STATE_CLAIM not in state:
+            return
+        user_id, key = state[STATE_CLAIM]
+        if not should_store(state, status_code):
+            # nothing to replay, a retry has to run the route again
+            await run_in_threadpool(release, user_id, key)
+            return
+        stored = StoredResponse(status_code, content_type, b"".join(chunks))
+        try:
+            await run_in_threadpool(complete, user_id, key, stored)
+        except Exception:
+            # the response already went out, a retry waits out the lock and reruns
+            logger.exception("Storing the response for idempotency key %s failed", key)
@@ -0,0 +1,285 @@
+"""Image variants and signed URLs for trip images and avatars.
+
+When a storage path is set, a background task renders every variant (a square
+thumbnail, a card and a capped full size) as WebP next to the original. Responses
+then carry signed URLs for the variants instead of the original upload. URLs are
+signed in one batch per response and cached until shortly before they expire, so
+list views cost at most one signing call and usually none.
+"""
+
+import hashlib
+import hmac
+import io
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING, Protocol
+from urllib.parse import quote, urlencode
+
+from src.core.config import settings
+from src.core.metrics import observe_outbound
+from src.models.models import ImageUrls, TripPublic, UserPublic
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+# longest edge in pixels, the thumbnail is cropped square
+VARIANT_SIZES = {"thumbnail": 160, "card": 640, "full": 1600}
+VARIANT_FORMAT = "WEBP"
+VARIANT_CONTENT_TYPE = "image/webp"
+VARIANT_QUALITY = 80
+# how long a path without an object is remembered before signing is tried again
+MISSING_RETRY_SECONDS = 30
+
+
+def variant_path(path: str, variant: str) -> str:
+    """Storage path of one variant of the original at path."""
+    return f"variants/{variant}/{path}.webp"
+
+
+def render_variants(original: bytes) -> dict[str, bytes]:
+    """Resize an uploaded image into every variant, encoded as WebP."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(original)) as opened:
+        # phones store rotation in EXIF, apply it before the metadata is dropped
+        image = ImageOps.exif_transpose(opened)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    variants = {}
+    for variant, size in VARIANT_SIZES.items():
+        if variant == "thumbnail":
+            resized = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, VARIANT_FORMAT, quality=VARIANT_QUALITY, method=4)
+        variants[variant] = buffer.getvalue()
+    return variants
+
+
+class ImageStorage(Protocol):
+    def read(self, path: str) -> bytes:
+        """Return the object at path."""
+        ...
+
+    def write(self, path: str, data: bytes, content_type: str) -> None:
+        """Create or replace the object at path."""
+        ...
+
+    def sign_urls(self, paths: list[str], expires_in: int) -> dict[str, str]:
+        """Return signed URLs for the paths that exist, in a single call."""
+        ...
+
+
+class SupabaseImageStorage:
+    """Objects in a Supabase Storage bucket."""
+
+    def __init__(self, client: "Client", bucket: str) -> None:
+        """Construct storage for one bucket."""
+        self.bucket = client.storage.from_(bucket)
+
+    def read(self, path: str) -> bytes:
+        """Download the object at path."""
+        with observe_outbound("supabase", "storage_download"):
+            return self.bucket.download(path)
+
+    def write(self, path: str, data: bytes, content_type: str) -> None:
+        """Upload the object at path, replacing any previous one."""
+        with observe_outbound("supabase", "storage_upload"):
+            self.bucket.upload(
+                path, data, {"content-type": content_type, "upsert": "true"}
+            )
+
+    def sign_urls(self, paths: list[str], expires_in: int) -> dict[str, str]:
+        """Sign every path with one storage request, missing objects are left out."""
+        with observe_outbound("supabase", "storage_sign"):
+            signed = self.bucket.create_signed_urls(paths, expires_in)
+        return {
+            item["path"]: item["signedURL"]
+            for item in signed
+            if not item.get("error") and item.get("signedURL")
+        }
+
+
+class LocalImageStorage:
+    """Objects in a local directory, served by the images router. For dev and tests."""
+
+    def __init__(self, root: Path, secret: str) -> None:
+        """Construct storage under root, signing URLs with secret."""
+        self.root = root.resolve()
+        self.secret = secret.encode()
+
+    def _file(self, path: str) -> Path:
+        file = (self.root / path).resolve()
+        if not file.is_relative_to(self.root):
+            raise ValueError(f"Image path escapes storage root: {path}")
+        return file
+
+    def read(self, path: str) -> bytes:
+        """Read the file at path."""
+        return self._file(path).read_bytes()
+
+    def write(self, path: str, data: bytes, _content_type: str) -> None:
+        """Write the file at path, creating parent directories."""
+        file = self._file(path)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_bytes(data)
+
+    def signature(self, path: str, expires: int) -> str:
+        """HMAC over path and expiry."""
+        message = f"{path}:{expires}".encode()
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def verify(self, path: str, expires: int, signature: str) -> Path | None:
+        """Return the file for a valid, unexpired signature, otherwise None."""
+        if expires < time.time():
+            return None
+        if not hmac.compare_digest(self.signature(path, expires), signature):
+            return None
+        file = self._file(path)
+        return file if file.is_file() else None
+
+    def sign_urls(self, paths: list[str], expires_in: int) -> dict[str, str]:
+        """Sign the paths that exist on disk."""
+        expires = int(time.time()) + expires_in
+        return {
+            path: f"{settings.API_V1_STR}/images/{quote(path)}?"
+            + urlencode(
+                {"expires": expires, "signature": self.signature(path, expires)}
+            )
+            for path in paths
+            if self._file(path).is_file()
+        }
+
+
+class SignedUrlCache:
+    """Per worker LRU of signed URLs, refreshed before they expire."""
+
+    def __init__(self, max_entries: int) -> None:
+        """Construct cache holding at most max_entries URLs."""
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str | None, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, paths: Iterable[str], now: float) -> dict[str, str | None]:
+        """Return cached entries still valid at now, None marks a known missing object."""
+        found = {}
+        with self._lock:
+            for path in paths:
+                entry = self._entries.get(path)
+                if entry is None or entry[1] <= now:
+                    continue
+                self._entries.move_to_end(path)
+                found[path] = entry[0]
+        return found
+
+    def put_many(self, urls: dict[str, str | None], valid_until: float) -> None:
+        """Store URLs, or None for missing objects, until valid_until."""
+        with self._lock:
+            for path, url in urls.items():
+                self._entries[path] = (url, valid_until)
+                self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, paths: Iterable[str]) -> None:
+        """Forget cached entries so the next lookup signs again."""
+        with self._lock:
+            for path in paths:
+                self._entries.pop(path, None)
+
+
+class ImageService:
+    def __init__(self, storage: ImageStorage) -> None:
+        """Construct service signing and rendering through storage."""
+        self.storage = storage
+        self.cache = SignedUrlCache(settings.IMAGE_URL_CACHE_SIZE)
+
+    def generate_variants(self, path: str) -> None:
+        """Render and store every variant of the original at path, run as a background task."""
+        try:
+            variants = render_variants(self.storage.read(path))
+            for variant, data in variants.items():
+                self.storage.write(
+                    variant_path(path, variant), data, VARIANT_CONTENT_TYPE
+                )
+        except Exception:
+            logger.exception("Failed to generate image variants for %s", path)
+            return
+        # variants may have been cached as missing while they were rendered
+        self.cache.invalidate(variant_path(path, variant) for variant in VARIANT_SIZES)
+        logger.info("Generated %d image variants for %s", len(variants), path)
+
+    def signed_urls(self, paths: Iterable[str]) -> dict[str, str | None]:
+        """Signed URL per path, from the cache or one batched signing call for the rest."""
+        now = time.time()
+        wanted = set(paths)
+        urls = self.cache.get_many(wanted, now)
+        missing = [path for path in wanted if path not in urls]
+        if missing:
+            ttl = settings.IMAGE_SIGNED_URL_TTL
+            try:
+                signed = self.storage.sign_urls(missing, ttl)
+            except Exception:
+                # images are decoration, never fail the response over them
+                logger.exception("Signing %d image URLs failed", len(missing))
+                return urls
+            # reused until the refresh margin before expiry
+            self.cache.put_many(
+                signed, now + ttl - settings.IMAGE_SIGNED_URL_REFRESH_MARGIN
+            )
+            # variants rendered by another worker show up after a short retry delay
+            fresh = {path: signed.get(path) for path in missing}
+            self.cache.put_many(
+                {path: None for path in missing if path not in signed},
+                now + MISSING_RETRY_SECONDS,
+            )
+            urls.update(fresh)
+        return urls
+
+    def image_urls(self, paths: Iterable[str | None]) -> dict[str, ImageUrls]:
+        """Variant URLs per original path, falling back to the original until variants exist."""
+        originals = {path for path in paths if path}
+        if not originals:
+            return {}
+        wanted = {
+            variant_path(path, variant)
+            for path in originals
+            for variant in VARIANT_SIZES
+        }
+        urls = self.signed_urls(wanted | originals)
+        return {
+            path: ImageUrls(
+                **{
+                    variant: urls.get(variant_path(path, variant)) or urls.get(path)
+                    for variant in VARIANT_SIZES
+                }
+            )
+            for path in originals
+        }
+
+    def attach(
+        self,
+        trips: Iterable[TripPublic] = (),
+        users: Iterable[UserPublic] = (),
+    ) -> None:
+        """Fill the image URLs of trips, their owners and users with one batch.
+
+        DTOs of a sparse fieldset may lack the storage paths or owner, those get no URLs.
+        """
+        trips = list(trips)
+        owners = (getattr(trip, "owner", None) for trip in trips)
+        users = [*users, *(owner for owner in owners if isinstance(owner, UserPublic))]
+        trip_paths = [getattr(trip, "trip_image_storage_path", None) for trip in trips]
+        user_paths = [getattr(user, "avatar_storage_path", None) for user in users]
+        urls = self.image_urls(trip_paths + user_paths)
+        for trip, path in zip(trips, trip_paths, strict=True):
+            trip.image = urls.get(path or "")
+        for user, path in zip(users, user_paths, strict=True):
+            user.avatar = urls.get(path or "")
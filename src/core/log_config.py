@@ -0,0 +1,140 @@
+"""Logging setup for local development and production.
+
+Development logs through Rich. Production writes JSON lines from a background
+listener thread: request threads only put records on a bounded in-memory queue,
+so they never block on I/O and drop records instead of waiting when it is full.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.core.config import Settings
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as a single JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Serialize the record, including the traceback when there is one."""
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records below WARNING for configured loggers.
+
+    Runs before the record is queued, so dropped records are never formatted.
+    """
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        """Construct filter with keep ratios keyed by logger name prefix."""
+        super().__init__()
+        # longest prefix first so the most specific logger wins
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Return False for records that lose the sampling draw."""
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(f"{prefix}."):
+                return random.random() < rate  # noqa: S311
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that never blocks the caller and leaves formatting to the listener."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Snapshot the message arguments now, format everything else on the listener thread."""
+        # args may be ORM objects that change after the request moves on, so the
+        # message is merged here, tracebacks are immutable and stay for the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Drop the record when the queue is full instead of waiting."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+def _configure_rich(settings: "Settings") -> None:
+    from rich.logging import RichHandler
+
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(name)s | %(message)s",
+        datefmt="[%X]",
+        handlers=[RichHandler(markup=True, show_path=True, rich_tracebacks=True)],
+    )
+
+
+_listener: QueueListener | None = None
+
+
+def _start_listener(
+    queue_handler: NonBlockingQueueHandler, stream_handler: logging.Handler, size: int
+) -> None:
+    global _listener  # noqa: PLW0603
+    if _listener is not None:
+        # inherited from the parent process, its thread is gone
+        atexit.unregister(_listener.stop)
+    queue_handler.queue = queue.Queue(size)
+    _listener = QueueListener(
+        queue_handler.queue, stream_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def _configure_json(settings: "Settings") -> None:
+    queue_handler = NonBlockingQueueHandler(queue.Queue())
+    if settings.LOG_SAMPLE_RATES:
+        queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter())
+    _start_listener(queue_handler, stream_handler, settings.LOG_QUEUE_SIZE)
+    # the listener thread does not survive a fork (src.server preloads the app), and
+    # the queue lock may have been held by it, so forked workers get their own pair
+    os.register_at_fork(
+        after_in_child=lambda: _start_listener(
+            queue_handler, stream_handler, settings.LOG_QUEUE_SIZE
+        )
+    )
+
+    logging.basicConfig(level=settings.LOG_LEVEL, handlers=[queue_handler])
+
+
+def configure_logging(settings: "Settings") -> None:
+    """Install the root handlers for the configured LOG_FORMAT."""
+    if settings.LOG_FORMAT == "json":
+        _configure_json(settings)
+    else:
+        _configure_rich(settings)
@@ -0,0 +1,358 @@
+"""Request, database and outbound call metrics exposed in Prometheus text format.
+
+Each worker records into its own in-memory registry and periodically flushes a
+snapshot to METRICS_DIR. The exporter on the internal METRICS_PORT, served by
+whichever worker bound the port first, sums every worker's snapshot so a scrape
+sees the whole server rather than a single worker. Snapshots of exited workers
+are kept so the summed counters never go backwards, src.server clears them when
+the next server run starts.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+type Labels = tuple[tuple[str, str], ...]
+type SeriesKey = tuple[str, Labels]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HISTOGRAMS: dict[str, tuple[str, tuple[float, ...]]] = {
+    "http_request_duration_seconds": (
+        "HTTP request latency by route template",
+        LATENCY_BUCKETS,
+    ),
+    "http_request_db_queries": ("DB queries issued per request", QUERY_COUNT_BUCKETS),
+    "http_request_db_duration_seconds": (
+        "Time spent in DB queries per request",
+        LATENCY_BUCKETS,
+    ),
+    "outbound_request_duration_seconds": (
+        "Latency of calls to external services",
+        LATENCY_BUCKETS,
+    ),
+}
+COUNTERS: dict[str, str] = {
+    "http_requests_total": "HTTP responses by route template and status code",
+    "outbound_request_errors_total": "Failed calls to external services",
+    "realtime_events_total": "Trip change notifications received by event type",
+}
+
+
+@dataclass
+class RequestStats:
+    db_queries: int = 0
+    db_seconds: float = 0.0
+
+
+current_request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+class MetricsRegistry:
+    """Thread safe counters and histograms for a single worker."""
+
+    def __init__(self) -> None:
+        """Construct an empty registry."""
+        self._lock = threading.Lock()
+        self._counters: dict[SeriesKey, float] = {}
+        # per series: one count per bucket, the +Inf count, then the sum
+        self._histograms: dict[SeriesKey, list[float]] = {}
+
+    def inc(self, name: str, labels: dict[str, str], value: float = 1) -> None:
+        """Increment a counter series."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: dict[str, str], value: float) -> None:
+        """Record a value into a histogram series."""
+        buckets = HISTOGRAMS[name][1]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0.0] * (len(buckets) + 2)
+            index = next(
+                (i for i, bound in enumerate(buckets) if value <= bound), len(buckets)
+            )
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self) -> dict[str, list]:
+        """Return a JSON serializable copy of every series."""
+        with self._lock:
+            return {
+                "counters": [
+                    [name, list(labels), value]
+                    for (name, labels), value in self._counters.items()
+                ],
+                "histograms": [
+                    [name, list(labels), list(series)]
+                    for (name, labels), series in self._histograms.items()
+                ],
+            }
+
+
+registry = MetricsRegistry()
+
+
+def record_request(
+    method: str, route: str, status_code: int, seconds: float, stats: RequestStats
+) -> None:
+    """Record latency, status and DB usage of a finished request."""
+    labels = {"method": method, "route": route}
+    registry.inc("http_requests_total", {**labels, "status": str(status_code)})
+    registry.observe("http_request_duration_seconds", labels, seconds)
+    registry.observe("http_request_db_queries", labels, stats.db_queries)
+    registry.observe("http_request_db_duration_seconds", labels, stats.db_seconds)
+
+
+@contextmanager
+def observe_outbound(service: str, operation: str) -> Generator[None]:
+    """Time a call to an external service such as supabase or vonage."""
+    labels = {"service": service, "operation": operation}
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.inc("outbound_request_errors_total", labels)
+        raise
+    finally:
+        registry.observe(
+            "outbound_request_duration_seconds", labels, time.perf_counter() - start
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach cursor events that add query count and time to the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn: Connection, *_: object) -> None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn: Connection, *_: object) -> None:
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_seconds += elapsed
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request under its route template."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Wrap the ASGI app."""
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Collect request stats while the wrapped app handles the request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request_stats.reset(token)
+            # the router stores the matched route in scope, unmatched paths share one
+            # label so random urls cannot blow up the series count
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            record_request(scope["method"], template, status_code, elapsed, stats)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{key}="{_escape_label_value(value)}"' for key, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+def aggregate_snapshots(snapshots: list[dict[str, list]]) -> dict[str, Any]:
+    """Sum worker snapshots series by series."""
+    counters: dict[SeriesKey, float] = {}
+    histograms: dict[SeriesKey, list[float]] = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, series in snapshot["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            total = histograms.setdefault(key, [0.0] * len(series))
+            for index, value in enumerate(series):
+                total[index] += value
+    return {"counters": counters, "histograms": histograms}
+
+
+def render_prometheus(snapshots: list[dict[str, list]]) -> str:
+    """Render aggregated snapshots in the Prometheus text exposition format."""
+    aggregated = aggregate_snapshots(snapshots)
+    lines: list[str] = []
+    for name, help_text in COUNTERS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (series_name, labels), value in sorted(aggregated["counters"].items()):
+            if series_name == name:
+                lines.append(f"{name}{_format_labels(dict(labels))} {value}")
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (series_name, labels), series in sorted(aggregated["histograms"].items()):
+            if series_name != name:
+                continue
+            cumulative = 0.0
+            for bound, count in zip((*buckets, "+Inf"), series[:-1], strict=True):
+                cumulative += count
+                bucket_labels = {**dict(labels), "le": str(bound)}
+                lines.append(
+                    f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+                )
+            lines.append(f"{name}_sum{_format_labels(dict(labels))} {series[-1]}")
+            lines.append(f"{name}_count{_format_labels(dict(labels))} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def flush_snapshot(path: Path) -> None:
+    """Atomically write this worker's snapshot to path for the exporter to aggregate."""
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(registry.snapshot()))
+    tmp_path.replace(path)
+
+
+def read_snapshots() -> list[dict[str, list]]:
+    """Read the snapshot of every worker that has flushed since the server started."""
+    snapshots = []
+    for path in Path(settings.METRICS_DIR).glob("worker-*.json"):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, json.JSONDecodeError):
+            logger.warning("Skipping unreadable metrics snapshot %s", path)
+    return snapshots
+
+
+def clear_snapshots() -> None:
+    """Remove the snapshots of previous server runs, before any worker starts."""
+    directory = Path(settings.METRICS_DIR)
+    for path in [*directory.glob("worker-*.json"), *directory.glob("worker-*.tmp")]:
+        path.unlink(missing_ok=True)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        exporter.flush()
+        body = render_prometheus(read_snapshots()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        logger.debug(format, *args)
+
+
+class MetricsExporter:
+    """Background thread that flushes snapshots and serves /metrics if the port is free.
+
+    Every worker retries the bind on each flush, so when the serving worker exits
+    another one takes the port over.
+    """
+
+    def __init__(self) -> None:
+        """Construct a stopped exporter."""
+        self._stop = threading.Event()
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+        self._snapshot_path: Path | None = None
+
+    def start(self) -> None:
+        """Start flushing and serving in a daemon thread."""
+        Path(settings.METRICS_DIR).mkdir(parents=True, exist_ok=True)
+        # new for every worker start, a restarted worker that is handed a dead
+        # worker's PID must not overwrite the totals that worker left behind
+        self._snapshot_path = Path(settings.METRICS_DIR) / f"worker-{uuid.uuid4()}.json"
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Flush a final snapshot and release the port."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        self.flush()
+
+    def flush(self) -> None:
+        """Write this worker's snapshot, once started."""
+        if self._snapshot_path is not None:
+            flush_snapshot(self._snapshot_path)
+
+    def _try_serve(self) -> None:
+        try:
+            self._server = ThreadingHTTPServer(
+                (settings.METRICS_HOST, settings.METRICS_PORT), _MetricsRequestHandler
+            )
+        except OSError:
+            return  # another worker is serving
+        threading.Thread(
+            target=self._server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+        logger.info(
+            "Serving metrics on %s:%s", settings.METRICS_HOST, settings.METRICS_PORT
+        )
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._server is None:
+                self._try_serve()
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Failed to flush metrics snapshot")
+            self._stop.wait(settings.METRICS_FLUSH_INTERVAL)
+
+
+exporter = MetricsExporter()
@@ -0,0 +1,190 @@
+"""Catalog of ski resorts, bundled with the app and held in memory.
+
+src/data/mountains.csv lists every resort once, under a stable id, with the other
+names people type for it. Trip.mountain stays whatever the user wrote and
+Trip.mountain_id names the resort, so trips at one resort group on an indexed
+column however it was spelled.
+
+Autocomplete runs on a sorted array of normalized keys, one per word of every
+name and alias, so "blackcomb" finds Whistler Blackcomb. A lookup is a binary
+search followed by a short scan of the keys sharing the prefix, no I/O.
+"""
+
+import bisect
+import csv
+import logging
+import re
+import unicodedata
+from collections.abc import Iterator
+from functools import cache
+from pathlib import Path
+
+from sqlalchemy import Table, bindparam, select, update
+from sqlmodel import Session
+
+from src.core.db import engine
+from src.models.models import MountainPublic
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = Path(__file__).resolve().parents[1] / "data" / "mountains.csv"
+
+# spelled out, so "Mt Baker" and "Mount Baker" are one key
+ABBREVIATIONS = {"mt": "mount", "mtn": "mountain", "st": "saint", "ste": "sainte"}
+# left out when matching a whole name, "Copper" is "Copper Mountain"
+FILLER_WORDS = {"ski", "resort", "area", "mountain", "the"}
+
+
+def words(text: str) -> list[str]:
+    """Lowercase ASCII words of text, accents dropped."""
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return re.findall(r"[a-z0-9]+", ascii_text.lower())
+
+
+def normalize(text: str) -> str:
+    """Words of text separated by single spaces, abbreviations spelled out."""
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words(text))
+
+
+def canonical(text: str) -> str:
+    """Key of a whole resort name, normalized without filler words."""
+    spelled = normalize(text).split()
+    kept = [word for word in spelled if word not in FILLER_WORDS]
+    return " ".join(kept or spelled)
+
+
+class MountainCatalog:
+    def __init__(
+        self, mountains: list[MountainPublic], aliases: dict[str, list[str]]
+    ) -> None:
+        """Index mountains by id, by whole name and by the prefix of every word."""
+        self.by_id = {mountain.id: mountain for mountain in mountains}
+        by_name: dict[str, set[str]] = {}
+        entries: set[tuple[str, bool, str]] = set()
+        for mountain in mountains:
+            for name in [mountain.name, *aliases.get(mountain.id, [])]:
+                by_name.setdefault(canonical(name), set()).add(mountain.id)
+                spelled = normalize(name).split()
+                for position in range(len(spelled)):
+                    # keys at the start of a name rank before keys inside one
+                    key = " ".join(spelled[position:])
+                    entries.add((key, position > 0, mountain.id))
+        # a name two resorts share resolves to neither
+        self._by_name = {
+            key: next(iter(ids)) for key, ids in by_name.items() if len(ids) == 1
+        }
+        ordered = sorted(entries)
+        self._keys = [key for key, _, _ in ordered]
+        self._entries = [(inner, mountain_id) for _, inner, mountain_id in ordered]
+
+    @classmethod
+    def load(cls, path: Path = CATALOG_PATH) -> "MountainCatalog":
+        """Read the bundled dataset."""
+        mountains = []
+        aliases = {}
+        with path.open(newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                mountains.append(
+                    MountainPublic(
+                        id=row["id"],
+                        name=row["name"],
+                        region=row["region"],
+                        country=row["country"],
+                    )
+                )
+                aliases[row["id"]] = [
+                    alias for alias in row["aliases"].split("|") if alias
+                ]
+        return cls(mountains, aliases)
+
+    def get(self, mountain_id: str) -> MountainPublic | None:
+        """Return the mountain with the id, None when the catalog has no such id."""
+        return self.by_id.get(mountain_id)
+
+    def resolve(self, name: str) -> str | None:
+        """Return the id of the resort a free text name means, None when unknown or ambiguous."""
+        return self._by_name.get(canonical(name))
+
+    def complete(self, prefix: str, limit: int) -> list[MountainPublic]:
+        """Return up to limit mountains with a name or alias word starting with prefix.
+
+        Mountains whose name starts with prefix come first, then by name.
+        """
+        typed = words(prefix)
+        if not typed:
+            return []
+        # the last word may be unfinished, "st" is as likely Stowe as St. Anton
+        head = normalize(" ".join(typed[:-1]))
+        last = typed[-1]
+        best: dict[str, bool] = {}
+        for ending in {last, ABBREVIATIONS.get(last, last)}:
+            key = f"{head} {ending}".lstrip()
+            index = bisect.bisect_left(self._keys, key)
+            while index < len(self._keys) and self._keys[index].startswith(key):
+                inner, mountain_id = self._entries[index]
+                best[mountain_id] = best.get(mountain_id, True) and inner
+                index += 1
+        ranked = sorted(
+            best,
+            key=lambda mountain_id: (best[mountain_id], self.by_id[mountain_id].name),
+        )
+        return [self.by_id[mountain_id] for mountain_id in ranked[:limit]]
+
+
+@cache
+def get_catalog() -> MountainCatalog:
+    """Return the catalog, read from disk on the first call of each process."""
+    return MountainCatalog.load()
+
+
+def assign_mountains(table: Table, batch_size: int) -> Iterator[int]:
+    """Set mountain_id of rows in table that have none and name a known resort.
+
+    Walks the table by id, batch_size rows per transaction, yielding how many rows
+    of each batch were assigned.
+    """
+    catalog = get_catalog()
+    after = None
+    while True:
+        with Session(engine) as session:
+            batch = (
+                select(table.c.id, table.c.mountain)
+                .where(table.c.mountain_id.is_(None))
+                .order_by(table.c.id)
+                .limit(batch_size)
+            )
+            if after is not None:
+                batch = batch.where(table.c.id > after)
+            rows = session.execute(batch).all()
+            if not rows:
+                return
+            assigned = [
+                {"row_id": row.id, "resolved_id": mountain_id}
+                for row in rows
+                if (mountain_id := catalog.resolve(row.mountain)) is not None
+            ]
+            if assigned:
+                session.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("row_id"))
+                    .values(mountain_id=bindparam("resolved_id")),
+                    assigned,
+                )
+            session.commit()
+        logger.info("Assigned mountains to %d of %d trips", len(assigned), len(rows))
+        yield len(assigned)
+        after = rows[-1].id
+
+
+def mountain_id_for(mountain: str, mountain_id: str | None = None) -> str | None:
+    """Return the resort id to store with a trip.
+
+    A mountain_id picked from autocomplete wins and must be in the catalog,
+    raising ValueError otherwise. Without one it is resolved from the free text.
+    """
+    catalog = get_catalog()
+    if mountain_id is None:
+        return catalog.resolve(mountain)
+    if catalog.get(mountain_id) is None:
+        raise ValueError(f"unknown mountain {mountain_id}")
+    return mountain_id
@@ -0,0 +1,138 @@
+"""Per route DB query budgets and N+1 detection.
+
+Routes declare how many queries they may issue with the QueryBudget dependency.
+Every statement executed while the route runs is counted by shape, so a budget
+overrun reports which statement repeated, which is what an N+1 looks like.
+QUERY_BUDGET_MODE decides whether an overrun is ignored, logged or raised.
+"""
+
+import logging
+import re
+import threading
+from collections import Counter
+from collections.abc import AsyncGenerator, Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from src.core.config import settings
+from src.core.exceptions import QueryBudgetExceededError
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+# expanding IN parameters render one placeholder per value, collapse them to one shape
+_IN_LIST = re.compile(r"IN \([^)]*\)", re.IGNORECASE)
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a SQL statement so executions that differ only in parameters compare equal."""
+    return _IN_LIST.sub("IN (...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+@dataclass
+class QueryCounter:
+    shapes: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def count(self) -> int:
+        """Total statements executed."""
+        return self.shapes.total()
+
+    def record(self, statement: str) -> None:
+        """Count one execution of statement."""
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self) -> list[tuple[str, int]]:
+        """Return statement shapes executed more than once, most frequent first."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > 1]
+
+    def report(self, label: str, max_queries: int) -> str:
+        """Describe a budget overrun, listing repeated statements as N+1 suspects."""
+        lines = [f"{label} issued {self.count} queries, budget is {max_queries}"]
+        lines += [f"  repeated {n}x: {shape[:300]}" for shape, n in self.repeated()]
+        return "\n".join(lines)
+
+
+current_query_counter: ContextVar[QueryCounter | None] = ContextVar(
+    "current_query_counter", default=None
+)
+
+# counters that see every statement on every thread, used by tests where the app
+# runs on another thread than the test
+_process_counters: list[QueryCounter] = []
+_process_counters_lock = threading.Lock()
+
+
+def install_query_counter(engine: Engine) -> None:
+    """Attach the cursor event that feeds active query counters. Safe to call twice."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+def _before_cursor_execute(
+    _conn: Connection, _cursor: object, statement: str, *_: object
+) -> None:
+    counter = current_query_counter.get()
+    if counter is not None:
+        counter.record(statement)
+    if _process_counters:
+        with _process_counters_lock:
+            for process_counter in _process_counters:
+                process_counter.record(statement)
+
+
+@contextmanager
+def count_queries(*, process_wide: bool = False) -> Generator[QueryCounter]:
+    """Count statements executed in the current context, or on every thread when process_wide."""
+    counter = QueryCounter()
+    if process_wide:
+        with _process_counters_lock:
+            _process_counters.append(counter)
+        try:
+            yield counter
+        finally:
+            with _process_counters_lock:
+                _process_counters.remove(counter)
+        return
+    token = current_query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        current_query_counter.reset(token)
+
+
+def enforce_budget(counter: QueryCounter, label: str, max_queries: int) -> None:
+    """Log or raise, depending on QUERY_BUDGET_MODE, when counter went over budget."""
+    if settings.QUERY_BUDGET_MODE == "off" or counter.count <= max_queries:
+        return
+    report = counter.report(label, max_queries)
+    if settings.QUERY_BUDGET_MODE == "raise":
+        raise QueryBudgetExceededError(report)
+    logger.warning(report)
+
+
+class QueryBudget:
+    """Dependency declaring the most queries a route may issue, response serialization included."""
+
+    def __init__(self, max_queries: int) -> None:
+        """Construct dependency with the route's query budget."""
+        self.max_queries = max_queries
+
+    async def __call__(self, request: Request) -> AsyncGenerator[None]:
+        """Count queries while the route runs and enforce the budget afterwards."""
+        # async so the counter is set on the request task and copied into the
+        # threadpool that runs sync endpoints
+        if settings.QUERY_BUDGET_MODE == "off":
+            yield
+            return
+        with count_queries() as counter:
+            yield
+        route = request.scope.get("route")
+        label = f"{request.method} {getattr(route, 'path', request.url.path)}"
+        enforce_budget(counter, label, self.max_queries)
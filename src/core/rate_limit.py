@@ -0,0 +1,127 @@
+"""Token bucket rate limiting keyed by authenticated user and route group.
+
+Buckets live in worker memory or, for a limit shared by every worker, in an
+unlogged Postgres table updated with a single atomic upsert.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Protocol
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
+
+from src.core.config import settings
+from src.core.db import engine
+from src.models.models import RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_MINUTE = 60
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    allowed: bool
+    retry_after: float = 0.0
+
+
+class RateLimiter(Protocol):
+    def acquire(self, key: str, per_minute: int) -> RateLimitDecision:
+        """Take a token from the bucket identified by key."""
+        ...
+
+
+def _retry_after(tokens: float, rate: float) -> float:
+    """Seconds until the bucket holds a whole token again."""
+    return max(0.0, (1 - tokens) / rate)
+
+
+class InMemoryRateLimiter:
+    """Per worker token buckets. Each worker enforces the limit independently.
+
+    An empty bucket refills in a minute, so a bucket idle for a minute is full and
+    the same as no bucket at all. Those are dropped once a minute, keeping memory
+    bounded by the users active in the last minute.
+    """
+
+    def __init__(self) -> None:
+        """Construct an empty set of buckets."""
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._pruned_at = time.monotonic()
+
+    def acquire(self, key: str, per_minute: int) -> RateLimitDecision:
+        """Refill the bucket for the time elapsed and take a token if one is available."""
+        rate = per_minute / SECONDS_PER_MINUTE
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned_at >= SECONDS_PER_MINUTE:
+                self._prune(now)
+            tokens, refreshed_at = self._buckets.get(key, (per_minute, now))
+            tokens = min(per_minute, tokens + (now - refreshed_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+        if allowed:
+            return RateLimitDecision(allowed=True)
+        return RateLimitDecision(allowed=False, retry_after=_retry_after(tokens, rate))
+
+    def _prune(self, now: float) -> None:
+        """Drop the buckets that have refilled completely, called with the lock held."""
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if now - bucket[1] < SECONDS_PER_MINUTE
+        }
+        self._pruned_at = now
+
+
+class PostgresRateLimiter:
+    """Token buckets shared by every worker, refilled and decremented in one statement."""
+
+    def acquire(self, key: str, per_minute: int) -> RateLimitDecision:
+        """Upsert the bucket for key and return whether a token was taken."""
+        rate = per_minute / SECONDS_PER_MINUTE
+        table = RateLimitBucket.__table__
+        now = func.clock_timestamp()
+        refilled = func.least(
+            per_minute,
+            table.c.tokens + func.extract("epoch", now - table.c.refreshed_at) * rate,
+        )
+        statement = (
+            insert(table)
+            .values(key=key, tokens=per_minute - 1, allowed=True, refreshed_at=now)
+            .on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={
+                    "tokens": case((refilled >= 1, refilled - 1), else_=refilled),
+                    "allowed": refilled >= 1,
+                    "refreshed_at": now,
+                },
+            )
+            .returning(table.c.tokens, table.c.allowed)
+        )
+        with engine.begin() as connection:
+            tokens, allowed = connection.execute(statement).one()
+        if allowed:
+            return RateLimitDecision(allowed=True)
+        return RateLimitDecision(allowed=False, retry_after=_retry_after(tokens, rate))
+
+
+def create_rate_limiter() -> RateLimiter:
+    """Return the rate limiter for the configured backend."""
+    if settings.RATE_LIMIT_BACKEND == "postgres":
+        return PostgresRateLimiter()
+    return InMemoryRateLimiter()
+
+
+rate_limiter = create_rate_limiter()
+
+
+def limit_for(route_group: str) -> int:
+    """Return the requests per minute allowed for a route group."""
+    return settings.RATE_LIMITS.get(route_group, settings.RATE_LIMITS["default"])
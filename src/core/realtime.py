@@ -0,0 +1,164 @@
+"""Per trip change events pushed to clients over SSE and WebSocket.
+
+Mutation routes call notify_trip inside their transaction. Postgres delivers a
+NOTIFY only when the transaction commits, so subscribers never hear about a
+change that was rolled back. Every worker keeps one LISTEN connection and fans
+events out to its local subscribers, which makes cross-worker delivery free and
+keeps an idle subscription down to one small in-memory queue.
+
+Events only name what changed. Clients refetch the affected resource, which also
+keeps payloads far below the 8000 byte NOTIFY limit.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass, field
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from sqlalchemy import func, select
+from sqlmodel import Session
+
+from src.core.config import settings
+from src.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "trip_events"
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+
+def notify_trip(
+    session: Session, trip_id: uuid.UUID | str, event: str, **data: object
+) -> None:
+    """Queue an event for subscribers of trip, delivered when session commits."""
+    payload = json.dumps(
+        {"trip_id": str(trip_id), "event": event, "data": data}, default=str
+    )
+    session.execute(select(func.pg_notify(CHANNEL, payload)))
+
+
+@dataclass(eq=False)
+class Subscription:
+    trip_id: str
+    # None is queued to wake a waiting reader when the subscription closes
+    queue: asyncio.Queue[dict | None] = field(
+        default_factory=lambda: asyncio.Queue(settings.REALTIME_SUBSCRIBER_BUFFER)
+    )
+    closed: bool = False
+
+    def close(self) -> None:
+        """End the subscription, its reader stops after the event it is waiting on."""
+        self.closed = True
+        with suppress(asyncio.QueueFull):
+            # a full queue wakes the reader by itself
+            self.queue.put_nowait(None)
+
+    async def events(self, heartbeat: float) -> AsyncGenerator[dict | None]:
+        """Yield events until closed, and None whenever heartbeat seconds pass idle."""
+        while not self.closed:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), heartbeat)
+            except TimeoutError:
+                yield None
+                continue
+            if event is None or self.closed:
+                return
+            yield event
+
+
+class TripEventBroker:
+    """One LISTEN connection per worker fanning events out to local subscribers."""
+
+    def __init__(self) -> None:
+        """Construct broker without subscribers, start() begins listening."""
+        self._subscriptions: defaultdict[str, set[Subscription]] = defaultdict(set)
+        self._task: asyncio.Task | None = None
+        self._reconnect_delay = RECONNECT_DELAY
+
+    @property
+    def subscriber_count(self) -> int:
+        """Open subscriptions on this worker."""
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def start(self) -> None:
+        """Listen in the background on the running event loop."""
+        self._task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self) -> None:
+        """Stop listening and end every open subscription."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close()
+
+    @asynccontextmanager
+    async def subscribe(self, trip_id: uuid.UUID | str) -> AsyncGenerator[Subscription]:
+        """Receive events of trip until the block exits."""
+        subscription = Subscription(str(trip_id))
+        self._subscriptions[subscription.trip_id].add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscriptions = self._subscriptions[subscription.trip_id]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.trip_id]
+
+    def dispatch(self, payload: str) -> None:
+        """Hand a NOTIFY payload to every local subscriber of its trip."""
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed %s payload", CHANNEL)
+            return
+        for subscription in self._subscriptions.get(event.get("trip_id"), ()):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # too far behind, the client reconnects and refetches instead
+                subscription.close()
+        registry.inc("realtime_events_total", {"event": str(event.get("event"))})
+
+    async def _listen_forever(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except Exception:
+                logger.exception(
+                    "Lost %s listener, reconnecting in %.0fs",
+                    CHANNEL,
+                    self._reconnect_delay,
+                )
+            # events sent while disconnected are lost, clients refetch on reconnect
+            await asyncio.sleep(self._reconnect_delay)
+            self._reconnect_delay = min(self._reconnect_delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _listen(self) -> None:
+        # direct connection, LISTEN does not work through a transaction pooler
+        conninfo = make_conninfo(
+            host=settings.POSTGRES_DIRECT_HOST or settings.POSTGRES_HOST,
+            port=settings.POSTGRES_DIRECT_PORT or settings.POSTGRES_PORT,
+            dbname=settings.POSTGRES_DB,
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+        )
+        async with await psycopg.AsyncConnection.connect(
+            conninfo, autocommit=True
+        ) as connection:
+            await connection.execute(f"LISTEN {CHANNEL}")
+            self._reconnect_delay = RECONNECT_DELAY
+            logger.info("Listening for %s", CHANNEL)
+            async for notify in connection.notifies():
+                self.dispatch(notify.payload)
+
+
+broker = TripEventBroker()
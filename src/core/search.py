@@ -0,0 +1,107 @@
+"""Full text search over the trips a user is invited to.
+
+Postgres keeps a weighted tsvector of every trip's title, mountain and description
+in the generated search_vector column, GIN indexed, on the hot and the archive
+table alike. A search only ever looks at trips the user has an invitation to. For
+a user with a few hundred trips the planner starts from their invitations and
+checks each trip's vector. For a rare term it can start from the GIN index
+instead. Hits are ranked with ts_rank and paged by keyset on (rank, id), so a page
+costs the same however deep the client has scrolled.
+"""
+
+import base64
+import binascii
+import json
+import uuid
+from dataclasses import dataclass
+
+from sqlalchemy import REAL, ColumnElement, Select, cast, func, literal, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.orm import aliased, selectinload
+from sqlmodel import select, union_all
+
+from src.core.archive import stored_columns
+from src.models.models import (
+    SEARCH_CONFIG,
+    Invitation,
+    Trip,
+    invitations_archive,
+    trips_archive,
+)
+
+
+@dataclass
+class SearchCursor:
+    # rank and id of the last hit served
+    rank: float
+    id: uuid.UUID
+
+    def encode(self) -> str:
+        """Opaque token handed to the client."""
+        raw = json.dumps([self.rank, str(self.id)], separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "SearchCursor":
+        """Parse a token from encode, raising ValueError for anything else."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            rank, trip_id = json.loads(raw)
+            return cls(rank=float(rank), id=uuid.UUID(trip_id))
+        except (binascii.Error, UnicodeDecodeError, TypeError, AttributeError) as exc:
+            raise ValueError("malformed search cursor") from exc
+
+
+def search_query(text: str) -> ColumnElement:
+    """Tsquery of what a user typed, quotes, OR and -word as in web search engines."""
+    return func.websearch_to_tsquery(cast(literal(SEARCH_CONFIG), REGCONFIG), text)
+
+
+def search_trips(
+    user_id: uuid.UUID, text: str, limit: int, after: SearchCursor | None = None
+) -> Select:
+    """Select the user's trips matching text, hot and archived, with their rank.
+
+    Best match first, limit + 1 rows so the caller knows whether a page follows.
+    """
+    query = search_query(text)
+    trips = Trip.__table__
+    names = stored_columns(trips)
+    hot = (
+        select(
+            *(trips.c[name] for name in names),
+            func.ts_rank(trips.c.search_vector, query).label("rank"),
+        )
+        .join(Invitation, Invitation.trip_id == trips.c.id)
+        .where(
+            Invitation.user_id == user_id,
+            trips.c.deleted_at.is_(None),
+            trips.c.search_vector.op("@@")(query),
+        )
+    )
+    archived = (
+        select(
+            *(trips_archive.c[name] for name in names),
+            func.ts_rank(trips_archive.c.search_vector, query).label("rank"),
+        )
+        .join(invitations_archive, invitations_archive.c.trip_id == trips_archive.c.id)
+        .where(
+            invitations_archive.c.user_id == user_id,
+            trips_archive.c.search_vector.op("@@")(query),
+        )
+    )
+    hits = union_all(hot, archived).subquery("hits")
+    trip = aliased(Trip, hits, adapt_on_names=True)
+    statement = (
+        select(trip, hits.c.rank)
+        .options(selectinload(trip.owner_user))
+        .order_by(hits.c.rank.desc(), hits.c.id.desc())
+        .limit(limit + 1)
+    )
+    if after is not None:
+        # rank is a real, compare as one so the last hit is not served again
+        statement = statement.where(
+            tuple_(hits.c.rank, hits.c.id)
+            < tuple_(cast(literal(after.rank), REAL), literal(after.id))
+        )
+    return statement
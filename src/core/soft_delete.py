@@ -0,0 +1,70 @@
+"""Soft deleted trips.
+
+delete_trip only stamps deleted_at, a single row update, and every read path
+treats a stamped trip and everything under it as gone. The rows are hard deleted
+later by purge-trips, a few trips per transaction, so the cascade through
+invitations, cars and passengers never holds many row locks at once.
+"""
+
+import logging
+import time
+import uuid
+from collections.abc import Iterator
+from datetime import timedelta
+
+from sqlalchemy import ColumnElement, delete, exists, func, select
+from sqlmodel import Session
+
+from src.core.db import engine
+from src.core.exceptions import ResourceNotFoundError
+from src.models.models import Trip
+
+logger = logging.getLogger(__name__)
+
+
+def trip_is_live(trip_id: ColumnElement | uuid.UUID | str) -> ColumnElement:
+    """Condition that the trip exists and is not soft deleted."""
+    # trips stays inside the subquery even when the enclosing query selects trips
+    return (
+        exists()
+        .where(Trip.id == trip_id, Trip.deleted_at.is_(None))
+        .correlate_except(Trip)
+    )
+
+
+def get_live_trip(session: Session, trip_id: uuid.UUID | str) -> Trip:
+    """Return the trip, raising ResourceNotFoundError when missing or soft deleted."""
+    trip = session.get(Trip, trip_id)
+    if trip is None or trip.deleted_at is not None:
+        raise ResourceNotFoundError("Trip", trip_id)
+    return trip
+
+
+def purge_deleted_trips(
+    older_than: timedelta, batch_size: int, pause: float = 0.0
+) -> Iterator[int]:
+    """Hard delete trips soft deleted over older_than ago, yielding each batch's count.
+
+    Every batch is its own transaction. Trips another purge is busy with are
+    skipped instead of waited for.
+    """
+    while True:
+        batch = (
+            select(Trip.id)
+            .where(Trip.deleted_at < func.now() - older_than)
+            .order_by(Trip.deleted_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        with Session(engine) as session:
+            result = session.execute(
+                delete(Trip)
+                .where(Trip.id.in_(batch.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+        logger.info("Purged %d soft deleted trips", result.rowcount)
+        yield result.rowcount
+        if result.rowcount < batch_size:
+            return
+        time.sleep(pause)
@@ -0,0 +1,105 @@
+"""Prebuilt statements of the hottest routes.
+
+Building a select() with its joins, filters and loader options costs more Python
+than running it once SQLAlchemy has the compiled form cached. These statements are
+built once at import with bound parameters in place of request values. Their
+cache key is memoized on the statement, so every execution goes straight to the
+compiled cache. The SQL text is the same on every call, so psycopg prepares it
+server side after DB_PREPARE_THRESHOLD runs on a connection and Postgres skips
+parsing and planning from then on.
+
+Execute with the values as params, e.g.
+session.exec(UPCOMING_TRIPS, params={"user_id": user_id, "today": today}).
+"""
+
+from sqlalchemy import bindparam
+from sqlalchemy.orm import aliased, selectinload
+from sqlmodel import select
+
+from src.core.archive import (
+    ArchivedCar,
+    ArchivedInvitation,
+    ArchivedTrip,
+    past_trips,
+)
+from src.core.soft_delete import trip_is_live
+from src.models.models import Invitation, InvitationEnum, Trip, User
+
+_user_trips = (
+    select(Trip)
+    .options(selectinload(Trip.owner_user))
+    .join(Invitation, Trip.id == Invitation.trip_id)
+    .where(Invitation.user_id == bindparam("user_id"), Trip.deleted_at.is_(None))
+    .distinct()
+)
+
+# get_trips, params user_id and today. Upcoming trips are all hot, past trips are
+# read from both the hot tables and the archive
+UPCOMING_TRIPS = _user_trips.where(Trip.end_date >= bindparam("today"))
+_past_trips = aliased(
+    Trip,
+    past_trips(bindparam("user_id"), bindparam("today")),
+    adapt_on_names=True,
+)
+PAST_TRIPS = select(_past_trips).options(selectinload(_past_trips.owner_user))
+
+# get_trip, param trip_id
+TRIP_WITH_OWNER = (
+    select(Trip)
+    .options(selectinload(Trip.owner_user))
+    .where(Trip.id == bindparam("trip_id"), Trip.deleted_at.is_(None))
+)
+
+# get_trip of an archived trip, param trip_id
+ARCHIVED_TRIP_WITH_OWNER = (
+    select(ArchivedTrip)
+    .options(selectinload(ArchivedTrip.owner_user))
+    .where(ArchivedTrip.id == bindparam("trip_id"))
+)
+
+# get_invited_users, param trip_id
+INVITED_USERS = (
+    select(User, Invitation.rsvp)
+    .join(Invitation, Invitation.user_id == User.id)
+    .where(
+        Invitation.trip_id == bindparam("trip_id"),
+        trip_is_live(bindparam("trip_id")),
+    )
+)
+
+# get_invited_users of an archived trip, param trip_id
+ARCHIVED_INVITED_USERS = (
+    select(User, ArchivedInvitation.rsvp)
+    .join(ArchivedInvitation, ArchivedInvitation.user_id == User.id)
+    .where(ArchivedInvitation.trip_id == bindparam("trip_id"))
+)
+
+# get_cars_for_trip of an archived trip, param trip_id
+ARCHIVED_CARS = (
+    select(ArchivedCar)
+    .options(selectinload(ArchivedCar.owner_user))
+    .where(ArchivedCar.trip_id == bindparam("trip_id"))
+)
+
+# get_invitations, param user_id
+PENDING_INVITATIONS = (
+    select(Invitation, Trip, User.firstname, User.lastname)
+    .join(Trip, Invitation.trip_id == Trip.id)
+    .join(User, Trip.owner == User.id)
+    .where(
+        Invitation.user_id == bindparam("user_id"),
+        Invitation.rsvp == InvitationEnum.PENDING,
+        Trip.deleted_at.is_(None),
+    )
+)
+
+# can_view_trip of the live routes, params trip_id and user_id
+TRIP_MEMBERSHIP = (
+    select(Invitation.id)
+    .where(
+        Invitation.trip_id == bindparam("trip_id"),
+        Invitation.user_id == bindparam("user_id"),
+        trip_is_live(bindparam("trip_id")),
+    )
+    .limit(1)
+)
@@ -0,0 +1,62 @@
+"""Streamed responses for large collections.
+
+Rows are read from a server side cursor in batches of STREAM_BATCH_SIZE and
+encoded batch by batch. A response holds one batch in memory no matter how many
+rows it has, and its first bytes leave before the query has finished.
+
+The json format keeps the {"data": [...]} envelope of the buffered response. The
+ndjson format writes one object per line, for clients that parse incrementally.
+"""
+
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Literal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import RowMapping, Select
+from sqlmodel import Session
+
+from src.core.config import settings
+from src.core.db import engine
+
+StreamFormat = Literal["json", "ndjson"]
+
+MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+
+def row_batches(statement: Select) -> Iterator[Sequence[RowMapping]]:
+    """Rows of statement in batches, fetched through a server side cursor.
+
+    Runs on a session of its own. The request session is closed before a
+    streamed body is sent.
+    """
+    with Session(engine) as session:
+        result = session.execute(
+            statement, execution_options={"yield_per": settings.STREAM_BATCH_SIZE}
+        )
+        yield from result.mappings().partitions()
+
+
+def json_array(batches: Iterable[list[bytes]]) -> Iterator[bytes]:
+    """Write encoded items as the data array of the DTO envelope, one chunk per batch."""
+    yield b'{"data":['
+    separator = b""
+    for batch in batches:
+        if batch:
+            yield separator + b",".join(batch)
+            separator = b","
+    yield b"]}"
+
+
+def ndjson(batches: Iterable[list[bytes]]) -> Iterator[bytes]:
+    """Write encoded items one per line, one chunk per batch."""
+    for batch in batches:
+        if batch:
+            yield b"\n".join(batch) + b"\n"
+
+
+def stream_items(
+    batches: Iterable[list[bytes]], fmt: StreamFormat
+) -> StreamingResponse:
+    """Stream batches of encoded items in the requested format."""
+    body = json_array(batches) if fmt == "json" else ndjson(batches)
+    return StreamingResponse(body, media_type=MEDIA_TYPES[fmt])
@@ -0,0 +1,84 @@
+"""Worker warmup run from the app lifespan before the worker reports ready.
+
+Everything a first request would otherwise pay for is done up front: opening the
+pooled Postgres connections, configuring SQLAlchemy mappers, building Pydantic
+schemas for every route, loading the mountain catalog and creating the Supabase
+and Vonage clients.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+
+from src.api.deps import get_supabase_client, get_vonage_client
+from src.core.db import engine
+from src.core.mountains import get_catalog
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Readiness:
+    ready: bool = False
+    warmup_seconds: float | None = None
+    failed_steps: list[str] = field(default_factory=list)
+
+
+readiness = Readiness()
+
+
+def warm_pool() -> None:
+    """Open every pooled connection so no request waits on a Postgres handshake."""
+    connections = []
+    try:
+        for _ in range(engine.pool.size()):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        # back into the pool, still open
+        for connection in connections:
+            connection.close()
+
+
+def warm_models(app: FastAPI) -> None:
+    """Configure ORM mappers and build the DTO schemas for every route."""
+    configure_mappers()
+    # generates the schema of every route's params, body and response, so the
+    # deferred ones are built here instead of on the first request using them
+    app.openapi()
+
+
+def warm_clients(app: FastAPI) -> None:
+    """Create the cached SDK clients, honoring dependency overrides."""
+    for dependency in (get_supabase_client, get_vonage_client):
+        app.dependency_overrides.get(dependency, dependency)()
+
+
+def warm_up(app: FastAPI) -> None:
+    """Run every warmup step, then mark the worker ready if they all succeeded."""
+    started = time.perf_counter()
+    steps = {
+        "database_pool": warm_pool,
+        "models": lambda: warm_models(app),
+        "mountains": get_catalog,
+        "clients": lambda: warm_clients(app),
+    }
+    failed = []
+    for name, step in steps.items():
+        try:
+            step()
+        except Exception:
+            logger.exception("Warmup step %s failed", name)
+            failed.append(name)
+    readiness.failed_steps = failed
+    readiness.warmup_seconds = time.perf_counter() - started
+    # a worker that could not warm up stays out of rotation, the old ones keep serving
+    readiness.ready = not failed
+    logger.info(
+        "Warmup finished in %.2fs, ready: %s", readiness.warmup_seconds, readiness.ready
+    )
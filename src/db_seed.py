@@ -1,6 +1,389 @@
-"""Pre start script for creating SQL tables and seeding data."""
+"""Pre start script for creating SQL tables and seeding data.
 
-from src.core.db import init_db
+Without arguments only creates missing tables. With --users it also generates a
+reproducible synthetic dataset at production scale and bulk loads it with COPY:
+
+    python -m src.db_seed --users 1000000 --trips 400000 --seed 7 --truncate
+
+Friendship degree and invitee counts follow heavy tailed distributions so a few
+users have thousands of friends while most have a handful, like real social data.
+"""
+
+import argparse
+import logging
+import random
+import time
+import uuid
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+
+from sqlmodel import Session
+
+from src.core.counters import count_missing
+from src.core.db import engine, init_db
+from src.models.models import FriendshipStatus, InvitationEnum
+
+logger = logging.getLogger(__name__)
+
+MOUNTAINS = (
+    "Aspen Snowmass",
+    "Alta",
+    "Arapahoe Basin",
+    "Big Sky",
+    "Brighton",
+    "Copper Mountain",
+    "Deer Valley",
+    "Eldora",
+    "Jackson Hole",
+    "Killington",
+    "Mammoth Mountain",
+    "Palisades Tahoe",
+    "Snowbird",
+    "Solitude",
+    "Steamboat",
+    "Stowe",
+    "Sugarbush",
+    "Taos",
+    "Whistler Blackcomb",
+    "Winter Park",
+)
+FIRST_NAMES = ("Alex", "Sam", "Jordan", "Taylor", "Casey", "Riley", "Morgan", "Jamie")
+LAST_NAMES = ("Smith", "Lee", "Garcia", "Chen", "Brown", "Patel", "Kim", "Nguyen")
+FRIENDSHIP_STATUS_WEIGHTS = {
+    FriendshipStatus.ACCEPTED: 75,
+    FriendshipStatus.PENDING: 15,
+    FriendshipStatus.REJECTED: 7,
+    FriendshipStatus.BLOCKED: 3,
+}
+RSVP_WEIGHTS = {
+    InvitationEnum.ACCEPTED: 45,
+    InvitationEnum.PENDING: 30,
+    InvitationEnum.UNCERTAIN: 15,
+    InvitationEnum.DECLINED: 10,
+}
+SEED_TABLES = ("passengers", "cars", "invitations", "trips", "friendships", "users")
+# row triggers keeping user_counters current, fired once per copied row otherwise
+COUNTING_TRIGGERS = {
+    "invitations": "count_invitation",
+    "friendships": "count_friendship",
+}
+COPY_PROGRESS_EVERY = 500_000
+
+
+@dataclass(frozen=True)
+class SeedConfig:
+    users: int
+    trips: int
+    anchor_date: date
+    seed: int = 0
+    mean_friends: float = 20.0
+    max_friends: int = 5_000
+    mean_invitees: float = 6.0
+    max_invitees: int = 60
+    external_invite_ratio: float = 0.1
+    car_trip_ratio: float = 0.6
+
+
+class DataGenerator:
+    """Yields rows for every table from a single seeded random stream."""
+
+    def __init__(self, config: SeedConfig) -> None:
+        """Construct generator whose output depends only on config."""
+        self.config = config
+        self.rng = random.Random(config.seed)  # noqa: S311
+        self.user_ids = [self._uuid() for _ in range(config.users)]
+        # filled while invitations are generated, consumed by cars and passengers
+        self.accepted_by_trip: dict[uuid.UUID, list[uuid.UUID]] = {}
+
+    def _uuid(self) -> uuid.UUID:
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def _heavy_tailed(self, mean: float, maximum: int) -> int:
+        """Pareto distributed count with roughly the given mean, capped at maximum."""
+        alpha = 1.5  # mean of a pareto(alpha) sample is alpha / (alpha - 1) = 3
+        return min(maximum, int(self.rng.paretovariate(alpha) * mean / 3))
+
+    def _popular_user(self) -> int:
+        """Index of a user, skewed so low indices are picked far more often."""
+        return int(self.config.users * self.rng.random() ** 3)
+
+    def _weighted[T](self, weights: dict[T, int]) -> T:
+        return self.rng.choices(tuple(weights), weights=tuple(weights.values()))[0]
+
+    @staticmethod
+    def phone(index: int) -> str:
+        """Canonical phone number of the user at index."""
+        return f"+1{2_000_000_000 + index}"
+
+    def users(self) -> Iterator[Sequence[object]]:
+        """Rows of (id, phone, firstname, lastname, username, is_onboarded)."""
+        for index, user_id in enumerate(self.user_ids):
+            yield (
+                user_id,
+                self.phone(index),
+                self.rng.choice(FIRST_NAMES),
+                self.rng.choice(LAST_NAMES),
+                f"rider{index}",
+                self.rng.random() < 0.95,  # noqa: PLR2004
+            )
+
+    def friendships(self) -> Iterator[Sequence[object]]:
+        """Rows of (requester_id, addressee_id, status) with a skewed degree distribution."""
+        user_count = self.config.users
+        seen: set[int] = set()
+        for requester in range(user_count):
+            degree = self._heavy_tailed(
+                self.config.mean_friends / 2, self.config.max_friends
+            )
+            for _ in range(degree):
+                addressee = self._popular_user()
+                if addressee == requester:
+                    continue
+                # matches the unique index on (least, greatest) of the pair
+                low, high = sorted((requester, addressee))
+                pair = low * user_count + high
+                if pair in seen:
+                    continue
+                seen.add(pair)
+                yield (
+                    self.user_ids[requester],
+                    self.user_ids[addressee],
+                    self._weighted(FRIENDSHIP_STATUS_WEIGHTS).value,
+                )
+
+    def trips_and_invitations(
+        self,
+    ) -> tuple[list[Sequence[object]], Iterator[Sequence[object]]]:
+        """Return trip rows and a lazy iterator over their invitation rows."""
+        trips = []
+        for _ in range(self.config.trips):
+            start = self.config.anchor_date + timedelta(
+                days=self.rng.randint(-3 * 365, 365)
+            )
+            mountain = self.rng.choice(MOUNTAINS)
+            trips.append(
+                (
+                    self._uuid(),
+                    self.user_ids[self._popular_user()],
+                    f"{mountain} weekend",
+                    start,
+                    start + timedelta(days=self.rng.randint(0, 6)),
+                    f"{self.rng.randint(5, 10):02d}:00",
+                    mountain,
+                    None,
+                )
+            )
+        return trips, self._invitations(trips)
+
+    def _invitations(self, trips: list[Sequence[object]]) -> Iterator[Sequence[object]]:
+        """Rows of (id, trip_id, user_id, registered_phone, rsvp, claim_user_id)."""
+        external_phone = self.config.users
+        for trip_id, owner, *_ in trips:
+            accepted = [owner]
+            yield (
+                self._uuid(),
+                trip_id,
+                owner,
+                None,
+                InvitationEnum.ACCEPTED.value,
+                None,
+            )
+            invited = {owner}
+            count = self._heavy_tailed(
+                self.config.mean_invitees, self.config.max_invitees
+            )
+            for _ in range(count):
+                rsvp = self._weighted(RSVP_WEIGHTS)
+                if self.rng.random() < self.config.external_invite_ratio:
+                    # phones past the user range never match a registered user
+                    external_phone += 1
+                    yield (
+                        self._uuid(),
+                        trip_id,
+                        None,
+                        self.phone(external_phone),
+                        InvitationEnum.PENDING.value,
+                        None,
+                    )
+                    continue
+                invitee = self.user_ids[self._popular_user()]
+                if invitee in invited:
+                    continue
+                invited.add(invitee)
+                claimed = invitee if rsvp != InvitationEnum.PENDING else None
+                yield (self._uuid(), trip_id, invitee, None, rsvp.value, claimed)
+                if rsvp == InvitationEnum.ACCEPTED:
+                    accepted.append(invitee)
+            self.accepted_by_trip[trip_id] = accepted
+
+    def cars_and_passengers(
+        self,
+    ) -> tuple[list[Sequence[object]], list[Sequence[object]]]:
+        """Rows of cars (id, trip_id, owner, seat_count) and passengers (user_id, car_id, seat_position)."""
+        cars, passengers = [], []
+        for trip_id, accepted in self.accepted_by_trip.items():
+            if self.rng.random() >= self.config.car_trip_ratio:
+                continue
+            riders = accepted[:]
+            self.rng.shuffle(riders)
+            while riders:
+                owner = riders.pop()
+                seat_count = self.rng.choice((4, 5, 7))
+                car_id = self._uuid()
+                cars.append((car_id, trip_id, owner, seat_count))
+                for seat_position in range(1, seat_count):
+                    if not riders:
+                        break
+                    passengers.append((riders.pop(), car_id, seat_position))
+        return cars, passengers
+
+
+def copy_rows(
+    cursor: object, table: str, columns: Sequence[str], rows: Iterator[Sequence[object]]
+) -> int:
+    """Stream rows into table with COPY FROM STDIN and return how many were written."""
+    started = time.perf_counter()
+    count = 0
+    # quoted, trips has a column named desc
+    quoted = ", ".join(f'"{column}"' for column in columns)
+    statement = f"COPY public.{table} ({quoted}) FROM STDIN"
+    with cursor.copy(statement) as copy:
+        for row in rows:
+            copy.write_row(row)
+            count += 1
+            if count % COPY_PROGRESS_EVERY == 0:
+                logger.info("%s: %d rows", table, count)
+    logger.info(
+        "Copied %d rows into %s in %.1fs", count, table, time.perf_counter() - started
+    )
+    return count
+
+
+def seed(config: SeedConfig, *, truncate: bool = False) -> None:
+    """Generate the synthetic dataset and bulk load it in one transaction.
+
+    The counting triggers are off during the load, the counters of the new users
+    are filled in afterwards by one set based insert.
+    """
+    generator = DataGenerator(config)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            if truncate:
+                cursor.execute(
+                    f"TRUNCATE {', '.join(f'public.{t}' for t in SEED_TABLES)} CASCADE"
+                )
+            # transactional, a failed load rolls back to the triggers enabled
+            for table, trigger in COUNTING_TRIGGERS.items():
+                cursor.execute(f"ALTER TABLE public.{table} DISABLE TRIGGER {trigger}")
+            copy_rows(
+                cursor,
+                "users",
+                ("id", "phone", "firstname", "lastname", "username", "is_onboarded"),
+                generator.users(),
+            )
+            copy_rows(
+                cursor,
+                "friendships",
+                ("requester_id", "addressee_id", "status"),
+                generator.friendships(),
+            )
+            trips, invitations = generator.trips_and_invitations()
+            copy_rows(
+                cursor,
+                "trips",
+                (
+                    "id",
+                    "owner",
+                    "title",
+                    "start_date",
+                    "end_date",
+                    "start_time",
+                    "mountain",
+                    "desc",
+                ),
+                iter(trips),
+            )
+            copy_rows(
+                cursor,
+                "invitations",
+                (
+                    "id",
+                    "trip_id",
+                    "user_id",
+                    "registered_phone",
+                    "rsvp",
+                    "claim_user_id",
+                ),
+                invitations,
+            )
+            cars, passengers = generator.cars_and_passengers()
+            copy_rows(
+                cursor, "cars", ("id", "trip_id", "owner", "seat_count"), iter(cars)
+            )
+            copy_rows(
+                cursor,
+                "passengers",
+                ("user_id", "car_id", "seat_position"),
+                iter(passengers),
+            )
+            for table, trigger in COUNTING_TRIGGERS.items():
+                cursor.execute(f"ALTER TABLE public.{table} ENABLE TRIGGER {trigger}")
+        connection.commit()
+        # fresh statistics so the planner sees the new volumes right away
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            for table in SEED_TABLES:
+                cursor.execute(f"ANALYZE public.{table}")
+    finally:
+        connection.close()
+
+    started = time.perf_counter()
+    with Session(engine) as session:
+        counted = count_missing(session)
+        session.commit()
+    logger.info("Counted %d users in %.1fs", counted, time.perf_counter() - started)
+
+
+def main() -> None:
+    """Create tables and optionally generate synthetic data from CLI arguments."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--users", type=int, default=0, help="users to generate, 0 only creates tables"
+    )
+    parser.add_argument(
+        "--trips", type=int, help="trips to generate, defaults to users / 2"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--anchor-date",
+        type=date.fromisoformat,
+        default=datetime.now(UTC).date(),
+        help="date trips are spread around, fix it to reproduce a dataset exactly",
+    )
+    parser.add_argument("--mean-friends", type=float, default=20.0)
+    parser.add_argument("--mean-invitees", type=float, default=6.0)
+    parser.add_argument(
+        "--truncate", action="store_true", help="empty the seeded tables first"
+    )
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     init_db()
+    if not args.users:
+        return
+    config = SeedConfig(
+        users=args.users,
+        trips=args.trips if args.trips is not None else args.users // 2,
+        seed=args.seed,
+        anchor_date=args.anchor_date,
+        mean_friends=args.mean_friends,
+        mean_invitees=args.mean_invitees,
+    )
+    seed(config, truncate=args.truncate)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,47 @@
 """FastAPI entry point. Creates FastAPI app and setup/teardown logic."""
 
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
-from src.api.main import api_router
+from src.api.main import include_api
 from src.core.config import settings
 from src.core.exception_handlers import setup_exception_handlers
+from src.core.idempotency import IdempotencyMiddleware
+from src.core.metrics import MetricsMiddleware, exporter
+from src.core.realtime import broker
+from src.core.warmup import readiness, warm_up
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None]:
+    """Warm up and start background services for each worker, stop them on shutdown."""
+    if settings.METRICS_ENABLED:
+        exporter.start()
+    # uvicorn accepts no connections, probes included, until startup returns
+    await run_in_threadpool(warm_up, app)
+    if settings.REALTIME_ENABLED:
+        broker.start()
+    yield
+    readiness.ready = False
+    if settings.REALTIME_ENABLED:
+        await broker.stop()
+    if settings.METRICS_ENABLED:
+        exporter.stop()
 
-app = FastAPI(title=settings.PROJECT_NAME)
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 setup_exception_handlers(app)
 
+app.add_middleware(IdempotencyMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
         CORSMiddleware,
@@ -20,4 +51,4 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
-app.include_router(router=api_router, prefix=settings.API_V1_STR)
+include_api(app)
@@ -4,12 +4,21 @@ import re
 import uuid
 from datetime import date, datetime
 from enum import Enum
-from typing import Literal
+from typing import Any, Literal
 
 from pydantic import Field as PydanticField
 from pydantic import field_validator
-from sqlalchemy import Column
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Computed,
+    LargeBinary,
+    PrimaryKeyConstraint,
+    Table,
+    Uuid,
+)
 from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
 from sqlmodel import (
     CheckConstraint,
     DateTime,
@@ -25,7 +34,11 @@ from sqlmodel import (
 from src.models.model_config import ConfiguredBaseModel
 
 MIN_PHONE_NUMBER_LENGTH = 10
-MAX_PHONE_NUMBER_LENGTH = 16
+MAX_PHONE_NUMBER_LENGTH = 15
+NATIONAL_PHONE_NUMBER_LENGTH = 10
+DEFAULT_COUNTRY_CODE = "1"
+# text search configuration of the trip search vector and of search queries
+SEARCH_CONFIG = "english"
 
 
 # ============================================================================
@@ -60,6 +73,9 @@ class Friendships(SQLModel, table=True):
             func.greatest(column("requester_id"), column("addressee_id")),
             unique=True,
         ),
+        # delta sync range scans, per side of the friendship
+        Index("ix_friendships_requester_id_updated_at", "requester_id", "updated_at"),
+        Index("ix_friendships_addressee_id_updated_at", "addressee_id", "updated_at"),
         {"schema": "public"},
     )
     id: uuid.UUID | None = Field(
@@ -192,6 +208,11 @@ class AttendanceList(ConfiguredBaseModel):
     declined: list["UserPublic"]
 
 
+class InvitedUser(ConfiguredBaseModel):
+    rsvp: InvitationEnum
+    user: "UserPublic"
+
+
 class InvitationBatchResponseData(ConfiguredBaseModel):
     all_invites_processed_successfully: bool
     sms_failures_count: int = 0
@@ -215,6 +236,14 @@ class Invitation(SQLModel, table=True):
             unique=True,
             postgresql_where=text("registered_phone IS NOT NULL"),
         ),
+        Index(
+            "ix_invitations_unclaimed_registered_phone",
+            "registered_phone",
+            postgresql_where=text("user_id IS NULL"),
+        ),
+        # delta sync range scans, per trip and for the caller's own invitations
+        Index("ix_invitations_trip_id_updated_at", "trip_id", "updated_at"),
+        Index("ix_invitations_user_id_updated_at", "user_id", "updated_at"),
         {"schema": "public"},
     )
 
@@ -237,6 +266,7 @@ class Invitation(SQLModel, table=True):
         default=None,
         nullable=True,
     )
+    # canonical E.164, normalized on write by the request models
     registered_phone: str | None = Field(default=None, nullable=True)
     rsvp: InvitationEnum | None = Field(
         default=InvitationEnum.PENDING,
@@ -266,11 +296,6 @@ class Invitation(SQLModel, table=True):
         nullable=False,
     )
 
-    @field_validator("registered_phone", mode="before")
-    @classmethod
-    def validate_phone(cls, v: str) -> str | None:
-        return clean_and_validate_phone(v)
-
 
 class InvitationUpdate(ConfiguredBaseModel):
     invite_token: str
@@ -301,17 +326,49 @@ class TripBase(ConfiguredBaseModel):
     start_date: date
     end_date: date
     mountain: str
+    # catalog id of the resort, see src.core.mountains
+    mountain_id: str | None = None
     start_time: str | None = None
     desc: str | None = None
 
 
+def trip_search_vector() -> Column:
+    """Build the generated tsvector of title, mountain and description, weighted in that order."""
+    return Column(
+        "search_vector",
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', title), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', mountain), 'B') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(\"desc\", '')), 'C')",
+            persisted=True,
+        ),
+    )
+
+
 class Trip(SQLModel, table=True):
     __tablename__ = "trips"
     __table_args__ = (
         CheckConstraint("start_date <= end_date", name="valid_date_range"),
         CheckConstraint("title != ''", name="non_empty_title"),
+        # the purge job's queue, live trips stay out of the index
+        Index(
+            "ix_trips_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+        ),
+        # written by Postgres and read by src.core.search only, never loaded
+        trip_search_vector(),
+        Index("ix_trips_search_vector", "search_vector", postgresql_using="gin"),
+        # overlap checks of src.core.conflicts, which must use the same expression
+        Index(
+            "ix_trips_date_range",
+            func.daterange(column("start_date"), column("end_date"), text("'[]'")),
+            postgresql_using="gist",
+        ),
         {"schema": "public"},
     )
+    __mapper_args__ = {"exclude_properties": ["search_vector"]}
 
     id: uuid.UUID = Field(
         default=None,
@@ -332,6 +389,8 @@ class Trip(SQLModel, table=True):
         regex=r"^(?:[01]\d|2[0-3]):[0-5]\d$",  # regex to match hh:mm 24 hour time
     )
     mountain: str = Field(nullable=False)
+    # resolved from mountain on every write, groups trips by resort however spelled
+    mountain_id: str | None = Field(default=None, index=True)
     desc: str | None = Field(default=None)
     trip_image_storage_path: str | None = Field(default=None)
     created_at: datetime = Field(
@@ -346,6 +405,10 @@ class Trip(SQLModel, table=True):
         sa_column_kwargs={"server_default": func.now(), "onupdate": func.now()},
         nullable=False,
     )
+    # set by delete_trip, the row and its children are hard deleted by purge-trips
+    deleted_at: datetime | None = Field(
+        default=None, sa_type=DateTime(timezone=True), nullable=True
+    )
     owner_user: "User" = Relationship(back_populates="owned_trips")
     cars: list["Car"] = Relationship()
 
@@ -359,6 +422,7 @@ class TripUpdate(ConfiguredBaseModel):
     start_date: date | None = None
     end_date: date | None = None
     mountain: str | None = None
+    mountain_id: str | None = None
     desc: str | None = None
     start_time: str | None = None
     trip_image_storage_path: str | None = None
@@ -368,6 +432,45 @@ class TripPublic(TripBase):
     id: uuid.UUID
     owner: "UserPublic"
     trip_image_storage_path: str | None
+    image: "ImageUrls | None" = None
+
+
+class TripSearchPage(ConfiguredBaseModel):
+    """Trips matching a search, best match first.
+
+    Pass cursor back for the next page, it is None on the last one.
+    """
+
+    trips: list[TripPublic]
+    cursor: str | None = None
+
+
+class TripOverlap(ConfiguredBaseModel):
+    """A trip the user accepted whose dates overlap another one's."""
+
+    id: uuid.UUID
+    title: str
+    mountain: str
+    start_date: date
+    end_date: date
+
+
+class TripConflict(ConfiguredBaseModel):
+    trip: TripOverlap
+    overlaps: list[TripOverlap]
+
+
+# ============================================================================
+# MOUNTAIN MODELS
+# ============================================================================
+"""Ski resorts of the bundled catalog, see src.core.mountains."""
+
+
+class MountainPublic(ConfiguredBaseModel):
+    id: str
+    name: str
+    region: str
+    country: str
 
 
 # ============================================================================
@@ -380,7 +483,10 @@ Defines the database tables and relationships for users
 
 
 def clean_and_validate_phone(phone: str | None) -> str | None:
-    """Clean phone number by removing non-digits and validate format."""
+    """Clean phone number by removing non-digits, validate format and return it in canonical E.164 form.
+
+    Only called on write paths, stored phone numbers are already canonical.
+    """
     if phone is None:
         return None
 
@@ -394,14 +500,19 @@ def clean_and_validate_phone(phone: str | None) -> str | None:
             f"Phone number must be between 10-15 digits, got {len(cleaned)}"
         )
 
-    return cleaned
+    # national numbers without a country code default to the US
+    if len(cleaned) == NATIONAL_PHONE_NUMBER_LENGTH:
+        cleaned = DEFAULT_COUNTRY_CODE + cleaned
+
+    return f"+{cleaned}"
 
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
     __table_args__ = {"schema": "public"}
     id: uuid.UUID = Field(primary_key=True)
-    phone: str | None = Field(default=None, max_length=15)
+    # canonical E.164, normalized on write so equality lookups can use the index
+    phone: str | None = Field(default=None, max_length=16, index=True)
     firstname: str | None = Field(default=None, max_length=30)
     lastname: str | None = Field(default=None, max_length=30)
     username: str | None = Field(default=None, max_length=30)
@@ -443,11 +554,6 @@ class User(SQLModel, table=True):
         },
     )
 
-    @field_validator("phone", mode="before")
-    @classmethod
-    def validate_phone(cls, v: str) -> str | None:
-        return clean_and_validate_phone(v)
-
     @property
     def friends_with_details(self) -> list["UserWithFriendshipInfo"]:
         """Returns a list of friends, each with their User object and the
@@ -503,11 +609,14 @@ class UserPublic(ConfiguredBaseModel):
     username: str | None
     is_onboarded: bool
     avatar_public_url: str | None
+    # where the avatar is stored, read to sign its URLs and never sent to clients
+    avatar_storage_path: str | None = PydanticField(default=None, exclude=True)
+    avatar: "ImageUrls | None" = None
 
-    @field_validator("phone", mode="before")
-    @classmethod
-    def validate_phone(cls, v: str) -> str | None:
-        return clean_and_validate_phone(v)
+
+class OnboardingResponseData(ConfiguredBaseModel):
+    is_onboarded: bool
+    backfilled_trip_ids: list[uuid.UUID] = Field(default_factory=list)
 
 
 class UserWithFriendshipInfo(ConfiguredBaseModel):
@@ -528,6 +637,34 @@ class UserUpdate(ConfiguredBaseModel):
         return clean_and_validate_phone(v)
 
 
+class UserCounters(SQLModel, table=True):
+    """Home screen counts, kept current by triggers on the counted tables."""
+
+    __tablename__ = "user_counters"
+    __table_args__ = {"schema": "public"}
+
+    user_id: uuid.UUID = Field(
+        foreign_key="public.users.id", primary_key=True, ondelete="CASCADE"
+    )
+    upcoming_trips: int = Field(default=0, nullable=False)
+    pending_invitations: int = Field(default=0, nullable=False)
+    pending_friend_requests: int = Field(default=0, nullable=False)
+    # earliest end_date of the counted upcoming trips, the count is redone once it passes
+    upcoming_valid_until: date | None = Field(default=None, nullable=True)
+    updated_at: datetime = Field(
+        default=func.now(),
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"server_default": func.now(), "onupdate": func.now()},
+        nullable=False,
+    )
+
+
+class UserSummary(ConfiguredBaseModel):
+    upcoming_trips: int
+    pending_invitations: int
+    pending_friend_requests: int
+
+
 # ============================================================================
 # CAR & PASSENGER MODELS
 # ============================================================================
@@ -554,7 +691,11 @@ class CarUpdate(CarBase):
 
 class Car(SQLModel, table=True):
     __tablename__ = "cars"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # delta sync range scans per trip
+        Index("ix_cars_trip_id_updated_at", "trip_id", "updated_at"),
+        {"schema": "public"},
+    )
     id: uuid.UUID = Field(
         default=None,
         primary_key=True,
@@ -598,7 +739,11 @@ class PassengerBase(ConfiguredBaseModel):
 
 class Passenger(SQLModel, table=True):
     __tablename__ = "passengers"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # delta sync range scans per car
+        Index("ix_passengers_car_id_updated_at", "car_id", "updated_at"),
+        {"schema": "public"},
+    )
     user_id: uuid.UUID = Field(
         foreign_key="public.users.id",
         primary_key=True,
@@ -635,3 +780,260 @@ class PassengerPublic(PassengerBase):
 
 class PassengerCreate(PassengerBase):
     pass
+
+
+# ============================================================================
+# RATE LIMIT MODELS
+# ============================================================================
+"""Data models for shared rate limiting state.
+
+Token buckets shared by every worker when the postgres rate limit backend is used.
+"""
+
+
+class RateLimitBucket(SQLModel, table=True):
+    __tablename__ = "rate_limit_buckets"
+    # state is disposable, skip the WAL
+    __table_args__ = {"schema": "public", "prefixes": ["UNLOGGED"]}
+    key: str = Field(primary_key=True)
+    tokens: float = Field(nullable=False)
+    allowed: bool = Field(default=True, nullable=False)
+    refreshed_at: datetime = Field(
+        default=func.now(),
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"server_default": func.now()},
+        nullable=False,
+    )
+
+
+# ============================================================================
+# SYNC MODELS
+# ============================================================================
+"""Data models for delta sync of offline first clients.
+
+Deletes are recorded as tombstones by triggers on the synced tables, so cascades
+and deletes outside the API are covered too.
+"""
+
+
+class Tombstone(SQLModel, table=True):
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        Index("ix_tombstones_deleted_at_id", "deleted_at", "id"),
+        Index("ix_tombstones_audience", "audience", postgresql_using="gin"),
+        {"schema": "public"},
+    )
+    id: int | None = Field(default=None, primary_key=True, sa_type=BigInteger)
+    # table name of the deleted row
+    entity: str = Field(nullable=False)
+    # primary key of the deleted row, car_id and user_id for passengers
+    entity_key: dict[str, str] = Field(sa_column=Column(JSONB, nullable=False))
+    # users who could see the row when it was deleted
+    audience: list[uuid.UUID] = Field(sa_column=Column(ARRAY(Uuid), nullable=False))
+    deleted_at: datetime = Field(
+        default=func.now(),
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"server_default": func.now()},
+        nullable=False,
+    )
+
+
+class TripSync(TripBase):
+    id: uuid.UUID
+    owner: uuid.UUID
+    trip_image_storage_path: str | None
+    updated_at: datetime
+
+
+class InvitationSync(ConfiguredBaseModel):
+    id: uuid.UUID
+    trip_id: uuid.UUID
+    user_id: uuid.UUID | None
+    rsvp: InvitationEnum | None
+    paid: int | None
+    updated_at: datetime
+
+
+class CarSync(ConfiguredBaseModel):
+    id: uuid.UUID
+    trip_id: uuid.UUID
+    owner: uuid.UUID
+    seat_count: int
+    updated_at: datetime
+
+
+class PassengerSync(ConfiguredBaseModel):
+    car_id: uuid.UUID
+    user_id: uuid.UUID
+    seat_position: int | None
+    updated_at: datetime
+
+
+class FriendshipSync(ConfiguredBaseModel):
+    id: uuid.UUID
+    requester_id: uuid.UUID
+    addressee_id: uuid.UUID
+    status: FriendshipStatus
+    updated_at: datetime
+
+
+class TombstonePublic(ConfiguredBaseModel):
+    entity: str
+    key: dict[str, uuid.UUID] = PydanticField(validation_alias="entity_key")
+    deleted_at: datetime
+
+
+class SyncResponse(ConfiguredBaseModel):
+    """Rows changed since the request cursor.
+
+    Clients upsert every row, delete what the tombstones name and keep paging with
+    cursor while has_more is set. A deleted invitation of the caller also means the
+    trip is gone for them. With reset set the cursor was too old to replay deletes,
+    the page starts a full sync and local data must be replaced, not merged.
+    """
+
+    cursor: str
+    has_more: bool
+    reset: bool = False
+    trips: list[TripSync] = Field(default_factory=list)
+    invitations: list[InvitationSync] = Field(default_factory=list)
+    cars: list[CarSync] = Field(default_factory=list)
+    passengers: list[PassengerSync] = Field(default_factory=list)
+    friendships: list[FriendshipSync] = Field(default_factory=list)
+    tombstones: list[TombstonePublic] = Field(default_factory=list)
+
+
+# ============================================================================
+# IDEMPOTENCY MODELS
+# ============================================================================
+"""Data models for replaying the responses of retried requests."""
+
+
+class IdempotencyKey(SQLModel, table=True):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+        {"schema": "public"},
+    )
+    user_id: uuid.UUID = Field(primary_key=True)
+    key: str = Field(primary_key=True, max_length=255)
+    # hash of method, path, query and body, a key only replays for the same request
+    fingerprint: str = Field(nullable=False)
+    # null while the first request is still running
+    status_code: int | None = Field(default=None)
+    content_type: str | None = Field(default=None)
+    body: bytes | None = Field(default=None, sa_type=LargeBinary)
+    locked_at: datetime = Field(sa_type=DateTime(timezone=True), nullable=False)
+    expires_at: datetime = Field(sa_type=DateTime(timezone=True), nullable=False)
+
+
+# ============================================================================
+# ARCHIVE MODELS
+# ============================================================================
+"""Archive tables for trips that ended over TRIP_ARCHIVE_AFTER_DAYS ago.
+
+Same columns as the hot tables, without foreign keys, so a trip and everything
+under it moves with plain INSERT ... SELECT. trips_archive is partitioned by
+end_date, one partition per year, created by the archive job as needed. Reads map
+the ORM models onto these tables by column name, see src.core.archive.
+"""
+
+
+def archive_columns(model: type[SQLModel]) -> list[Column]:
+    """Copy the stored columns of a hot table, keeping names, types and nullability only."""
+    return [
+        Column(column.name, column.type, nullable=column.nullable)
+        for column in model.__table__.columns
+        if column.computed is None
+    ]
+
+
+trips_archive = Table(
+    "trips_archive",
+    SQLModel.metadata,
+    *archive_columns(Trip),
+    Column("archived_at", DateTime(timezone=True), server_default=func.now()),
+    trip_search_vector(),
+    # a partitioned table's primary key has to include the partition key
+    PrimaryKeyConstraint("id", "end_date"),
+    Index("ix_trips_archive_search_vector", "search_vector", postgresql_using="gin"),
+    schema="public",
+    postgresql_partition_by="RANGE (end_date)",
+)
+
+invitations_archive = Table(
+    "invitations_archive",
+    SQLModel.metadata,
+    *archive_columns(Invitation),
+    PrimaryKeyConstraint("id"),
+    Index("ix_invitations_archive_trip_id", "trip_id"),
+    Index("ix_invitations_archive_user_id", "user_id"),
+    schema="public",
+)
+
+cars_archive = Table(
+    "cars_archive",
+    SQLModel.metadata,
+    *archive_columns(Car),
+    PrimaryKeyConstraint("id"),
+    Index("ix_cars_archive_trip_id", "trip_id"),
+    schema="public",
+)
+
+passengers_archive = Table(
+    "passengers_archive",
+    SQLModel.metadata,
+    *archive_columns(Passenger),
+    PrimaryKeyConstraint("car_id", "user_id"),
+    schema="public",
+)
+
+
+# ============================================================================
+# BATCH MODELS
+# ============================================================================
+"""Data models for running several API requests in one HTTP round trip."""
+
+
+class BatchItem(ConfiguredBaseModel):
+    # echoed back so clients can match results to requests
+    id: str
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    # relative to the API prefix, query string included, e.g. /trips/?limit=5
+    path: str = PydanticField(pattern=r"^/([^/#][^#]*)?$")
+    body: Any = None
+    headers: dict[str, str] = Field(default_factory=dict)
+
+
+class BatchRequest(ConfiguredBaseModel):
+    requests: list[BatchItem] = PydanticField(min_length=1)
+
+
+class BatchResult(ConfiguredBaseModel):
+    id: str
+    status: int
+    body: Any = None
+
+
+# ============================================================================
+# IMAGE MODELS
+# ============================================================================
+
+
+class ImageUrls(ConfiguredBaseModel):
+    """Signed URLs of the size variants of one image."""
+
+    thumbnail: str | None
+    card: str | None
+    full: str | None
+
+
+# ============================================================================
+# HEALTH MODELS
+# ============================================================================
+
+
+class ReadinessPublic(ConfiguredBaseModel):
+    ready: bool
+    warmup_seconds: float | None
+    failed_steps: list[str]
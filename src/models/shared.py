@@ -1,7 +1,15 @@
 """Generic Util Models."""
 
+from pydantic import Field
+
 from src.models.model_config import ConfiguredBaseModel
+from src.models.models import TripOverlap
 
 
 class DTO[T](ConfiguredBaseModel):
     data: T
+
+
+class ConflictsDTO[T](DTO[T]):
+    # accepted trips of the user on overlapping dates, a warning, the write went through
+    conflicts: list[TripOverlap] = Field(default_factory=list)
@@ -0,0 +1,187 @@
+"""Production server: a prefork supervisor running uvicorn workers on one shared socket.
+
+The app is imported once in the supervisor before forking, so every worker shares
+the interpreter, SDK and model memory copy on write instead of importing its own.
+The supervisor binds the socket, forks the workers, restarts any that die and
+forwards SIGTERM/SIGINT for a graceful shutdown.
+
+    python -m src.server --port 8080
+"""
+
+import argparse
+import gc
+import logging
+import math
+import os
+import signal
+import socket
+import time
+from pathlib import Path
+from types import FrameType
+
+import uvicorn
+from fastapi import FastAPI
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CGROUP_CPU_MAX = Path("/sys/fs/cgroup/cpu.max")
+# a worker that dies sooner than this after starting is crash looping, slow down
+MIN_WORKER_LIFETIME = 1.0
+
+
+def available_cpus() -> int:
+    """Cpus this process may use, honoring affinity and a container cpu quota."""
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        quota, period = CGROUP_CPU_MAX.read_text().split()
+    except (OSError, ValueError):
+        return cpus
+    if quota == "max":
+        return cpus
+    return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+
+
+def split_pool_budget(workers: int) -> None:
+    """Give every worker an equal share of DB_POOL_BUDGET with no overflow on top."""
+    settings.DB_POOL_SIZE = max(1, settings.DB_POOL_BUDGET // workers)
+    settings.DB_MAX_OVERFLOW = 0
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Bind the listening socket every worker accepts from."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def load_app(*, sdks: bool = False) -> FastAPI:
+    """Import the app, which creates the engine with the pool settings in effect."""
+    from src.api.deps import import_sdks
+    from src.main import app
+
+    if sdks:
+        import_sdks()
+    return app
+
+
+class Supervisor:
+    """Forks the workers and keeps the configured number of them alive."""
+
+    def __init__(self, sock: socket.socket, workers: int, app: FastAPI | None) -> None:
+        """Construct supervisor, with app None each worker imports the app after forking."""
+        self.sock = sock
+        self.workers = workers
+        self.app = app
+        self.children: dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self) -> None:
+        """Fork one worker."""
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+        code = 1
+        try:
+            self.serve()
+            code = 0
+        except Exception:
+            logger.exception("Worker %d crashed", os.getpid())
+        finally:
+            # never return into the supervisor's loop from the child
+            logging.shutdown()
+            os._exit(code)
+
+    def serve(self) -> None:
+        """Run uvicorn in the worker process on the inherited socket."""
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        app = self.app if self.app is not None else load_app()
+        config = uvicorn.Config(
+            app,
+            loop="uvloop",
+            http="httptools",
+            lifespan="on",
+            timeout_keep_alive=settings.SERVER_KEEP_ALIVE,
+            backlog=settings.SERVER_BACKLOG,
+            proxy_headers=True,
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def stop(self, _signum: int, _frame: FrameType | None) -> None:
+        """Ask every worker to finish in flight requests and exit."""
+        self.stopping = True
+        for pid in self.children:
+            # SIGTERM, a second SIGINT (Ctrl-C reaches the whole group) would
+            # make uvicorn skip the graceful shutdown
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                continue
+
+    def run(self) -> None:
+        """Start the workers and restart any that exit until asked to stop."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info(
+            "Serving with %d workers, pool of %d connections each",
+            self.workers,
+            settings.DB_POOL_SIZE,
+        )
+        while self.children:
+            pid, status = os.wait()
+            started = self.children.pop(pid, None)
+            if self.stopping or started is None:
+                continue
+            logger.warning(
+                "Worker %d exited with status %d, restarting",
+                pid,
+                os.waitstatus_to_exitcode(status),
+            )
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+            self.spawn()
+
+
+def main() -> None:
+    """Parse arguments, size the workers and serve until SIGTERM."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="0.0.0.0")  # noqa: S104
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--workers", type=int, default=settings.SERVER_WORKERS or available_cpus()
+    )
+    parser.add_argument(
+        "--preload",
+        action=argparse.BooleanOptionalAction,
+        default=settings.SERVER_PRELOAD,
+    )
+    args = parser.parse_args()
+
+    split_pool_budget(args.workers)
+    if settings.METRICS_ENABLED:
+        from src.core.metrics import clear_snapshots
+
+        # totals of the previous run's workers would be summed into this one's
+        clear_snapshots()
+    sock = bind_socket(args.host, args.port, settings.SERVER_BACKLOG)
+    app = None
+    if args.preload:
+        # SDKs too, a worker would otherwise import its own copy during warmup
+        app = load_app(sdks=True)
+        # keep the collector from touching, and so copying, the preloaded objects
+        gc.freeze()
+    Supervisor(sock, args.workers, app).run()
+
+
+if __name__ == "__main__":
+    main()
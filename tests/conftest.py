@@ -0,0 +1,167 @@
+"""Shared fixtures of the test suite.
+
+Tests that touch the database need the usual POSTGRES_* settings pointing at a
+disposable database migrated with `alembic upgrade head`. They are skipped when
+it cannot be reached.
+"""
+
+import uuid
+from collections.abc import Callable, Generator
+from contextlib import AbstractContextManager, contextmanager
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+from src.api.deps import get_current_user
+from src.core.config import settings
+from src.core.db import engine
+from src.core.query_budget import QueryCounter, count_queries, install_query_counter
+from src.main import app
+from src.models.models import (
+    Car,
+    Friendships,
+    FriendshipStatus,
+    IdempotencyKey,
+    Invitation,
+    InvitationEnum,
+    Passenger,
+    Trip,
+    User,
+)
+
+type QueryBudgetFactory = Callable[[int], AbstractContextManager[QueryCounter]]
+
+
+@pytest.fixture
+def enforce_query_budgets(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Make every route that declares a QueryBudget raise when it goes over it."""
+    install_query_counter(engine)
+    monkeypatch.setattr(settings, "QUERY_BUDGET_MODE", "raise")
+
+
+@pytest.fixture
+def query_budget() -> QueryBudgetFactory:
+    """Return a context manager failing the test if the block issues more than max_queries.
+
+    Counts on every thread, so requests made through TestClient are included.
+    """
+    install_query_counter(engine)
+
+    @contextmanager
+    def budget(max_queries: int) -> Generator[QueryCounter]:
+        with count_queries(process_wide=True) as counter:
+            yield counter
+        if counter.count > max_queries:
+            pytest.fail(counter.report("Block", max_queries))
+
+    return budget
+
+
+@pytest.fixture(scope="session")
+def database() -> None:
+    """Skip the test when the test database is unreachable."""
+    try:
+        with engine.connect():
+            pass
+    except OperationalError as exc:
+        pytest.skip(f"test database unavailable: {exc}")
+
+
+@dataclass
+class Dataset:
+    user: User
+    friends: list[User]
+    trip_ids: list[uuid.UUID] = field(default_factory=list)
+
+
+@pytest.fixture
+def dataset(database: None) -> Generator[Dataset]:
+    """Seed a user with friends and trips, each trip with invitees and a full car.
+
+    Enough rows of every kind that a route loading them one by one goes over budget.
+    """
+    _ = database
+    # unique per run, so a test database shared by parallel runs does not collide
+    run = uuid.uuid4().int % 10**5
+    people = [
+        User(id=uuid.uuid4(), phone=f"+1555{run:05d}{n:02d}", firstname=f"Test{n}")
+        for n in range(4)
+    ]
+    user, *friends = people
+    dataset = Dataset(user=user, friends=friends)
+    today = datetime.now(UTC).date()
+    with Session(engine) as session:
+        session.add_all(people)
+        session.flush()
+        for friend in friends:
+            session.add(
+                Friendships(
+                    requester_id=user.id,
+                    addressee_id=friend.id,
+                    status=FriendshipStatus.ACCEPTED,
+                )
+            )
+        # upcoming and past trips, so both get_trips branches see rows
+        for n, offset in enumerate((10, 20, 30, 40, -40, -50)):
+            start = today + timedelta(days=offset)
+            trip = Trip(
+                owner=user.id,
+                title=f"Trip {n}",
+                start_date=start,
+                end_date=start + timedelta(days=2),
+                mountain="Alta",
+            )
+            session.add(trip)
+            session.flush()
+            dataset.trip_ids.append(trip.id)
+            for person in people:
+                session.add(
+                    Invitation(
+                        id=uuid.uuid4(),
+                        trip_id=trip.id,
+                        user_id=person.id,
+                        rsvp=InvitationEnum.ACCEPTED,
+                    )
+                )
+            car = Car(trip_id=trip.id, owner=user.id)
+            session.add(car)
+            session.flush()
+            for seat, friend in enumerate(friends, start=1):
+                session.add(
+                    Passenger(user_id=friend.id, car_id=car.id, seat_position=seat)
+                )
+        session.commit()
+        for person in people:
+            session.refresh(person)
+            session.expunge(person)
+
+    yield dataset
+
+    with Session(engine) as session:
+        session.execute(delete(Trip).where(Trip.id.in_(dataset.trip_ids)))
+        person_ids = [person.id for person in people]
+        session.execute(
+            delete(Friendships).where(Friendships.requester_id.in_(person_ids))
+        )
+        session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.user_id.in_(person_ids))
+        )
+        session.execute(delete(User).where(User.id.in_(person_ids)))
+        session.commit()
+
+
+@pytest.fixture
+def client(dataset: Dataset, monkeypatch: pytest.MonkeyPatch) -> Generator[TestClient]:
+    """TestClient signed in as the dataset's user, without rate limits or warmup."""
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    app.dependency_overrides[get_current_user] = lambda: dataset.user
+    try:
+        # not entered as a context manager, the lifespan would warm up every client
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
@@ -0,0 +1,62 @@
+"""Writes of a batch are idempotent per item, not per batch."""
+
+from datetime import UTC, datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from src.core.config import settings
+from tests.conftest import Dataset
+
+
+def new_trip(title: str) -> dict:
+    """POST /trips/ batch item body."""
+    start = datetime.now(UTC).date() + timedelta(days=60)
+    return {
+        "title": title,
+        "startDate": start.isoformat(),
+        "endDate": (start + timedelta(days=1)).isoformat(),
+        "mountain": "Alta",
+    }
+
+
+def run_batch(client: TestClient, items: list[dict], **headers: str) -> list[dict]:
+    """POST the items as one batch and return their results."""
+    response = client.post(
+        settings.API_V1_STR + "/batch/",
+        json={"requests": items},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def test_batch_key_is_not_passed_to_writes(
+    client: TestClient, dataset: Dataset
+) -> None:
+    _ = dataset
+    items = [
+        {"id": "first", "method": "POST", "path": "/trips/", "body": new_trip("One")},
+        {"id": "second", "method": "POST", "path": "/trips/", "body": new_trip("Two")},
+    ]
+    results = run_batch(client, items, **{"Idempotency-Key": "batch-key"})
+    assert [result["status"] for result in results] == [200, 200]
+    first, second = (result["body"]["data"] for result in results)
+    assert first["id"] != second["id"]
+
+
+def test_item_key_replays_within_batch(client: TestClient, dataset: Dataset) -> None:
+    _ = dataset
+    item = {
+        "method": "POST",
+        "path": "/trips/",
+        "body": new_trip("Once"),
+        "headers": {"Idempotency-Key": "item-key"},
+    }
+    results = run_batch(
+        client,
+        [{"id": "first", **item}, {"id": "retry", **item}],
+        **{"Idempotency-Key": "batch-key"},
+    )
+    assert [result["status"] for result in results] == [200, 200]
+    first, retry = (result["body"]["data"] for result in results)
+    assert first["id"] == retry["id"]
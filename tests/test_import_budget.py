@@ -0,0 +1,19 @@
+"""Cold import of src.main stays within IMPORT_BUDGET_SECONDS.
+
+Every worker pays the import on boot and on every restart, and SDKs that are
+only needed by a few routes must be imported on first use.
+"""
+
+from src.core.cli import cold_import
+from src.core.config import settings
+
+# the fastest run counts, machine noise only ever adds time
+RUNS = 3
+
+
+def test_cold_import_within_budget() -> None:
+    seconds, loaded = cold_import(RUNS)
+    assert seconds <= settings.IMPORT_BUDGET_SECONDS, (
+        f"cold import took {seconds:.3f}s, run import-profile to find the slow modules"
+    )
+    assert loaded == [], f"imported at boot instead of on first use: {loaded}"
@@ -0,0 +1,60 @@
+"""Matching an RSVP against its invite."""
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from src.api.routes.invites import same_phone
+from src.core.config import settings
+from src.core.db import engine
+from src.models.models import Invitation, InvitationEnum, User
+from tests.conftest import Dataset
+
+
+@pytest.mark.parametrize(
+    ("auth_phone", "expected"),
+    [
+        ("+15551234567", True),
+        ("15551234567", True),
+        ("(555) 123-4567", True),
+        ("+15551234568", False),
+        # not a valid number, a mismatch rather than a server error
+        ("12345", False),
+        ("", False),
+        (None, False),
+    ],
+)
+def test_same_phone(auth_phone: str | None, *, expected: bool) -> None:
+    assert same_phone(auth_phone, "+15551234567") is expected
+
+
+def test_rsvp_rejects_invitation_of_another_trip(
+    client: TestClient, dataset: Dataset
+) -> None:
+    invited, other = dataset.trip_ids[:2]
+    with Session(engine) as session:
+        invitation = Invitation(
+            id=uuid.uuid4(), trip_id=invited, rsvp=InvitationEnum.PENDING
+        )
+        session.add(invitation)
+        session.commit()
+        token = str(invitation.id)
+    response = client.patch(
+        f"{settings.API_V1_STR}/trips/{other}/invites",
+        json={"inviteToken": token, "rsvp": "accepted"},
+    )
+    assert response.status_code == 404, response.text
+
+
+def test_onboarding_keeps_a_bad_phone(client: TestClient, dataset: Dataset) -> None:
+    with Session(engine) as session:
+        user = session.get_one(User, dataset.user.id)
+        user.phone = "12345"
+        session.commit()
+    response = client.post(settings.API_V1_STR + "/users/onboarding")
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]["backfilledTripIds"] == []
+    with Session(engine) as session:
+        assert session.get_one(User, dataset.user.id).phone == "12345"
@@ -0,0 +1,85 @@
+"""Every list route stays within the QueryBudget it declares.
+
+The budgets are enforced in raise mode, so a route going over one fails its
+request with QueryBudgetExceededError and the report of the repeated statements.
+"""
+
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from src.core.config import settings
+from src.core.query_budget import QueryBudget
+from src.main import app
+from tests.conftest import Dataset, QueryBudgetFactory
+
+# path templates of the list routes, filled in from the dataset
+LIST_ROUTES = [
+    "/trips/",
+    "/trips/?past=true",
+    "/trips/search?q=trip",
+    "/trips/{trip_id}/invites",
+    "/trips/{trip_id}/cars/",
+    "/users/",
+    "/users/me/summary",
+    "/users/me/conflicts",
+    "/users/{user_id}/invites",
+    "/friendships/me",
+    "/sync/",
+]
+
+
+def declared_budget(path: str) -> int | None:
+    """Return max_queries of the QueryBudget the GET route of path declares."""
+    template = settings.API_V1_STR + path.split("?")[0]
+    for route in app.routes:
+        if (
+            isinstance(route, APIRoute)
+            and route.path == template
+            and "GET" in route.methods
+        ):
+            for dependant in route.dependant.dependencies:
+                if isinstance(dependant.call, QueryBudget):
+                    return dependant.call.max_queries
+    return None
+
+
+@pytest.mark.parametrize("path", LIST_ROUTES)
+def test_list_route_declares_budget(path: str) -> None:
+    assert declared_budget(path) is not None
+
+
+@pytest.mark.parametrize("path", LIST_ROUTES)
+@pytest.mark.usefixtures("enforce_query_budgets")
+def test_list_route_within_budget(
+    path: str, client: TestClient, dataset: Dataset
+) -> None:
+    url = settings.API_V1_STR + path.format(
+        trip_id=dataset.trip_ids[0], user_id=dataset.user.id
+    )
+    response = client.get(url)
+    assert response.status_code == 200, response.text
+
+
+def test_batch_of_list_routes_within_their_budgets(
+    client: TestClient, dataset: Dataset, query_budget: QueryBudgetFactory
+) -> None:
+    templates = LIST_ROUTES[: settings.BATCH_MAX_REQUESTS]
+    paths = [
+        path.format(trip_id=dataset.trip_ids[0], user_id=dataset.user.id)
+        for path in templates
+    ]
+    total = sum(declared_budget(path) or 0 for path in templates)
+    with query_budget(total):
+        response = client.post(
+            settings.API_V1_STR + "/batch/",
+            json={
+                "requests": [
+                    {"id": str(n), "path": path} for n, path in enumerate(paths)
+                ]
+            },
+        )
+    assert response.status_code == 200, response.text
+    assert [result["status"] for result in response.json()["data"]] == [200] * len(
+        paths
+    )